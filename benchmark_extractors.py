@@ -1 +1,404 @@
- 
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+benchmark_extractors.py - Extraction benchmark for BeepSeq WebResearch.
+Runs the readability and trafilatura paths of the extraction pipeline, plus
+the image collection and image rewrite stages, over a corpus of saved HTML
+pages (benchmarks/corpus and docs/example.html) and reports throughput,
+p50/p95 latency, peak memory and output size per page-size bucket. Peak
+memory is reported twice: Python allocations (tracemalloc) and resident set
+size, which also covers libxml2 and other C allocations. With --e2e the
+corpus is served from a local HTTP server and WebCrawler.fetch is measured
+end to end. Results are written as JSON so runs
+can be compared (--baseline).
+"""
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # 没有psutil时端到端模式不报告RSS
+    psutil = None
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from extraction import embed_images, extract_content
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CORPUS = [ROOT / "benchmarks" / "corpus", ROOT / "docs" / "example.html"]
+EXTRACTORS = {"readability": True, "trafilatura": False}
+# (桶名, 上限字节数)；按原始HTML大小分桶
+SIZE_BUCKETS = (("small", 32 * 1024), ("medium", 256 * 1024), ("large", None))
+# 1x1透明PNG，端到端模式下为所有图像请求返回
+PIXEL_PNG = bytes.fromhex("89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+                          "0000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")
+
+console = Console(stderr=True)
+
+
+def bucket_of(size: int) -> str:
+    return next(name for name, limit in SIZE_BUCKETS if limit is None or size < limit)
+
+
+def load_corpus(paths: List[Path]) -> List[Dict[str, Any]]:
+    """读取语料：目录下的全部*.html，或单个文件"""
+    files = []
+    for path in paths:
+        files.extend(sorted(path.glob("*.html")) if path.is_dir() else [path])
+    pages = []
+    for file in files:
+        html = file.read_text(encoding="utf-8", errors="replace")
+        size = len(html.encode("utf-8"))
+        pages.append({"name": file.name, "path": str(file), "html": html, "bytes": size, "bucket": bucket_of(size)})
+    return pages
+
+
+def percentile(values: List[float], q: float) -> float:
+    """线性插值百分位"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def time_runs(fn: Callable[[], Any], repeat: int, warmup: int) -> Tuple[List[float], Any]:
+    """预热后重复执行，返回每次耗时（秒）与最后一次结果"""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def peak_memory(fn: Callable[[], Any]) -> int:
+    """单独执行一次并用tracemalloc记录Python侧峰值分配（不含libxml2的C分配），避免影响计时"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _child_maxrss(fn: Optional[Callable[[], Any]]) -> int:
+    """在fork出的子进程中执行fn，返回该子进程的峰值RSS（字节）"""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            if fn is not None:
+                fn()
+        except BaseException:
+            code = 1
+        os._exit(code)
+    _, status, usage = os.wait4(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError("peak RSS measurement failed in child process")
+    # Linux以KB为单位，macOS以字节为单位
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def peak_rss(fn: Callable[[], Any]) -> Optional[int]:
+    """单独执行一次的峰值RSS增量（含libxml2等C分配）：fork子进程执行fn，减去空跑子进程的峰值RSS。
+    ru_maxrss只增不减，在本进程内无法按阶段重置，因此借助子进程；不支持fork的平台返回None"""
+    if not hasattr(os, "fork"):
+        return None
+    return max(0, _child_maxrss(fn) - _child_maxrss(None))
+
+
+class RssSampler:
+    """端到端运行期间采样本进程及其子进程（提取进程池）的RSS之和，记录峰值（需psutil）"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak: Optional[int] = None
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> int:
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self.stop.is_set():
+            self.peak = max(self.peak or 0, self._sample())
+            self.stop.wait(self.interval)
+
+    def __enter__(self) -> "RssSampler":
+        if psutil is not None:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+def _max_kb(rows: List[Dict[str, Any]], key: str) -> Optional[float]:
+    values = [row[key] for row in rows if row.get(key) is not None]
+    return round(max(values) / 1024, 1) if values else None
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """把若干(页面, 计时)样本汇总为吞吐、延迟百分位、峰值内存与输出大小"""
+    timings = [t for row in rows for t in row["timings"]]
+    total_time = sum(timings)
+    total_bytes = sum(row["bytes"] * len(row["timings"]) for row in rows)
+    return {
+        "pages": len(rows),
+        "runs": len(timings),
+        "throughput_pages_s": round(len(timings) / total_time, 2) if total_time else None,
+        "throughput_mb_s": round(total_bytes / total_time / 1e6, 2) if total_time else None,
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "peak_mem_kb": _max_kb(rows, "peak_mem"),
+        "peak_rss_kb": _max_kb(rows, "peak_rss"),
+        "input_bytes": sum(row["bytes"] for row in rows),
+        "output_bytes": sum(row["output_bytes"] for row in rows),
+    }
+
+
+def aggregate(samples: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按(提取器, 阶段, 大小桶)以及全部页面("all")汇总"""
+    groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+    for sample in samples:
+        for bucket in (sample["bucket"], "all"):
+            groups.setdefault((sample["extractor"], sample["stage"], bucket), []).append(sample)
+    return [{"extractor": extractor, "stage": stage, "bucket": bucket, **summarize(rows)}
+            for (extractor, stage, bucket), rows in groups.items()]
+
+
+def fake_replacements(images: List[Dict[str, str]], image_bytes: int) -> Dict[str, str]:
+    """为改写阶段构造与真实嵌入同量级的data URI"""
+    payload = "data:image/png;base64," + "A" * image_bytes
+    replacements = {}
+    for img in images:
+        replacements[img["src"]] = replacements[img["full_url"]] = payload
+    return replacements
+
+
+def bench_stages(pages: List[Dict[str, Any]], extractors: List[str], repeat: int, warmup: int,
+                 image_bytes: int) -> List[Dict[str, Any]]:
+    """逐页测量：extract（仅提取）、images（提取并收集/规范化图像）、rewrite（图像地址替换）"""
+    samples = []
+    for page in pages:
+        url = f"https://bench.local/{page['name']}"
+        for extractor in extractors:
+            use_readability = EXTRACTORS[extractor]
+            stages = {
+                "extract": lambda: extract_content(page["html"], url, use_readability),
+                "images": lambda: extract_content(page["html"], url, use_readability, True),
+            }
+            for stage, fn in stages.items():
+                timings, extracted = time_runs(fn, repeat, warmup)
+                output = len((extracted.md_content or "").encode("utf-8"))
+                samples.append({"page": page["name"], "bucket": page["bucket"], "bytes": page["bytes"],
+                                "extractor": extractor, "stage": stage, "timings": timings,
+                                "peak_mem": peak_memory(fn), "peak_rss": peak_rss(fn), "output_bytes": output,
+                                "images": len(extracted.images)})
+            replacements = fake_replacements(extracted.images, image_bytes)
+            rewrite = lambda: embed_images(extracted.clean_html, extracted.md_content, replacements)
+            timings, (html_out, md_out) = time_runs(rewrite, repeat, warmup)
+            samples.append({"page": page["name"], "bucket": page["bucket"], "bytes": page["bytes"],
+                            "extractor": extractor, "stage": "rewrite", "timings": timings,
+                            "peak_mem": peak_memory(rewrite), "peak_rss": peak_rss(rewrite),
+                            "output_bytes": len(html_out.encode("utf-8")) + len((md_out or "").encode("utf-8")),
+                            "images": len(extracted.images)})
+            console.print(f"⏱️ {page['name']} ({extractor}) done")
+    return samples
+
+
+class CorpusServer:
+    """在本地线程中提供语料页面；其他路径（图像）返回1x1 PNG"""
+
+    def __init__(self, pages: List[Dict[str, Any]]):
+        documents = {f"/{page['name']}": page["html"].encode("utf-8") for page in pages}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                body, content_type = (documents[path], "text/html; charset=utf-8") if path in documents else (PIXEL_PNG, "image/png")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self) -> "CorpusServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+async def bench_e2e(pages: List[Dict[str, Any]], extractors: List[str], repeat: int, warmup: int,
+                    fetch_mode: str, concurrency: int, embed: bool, executor: str) -> List[Dict[str, Any]]:
+    """端到端：本地HTTP服务器 + WebCrawler.fetch（no_cache，每次都完整抓取与提取）。
+    并发抓取无法按页面区分内存，peak_rss为每个提取器整轮运行中本进程与提取进程池RSS之和的峰值（需psutil），
+    Python分配（peak_mem）分散在多个进程中，记为None"""
+    from core import CrawlerConfig, WebCrawler
+
+    samples = []
+    with CorpusServer(pages) as server:
+        # 本地服务器无需礼貌限速
+        crawler = WebCrawler(host_rate=1e9, host_concurrency=max(concurrency, 1), executor=executor)
+        limit = asyncio.Semaphore(concurrency)
+        try:
+            for extractor in extractors:
+                config = CrawlerConfig(fetch_mode=fetch_mode, no_cache=True, embed_images=embed,
+                                       use_readability=EXTRACTORS[extractor])
+
+                async def fetch(page) -> Tuple[float, int]:
+                    async with limit:
+                        started = time.perf_counter()
+                        content = await crawler.fetch(f"{server.base_url}/{page['name']}", config)
+                        return time.perf_counter() - started, len((content or "").encode("utf-8"))
+
+                for _ in range(warmup):
+                    await asyncio.gather(*(fetch(page) for page in pages))
+                runs = {page["name"]: [] for page in pages}
+                wall = time.perf_counter()
+                with RssSampler() as rss:
+                    for _ in range(repeat):
+                        for page, result in zip(pages, await asyncio.gather(*(fetch(page) for page in pages))):
+                            runs[page["name"]].append(result)
+                wall = time.perf_counter() - wall
+                for page in pages:
+                    samples.append({"page": page["name"], "bucket": page["bucket"], "bytes": page["bytes"],
+                                    "extractor": extractor, "stage": f"fetch:{fetch_mode}",
+                                    "timings": [t for t, _ in runs[page["name"]]],
+                                    "peak_mem": None, "peak_rss": rss.peak,
+                                    "output_bytes": runs[page["name"]][-1][1]})
+                console.print(f"🌐 e2e ({extractor}) {len(pages) * repeat} fetches in {wall:.2f}s "
+                              f"({len(pages) * repeat / wall:.1f} pages/s wall)")
+        finally:
+            await crawler.close()
+    return samples
+
+
+def environment() -> Dict[str, Any]:
+    import lxml.etree
+    import trafilatura
+
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(),
+            "lxml": ".".join(map(str, lxml.etree.LXML_VERSION)), "trafilatura": trafilatura.__version__,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def _kb(value: Optional[float]) -> str:
+    return f"{value:.0f}" if value is not None else "-"
+
+
+def print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None):
+    """打印汇总表；提供基线时附带p50变化百分比"""
+    previous = {}
+    if baseline:
+        previous = {(r["extractor"], r["stage"], r["bucket"]): r for r in baseline.get("results", [])}
+    table = Table(title="Extraction benchmark")
+    for column in ("extractor", "stage", "bucket", "pages/s", "MB/s", "p50 ms", "p95 ms", "py peak KB", "RSS KB", "out KB"):
+        table.add_column(column, justify="left" if column in ("extractor", "stage", "bucket") else "right")
+    if previous:
+        table.add_column("Δp50", justify="right")
+    for r in sorted(results, key=lambda r: (r["stage"], r["extractor"], r["bucket"])):
+        row = [r["extractor"], r["stage"], r["bucket"], str(r["throughput_pages_s"]), str(r["throughput_mb_s"]),
+               f"{r['p50_ms']:.2f}", f"{r['p95_ms']:.2f}", _kb(r["peak_mem_kb"]), _kb(r["peak_rss_kb"]),
+               f"{r['output_bytes'] / 1024:.1f}"]
+        if previous:
+            old = previous.get((r["extractor"], r["stage"], r["bucket"]))
+            row.append(f"{(r['p50_ms'] / old['p50_ms'] - 1) * 100:+.1f}%" if old and old["p50_ms"] else "-")
+        table.add_row(*row)
+    console.print(table)
+
+
+def main(
+    corpus: Optional[List[Path]] = typer.Argument(None, help="HTML files or directories (default: benchmarks/corpus and docs/example.html)."),
+    extractor: Optional[List[str]] = typer.Option(None, "--extractor", "-e", help="readability and/or trafilatura (default: both)."),
+    repeat: int = typer.Option(5, "--repeat", "-n", help="Timed runs per page and stage."),
+    warmup: int = typer.Option(1, "--warmup", help="Untimed runs before measuring."),
+    image_bytes: int = typer.Option(4096, "--image-bytes", help="Size of the fake data URIs used by the rewrite stage."),
+    e2e: bool = typer.Option(False, "--e2e", help="Also serve the corpus locally and time WebCrawler.fetch end to end."),
+    fetch_mode: str = typer.Option("http", "--fetch-mode", help="e2e fetch mode: http, auto or browser (needs Chrome)."),
+    concurrency: int = typer.Option(1, "--concurrency", "-c", help="e2e concurrent fetches."),
+    embed: bool = typer.Option(False, "--embed-images", help="e2e: download and embed images."),
+    executor: str = typer.Option("process", "--executor", help="e2e: extraction executor (process or thread)."),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="Write the JSON report here instead of stdout."),
+    baseline: Optional[Path] = typer.Option(None, "--baseline", help="Earlier JSON report to compare p50 latencies against."),
+):
+    """对语料运行提取基准，输出JSON报告"""
+    extractors = extractor or list(EXTRACTORS)
+    if unknown := set(extractors) - set(EXTRACTORS):
+        raise typer.BadParameter(f"unknown extractor(s): {', '.join(sorted(unknown))}")
+    pages = load_corpus(corpus or DEFAULT_CORPUS)
+    if not pages:
+        raise typer.BadParameter("corpus is empty")
+    console.print(f"📚 {len(pages)} pages: " + ", ".join(f"{p['name']} ({p['bytes'] // 1024} KB, {p['bucket']})" for p in pages))
+
+    samples = bench_stages(pages, extractors, repeat, warmup, image_bytes)
+    if e2e:
+        samples += asyncio.run(bench_e2e(pages, extractors, repeat, warmup, fetch_mode, concurrency, embed, executor))
+
+    results = aggregate(samples)
+    report = {
+        "environment": environment(),
+        "settings": {"repeat": repeat, "warmup": warmup, "image_bytes": image_bytes, "e2e": e2e,
+                     "fetch_mode": fetch_mode if e2e else None, "concurrency": concurrency,
+                     "buckets": {name: limit for name, limit in SIZE_BUCKETS}},
+        "pages": [{k: p[k] for k in ("name", "bytes", "bucket")} for p in pages],
+        "results": results,
+        "samples": [{**{k: v for k, v in s.items() if k != "timings"},
+                     "p50_ms": round(percentile(s["timings"], 0.5) * 1000, 3),
+                     "p95_ms": round(percentile(s["timings"], 0.95) * 1000, 3)} for s in samples],
+    }
+    print_table(results, json.loads(baseline.read_text()) if baseline else None)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        output.write_text(text, encoding="utf-8")
+        console.print(f"💾 Report saved: {output}")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    typer.run(main)
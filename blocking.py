@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+blocking.py - Network-level request blocking during page renders.
+Uses CDP Fetch interception (only for requests matching the block patterns,
+so everything else loads without a round trip) to drop the resource types
+(fonts, media, images, ...), ad/tracker hosts and third-party iframes the
+caller opted into, and counts blocked requests and transferred bytes.
+"""
+from fnmatch import fnmatchcase
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+import nodriver as uc
+
+# 内置广告/统计/追踪域名（含子域名）
+TRACKER_HOSTS = (
+    'doubleclick.net', 'googlesyndication.com', 'googleadservices.com', 'google-analytics.com',
+    'googletagmanager.com', 'googletagservices.com', 'adservice.google.com', 'connect.facebook.net',
+    'scorecardresearch.com', 'quantserve.com', 'taboola.com', 'outbrain.com', 'criteo.com', 'criteo.net',
+    'amazon-adsystem.com', 'adnxs.com', 'adsrvr.org', 'rubiconproject.com', 'pubmatic.com', 'openx.net',
+    'casalemedia.com', 'indexww.com', 'moatads.com', 'doubleverify.com', 'adsafeprotected.com',
+    'smartadserver.com', 'teads.tv', 'triplelift.com', 'sharethrough.com', 'media.net', 'yieldmo.com',
+    'hotjar.com', 'mixpanel.com', 'segment.io', 'cdn.segment.com', 'nr-data.net', 'chartbeat.com',
+    'chartbeat.net', 'optimizely.com', 'clarity.ms', 'bat.bing.com', 'mc.yandex.ru', 'hm.baidu.com',
+    'cnzz.com', 'adform.net', 'bidswitch.net', 'zedo.com', 'exelator.com', 'krxd.net', 'bluekai.com',
+)
+
+
+def _host_matches(host: str, domains) -> bool:
+    """host等于某个域名或是其子域名"""
+    parts = host.split('.')
+    return any('.'.join(parts[i:]) in domains for i in range(len(parts)))
+
+
+class BlockPolicy(NamedTuple):
+    resource_types: FrozenSet[str] = frozenset()  # CDP ResourceType取值，如Font、Media、Image
+    url_patterns: Tuple[str, ...] = ()  # 通配符模式，*匹配任意字符
+    trackers: bool = False
+    third_party_frames: bool = False
+
+    @property
+    def active(self) -> bool:
+        return bool(self.resource_types or self.url_patterns or self.trackers or self.third_party_frames)
+
+    @staticmethod
+    def split(value: Optional[str]) -> Tuple[str, ...]:
+        return tuple(v.strip() for v in (value or '').split(',') if v.strip())
+
+    @classmethod
+    def parse_types(cls, value: Optional[str]) -> FrozenSet[str]:
+        """逗号分隔的资源类型，大小写不敏感（font, media, image, ...）"""
+        known = {t.value.lower(): t.value for t in uc.cdp.network.ResourceType}
+        types = set()
+        for name in cls.split(value):
+            if name.lower() not in known:
+                raise ValueError(f"Unknown resource type {name!r}; expected one of {', '.join(known.values())}")
+            types.add(known[name.lower()])
+        return frozenset(types)
+
+    def request_patterns(self):
+        """只拦截可能被阻止的请求；其余请求不经过Fetch往返"""
+        patterns = [uc.cdp.fetch.RequestPattern(resource_type=uc.cdp.network.ResourceType(t), request_stage=uc.cdp.fetch.RequestStage.REQUEST)
+                    for t in sorted(self.resource_types)]
+        url_patterns = list(self.url_patterns)
+        if self.trackers:
+            for host in TRACKER_HOSTS:
+                url_patterns += [f'*://{host}/*', f'*://*.{host}/*']
+        patterns += [uc.cdp.fetch.RequestPattern(url_pattern=p, request_stage=uc.cdp.fetch.RequestStage.REQUEST)
+                     for p in url_patterns]
+        if self.third_party_frames:
+            patterns.append(uc.cdp.fetch.RequestPattern(resource_type=uc.cdp.network.ResourceType.DOCUMENT,
+                                                        request_stage=uc.cdp.fetch.RequestStage.REQUEST))
+        return patterns
+
+
+class RequestBlocker:
+    """在一次渲染期间安装到标签页上：阻止匹配的请求，并统计已加载请求的传输字节"""
+
+    def __init__(self, policy: BlockPolicy, page_url: str):
+        self.policy = policy
+        self.page_host = urlparse(page_url).hostname or ''
+        self.tracker_hosts = frozenset(TRACKER_HOSTS)
+        self.tab = None
+        self.blocked: Dict[str, int] = {}
+        self.loaded = 0
+        self.bytes_transferred = 0
+
+    def _reason(self, event: uc.cdp.fetch.RequestPaused) -> Optional[str]:
+        """返回阻止原因；None表示放行（主文档、同站iframe）"""
+        resource_type = event.resource_type.value
+        if event.resource_type == uc.cdp.network.ResourceType.DOCUMENT:
+            if event.frame_id == self.tab.target.target_id:
+                return None
+            host = urlparse(event.request.url).hostname or ''
+            if self.policy.third_party_frames and not _host_matches(host, {self.page_host}) \
+                    and not _host_matches(self.page_host, {host}):
+                return 'third_party_frame'
+        if resource_type in self.policy.resource_types:
+            return resource_type
+        url = event.request.url
+        if self.policy.trackers and _host_matches(urlparse(url).hostname or '', self.tracker_hosts):
+            return 'tracker'
+        if any(fnmatchcase(url, p) for p in self.policy.url_patterns):
+            return 'pattern'
+        return None
+
+    async def _on_paused(self, event: uc.cdp.fetch.RequestPaused):
+        try:
+            if reason := self._reason(event):
+                self.blocked[reason] = self.blocked.get(reason, 0) + 1
+                await self.tab.send(uc.cdp.fetch.fail_request(event.request_id, uc.cdp.network.ErrorReason.BLOCKED_BY_CLIENT))
+            else:
+                await self.tab.send(uc.cdp.fetch.continue_request(event.request_id))
+        except Exception:
+            pass  # 标签页已导航离开或关闭
+
+    def _on_finished(self, event: uc.cdp.network.LoadingFinished):
+        self.loaded += 1
+        self.bytes_transferred += int(event.encoded_data_length)
+
+    async def install(self, tab):
+        """在导航前调用（需已启用Network域）"""
+        self.tab = tab
+        tab.add_handler(uc.cdp.network.LoadingFinished, self._on_finished)
+        if self.policy.active:
+            tab.add_handler(uc.cdp.fetch.RequestPaused, self._on_paused)
+            await tab.send(uc.cdp.fetch.enable(patterns=self.policy.request_patterns()))
+
+    async def uninstall(self):
+        """标签页归还池前必须调用：否则复用时匹配的请求会一直挂起"""
+        if self.tab is None:
+            return
+        self.tab.remove_handler(uc.cdp.network.LoadingFinished, self._on_finished)
+        if self.policy.active:
+            self.tab.remove_handler(uc.cdp.fetch.RequestPaused, self._on_paused)
+            try:
+                await self.tab.send(uc.cdp.fetch.disable())
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"blocked": sum(self.blocked.values()), **{f"blocked_{k}": v for k, v in self.blocked.items()},
+                "loaded": self.loaded, "bytes_transferred": self.bytes_transferred}
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+browser_pool.py - Managed nodriver browser pool for BeepSeq WebResearch.
+Keeps warm reusable tabs per browser, dispatches to the least-loaded browser,
+recycles browsers after a page/RSS budget and restarts crashed ones.
+"""
+import asyncio
+import inspect
+from asyncio import Lock, Semaphore
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import nodriver as uc
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is simply disabled without psutil
+    psutil = None
+
+
+class BrowserCrashed(RuntimeError):
+    """浏览器进程在页面处理过程中退出"""
+
+
+@dataclass
+class BrowserSlot:
+    index: int
+    browser: Optional[uc.Browser] = None
+    idle_tabs: List[uc.Tab] = field(default_factory=list)
+    lock: Lock = field(default_factory=Lock)
+    active: int = 0
+    pages_served: int = 0
+    recycles: int = 0
+    crashes: int = 0
+    draining: bool = False
+
+    @property
+    def alive(self) -> bool:
+        return self.browser is not None and not self.browser.stopped
+
+    def rss_mb(self) -> Optional[float]:
+        """浏览器主进程及其渲染子进程的RSS总和（MB）"""
+        pid = getattr(self.browser, '_process_pid', None)
+        if psutil is None or not pid:
+            return None
+        try:
+            proc = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [proc, *proc.children(recursive=True)]) / 2**20
+        except psutil.Error:
+            return None
+
+
+class BrowserPool:
+    def __init__(self, size: int = 1, tabs_per_browser: int = 5, max_pages_per_browser: int = 200,
+                 max_rss_mb: Optional[float] = None, rss_check_every: int = 10, **start_kwargs):
+        self.tabs_per_browser = max(1, tabs_per_browser)
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_rss_mb = max_rss_mb
+        self.rss_check_every = max(1, rss_check_every)
+        self.start_kwargs = start_kwargs
+        self.slots = [BrowserSlot(i) for i in range(max(1, size))]
+        self.capacity = Semaphore(len(self.slots) * self.tabs_per_browser)
+        self.lock = Lock()
+
+    async def _start(self, slot: BrowserSlot):
+        slot.browser = await uc.start(**self.start_kwargs)
+        slot.pages_served = 0
+        slot.draining = False
+        print(f"🌐 Browser #{slot.index} started")
+
+    async def _stop(self, slot: BrowserSlot):
+        browser, slot.browser = slot.browser, None
+        slot.idle_tabs.clear()
+        slot.draining = False
+        if browser:
+            try:
+                # nodriver的stop()在不同版本中分别是同步/异步实现
+                if inspect.isawaitable(stopped := browser.stop()):
+                    await stopped
+            except Exception as e:
+                print(f"⚠️ Error closing browser: {e}")
+
+    async def _acquire_slot(self) -> BrowserSlot:
+        async with self.lock:
+            slot = min([s for s in self.slots if not s.draining] or self.slots, key=lambda s: s.active)
+            slot.active += 1
+        try:
+            async with slot.lock:
+                if not slot.alive:
+                    if slot.browser is not None:
+                        slot.crashes += 1
+                        print(f"♻️ Browser #{slot.index} died, restarting")
+                        await self._stop(slot)
+                    await self._start(slot)
+        except BaseException:
+            slot.active -= 1
+            raise
+        return slot
+
+    async def _release_slot(self, slot: BrowserSlot):
+        slot.active -= 1
+        slot.pages_served += 1
+        if slot.pages_served >= self.max_pages_per_browser:
+            slot.draining = True
+        elif self.max_rss_mb and slot.pages_served % self.rss_check_every == 0:
+            if (rss := slot.rss_mb()) and rss > self.max_rss_mb:
+                slot.draining = True
+        if slot.draining and slot.active == 0:
+            async with slot.lock:
+                if slot.draining and slot.active == 0:
+                    slot.recycles += 1
+                    print(f"♻️ Recycling browser #{slot.index} after {slot.pages_served} pages")
+                    await self._stop(slot)
+
+    @asynccontextmanager
+    async def page(self, url: str, timeout: Optional[float] = None,
+                   prepare: Optional[Callable[[uc.Tab], Awaitable[None]]] = None):
+        """在最空闲的浏览器中打开URL，优先复用已预热的标签页；prepare在导航前执行（如注册CDP事件）"""
+        async with self.capacity:
+            slot = await self._acquire_slot()
+            tab = None
+            try:
+                tab = slot.idle_tabs.pop() if slot.idle_tabs else \
+                    await asyncio.wait_for(slot.browser.get('about:blank', new_tab=True), timeout)
+                if prepare:
+                    await prepare(tab)
+                await asyncio.wait_for(tab.get(url), timeout)
+                yield tab
+            except BaseException as e:
+                if not slot.alive:
+                    raise BrowserCrashed(f"Browser #{slot.index} exited while loading {url}") from e
+                if tab:
+                    await self._discard_tab(tab)
+                raise
+            else:
+                await self._recycle_tab(slot, tab)
+            finally:
+                await self._release_slot(slot)
+
+    async def _recycle_tab(self, slot: BrowserSlot, tab: uc.Tab):
+        if slot.draining or len(slot.idle_tabs) >= self.tabs_per_browser:
+            return await self._discard_tab(tab)
+        try:
+            await tab.get('about:blank')
+            slot.idle_tabs.append(tab)
+        except Exception:
+            await self._discard_tab(tab)
+
+    async def _discard_tab(self, tab: uc.Tab):
+        try:
+            await asyncio.wait_for(tab.close(), timeout=5)
+        except Exception:
+            pass
+
+    def stats(self) -> List[Dict]:
+        """每个浏览器进程的状态快照"""
+        return [{
+            "index": s.index,
+            "alive": s.alive,
+            "active_tabs": s.active,
+            "idle_tabs": len(s.idle_tabs),
+            "pages_served": s.pages_served,
+            "recycles": s.recycles,
+            "crashes": s.crashes,
+            "draining": s.draining,
+        } for s in self.slots]
+
+    async def close(self):
+        """关闭池内所有浏览器"""
+        async with self.lock:
+            for slot in self.slots:
+                async with slot.lock:
+                    await self._stop(slot)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+bundle.py - Packed export of a batch of results for bulk ingestion.
+Writes one Markdown/HTML file per page, each referenced image asset once
+(content-addressed, shared across pages) and a manifest.json into a zip or
+gzip-compressed tar archive.
+"""
+import io
+import json
+import re
+import tarfile
+import time
+import zipfile
+from enum import Enum
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Union
+
+
+class BundleFormat(str, Enum):
+    zip = "zip"
+    tgz = "tgz"
+
+
+def _slug(title: str) -> str:
+    return re.sub(r'[^\w-]+', '-', title or '', flags=re.U).strip('-')[:60] or 'page'
+
+
+class _Writer:
+    def __init__(self, target: Union[str, Path, BinaryIO], fmt: BundleFormat):
+        self.fmt = fmt
+        if fmt == BundleFormat.zip:
+            self.archive = zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED)
+        elif isinstance(target, (str, Path)):
+            self.archive = tarfile.open(target, 'w:gz')
+        else:
+            self.archive = tarfile.open(fileobj=target, mode='w:gz')
+
+    def add(self, name: str, data: bytes, compress: bool = True):
+        if self.fmt == BundleFormat.zip:
+            # 图像本身已压缩，直接存储
+            self.archive.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size, info.mtime = len(data), int(time.time())
+            self.archive.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
+
+
+def write_bundle(pages: List[Dict[str, Any]], target: Union[str, Path, BinaryIO], fmt: BundleFormat = BundleFormat.zip,
+                 asset_path: Optional[Callable[[str], Optional[Path]]] = None, extension: str = "md") -> Dict[str, int]:
+    """把一批结果（PageResult.to_dict()）打包：<序号>-<标题>.md、assets/<哈希>与manifest.json。
+    asset_path按文件名返回资源文件路径；找不到的资源在清单中列为missing。返回打包统计"""
+    writer = _Writer(target, fmt)
+    manifest, written, missing = [], set(), set()
+    try:
+        for number, page in enumerate(pages, 1):
+            meta = page.get("meta") or {}
+            name = f"{number:04d}-{_slug(page.get('title'))}.{extension}"
+            writer.add(name, (page.get("content") or "").encode('utf-8'))
+            assets = list((meta.get("images") or {}).get("assets", []))
+            for asset in assets:
+                if asset in written or asset in missing:
+                    continue
+                if asset_path and (path := asset_path(asset)):
+                    writer.add(f"assets/{asset}", path.read_bytes(), compress=False)
+                    written.add(asset)
+                else:
+                    missing.add(asset)
+            manifest.append({"file": name, "url": page.get("url"), "title": page.get("title"),
+                             "assets": assets, "meta": meta})
+        writer.add("manifest.json", json.dumps({"pages": manifest, "missing_assets": sorted(missing)},
+                                               ensure_ascii=False, indent=2).encode('utf-8'))
+    finally:
+        writer.close()
+    return {"pages": len(manifest), "assets": len(written), "missing_assets": len(missing)}
@@ -2,86 +2,384 @@
 """
 cli.py - Command Line Interface for BeepSeq WebResearch tool.
 """
+import time
+CLI_STARTED = time.perf_counter()  # 启动耗时报告的起点
+
 import typer
-import uvicorn
 import asyncio
 from typing import Optional, List
 from rich import print
-from rich.markdown import Markdown
-from core import create_app, CrawlerConfig
+# 只导入选项需要的轻量模块；浏览器、抽取与Web框架在各命令内按需导入
+from bundle import BundleFormat
+from config import CrawlerConfig, ExecutorKind, FetchMode, ImageFormat, ImageMode
+from executor import MAX_WORKERS
+
+CLI_IMPORTED = time.perf_counter()
 
 app = typer.Typer()
 
 @app.command()
-def serve(port: int = 8000):
+def serve(
+    port: int = 8000,
+    browsers: int = typer.Option(1, "--browsers", "-b", help="Number of browser processes in the pool."),
+    tabs: int = typer.Option(5, "--tabs", help="Concurrent (warm, reusable) tabs per browser."),
+    max_pages: int = typer.Option(200, "--max-pages", help="Recycle a browser after this many pages."),
+    max_rss_mb: Optional[float] = typer.Option(None, "--max-rss-mb", help="Recycle a browser once its RSS exceeds this (needs psutil)."),
+    store_dir: Optional[str] = typer.Option(None, "--store-dir", help="Persistent content store directory (enables incremental re-crawls)."),
+    executor: ExecutorKind = typer.Option(ExecutorKind.process, "--executor", help="Run extraction in a process or thread pool."),
+    workers: Optional[int] = typer.Option(None, "--workers", min=1, max=MAX_WORKERS, clamp=True, help="Extraction pool size (default and maximum: CPU count)."),
+    queue_size: Optional[int] = typer.Option(None, "--queue-size", help="Max queued extraction tasks (default: 4x workers)."),
+    extract_timeout: float = typer.Option(30.0, "--extract-timeout", help="Per-task extraction timeout in seconds."),
+    max_jobs: int = typer.Option(2, "--max-jobs", help="Jobs run concurrently by the /jobs queue."),
+    max_queued_jobs: int = typer.Option(100, "--max-queued-jobs", help="Queued jobs before POST /jobs answers 429."),
+    job_concurrency: int = typer.Option(20, "--job-concurrency", help="URLs fetched concurrently across all running jobs."),
+    jobs_dir: Optional[str] = typer.Option(None, "--jobs-dir", help="Persist queued jobs here so a restart loses nothing."),
+    host_rate: float = typer.Option(4.0, "--host-rate", help="Requests per second allowed per host (token bucket)."),
+    host_concurrency: int = typer.Option(8, "--host-concurrency", help="Upper bound for the adaptive per-host concurrency."),
+    image_cache_mb: int = typer.Option(64, "--image-cache-mb", help="Memory for image bytes shared across pages (logos, sprites)."),
+    search_fixtures: Optional[str] = typer.Option(None, "--search-fixtures", help="Answer searches from a static JSON file ({query: [{url, snippet, title}]}) instead of DuckDuckGo."),
+):
     """启动FastAPI服务器"""
+    import socket
+    import uvicorn
+    from client import register_server, unregister_server
+    from core import WebCrawler, create_app
+    from jobs import JobManager
+    from search import StaticSearchProvider
+
+    # 端口被占用时尽早退出，也避免覆盖正在运行的服务的登记
+    with socket.socket() as probe:
+        probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            probe.bind(("0.0.0.0", port))
+        except OSError as e:
+            print(f"❌ [bold red]Port {port} is not available: {e}[/bold red]")
+            raise typer.Exit(1)
+    provider = StaticSearchProvider.from_file(search_fixtures) if search_fixtures else None
+    crawler = WebCrawler(pool_size=browsers, tabs_per_browser=tabs,
+                         max_pages_per_browser=max_pages, max_browser_rss_mb=max_rss_mb, store_dir=store_dir,
+                         executor=executor, executor_workers=workers, executor_queue=queue_size,
+                         extract_timeout=extract_timeout, host_rate=host_rate, host_concurrency=host_concurrency,
+                         search_provider=provider, image_cache_mb=image_cache_mb)
     print(f"🚀 [bold green]Starting server at http://localhost:{port}[/bold green]")
-    uvicorn.run(create_app(), host="0.0.0.0", port=port)
+    jobs = JobManager(crawler, CrawlerConfig, max_running=max_jobs, max_queued=max_queued_jobs,
+                      max_concurrent_urls=job_concurrency, state_dir=jobs_dir)
+    # 登记地址，本机的read/search命令会自动把任务交给这个已预热的服务
+    register_server(port)
+    try:
+        uvicorn.run(create_app(crawler, jobs), host="0.0.0.0", port=port)
+    finally:
+        unregister_server()
+
+
+def _resolve_server(server: Optional[str], local: bool) -> Optional[str]:
+    """决定是否把任务交给运行中的服务：--local强制本进程，--server指定地址，否则自动发现本机服务"""
+    if local:
+        return None
+    from client import discover_server
+    url = discover_server(server)
+    if server and not url:
+        print(f"⚠️ [bold yellow]Server {server} is not reachable, running in-process.[/bold yellow]")
+    return url
+
+
+def _report_timings(timings: dict, via: str):
+    """启动耗时报告：CLI导入、引擎导入（本进程时）、首个结果与总耗时，均从CLI开始导入算起"""
+    since = lambda t: f"{(t - CLI_STARTED) * 1000:.0f} ms" if t else "-"
+    engine = f", engine import {timings['engine_import'] * 1000:.0f} ms" if "engine_import" in timings else ""
+    print(f"⏱️ cli import {since(CLI_IMPORTED)}{engine}, first result at {since(timings.get('first_result'))}, "
+          f"total {since(time.perf_counter())} ({via})")
 
 @app.command()
 def search(
-    query: str,
-    max_results: int = typer.Option(3, "--max-results", "-m", help="Maximum number of search results."),
+    queries: List[str] = typer.Argument(..., help="One or more search queries; results are merged by URL."),
+    max_results: int = typer.Option(3, "--max-results", "-m", help="Maximum number of search results per query."),
     fulltext: bool = typer.Option(False, "--fulltext", "-f", help="Fetch full text of the search results."),
+    server: Optional[str] = typer.Option(None, "--server", help="Send the work to this running server (default: auto-detect a local `webresearch serve`)."),
+    local: bool = typer.Option(False, "--local", help="Always run in-process, even when a server is running."),
+    timings: bool = typer.Option(False, "--timings", help="Report import and first-result latency."),
 ):
-    """使用DuckDuckGo进行搜索，并可选择性提取全文"""
-    from core import WebCrawler
-    
+    """使用DuckDuckGo进行搜索，并可选择性提取全文（边搜索边读取）"""
+    from pathlib import Path
+    from rich.markdown import Markdown
+
+    server_url = _resolve_server(server, local)
+    config = CrawlerConfig(embed_images=True, save_markdown=True)
+    timing = {}
+
+    def show(url: str, snippet: str = "", content: Optional[str] = None):
+        timing.setdefault("first_result", time.perf_counter())
+        if content is None:
+            print(f"URL: {url}\nSnippet: {snippet}\n")
+        else:
+            print(f"URL: {url}")
+            print(Markdown(content))
+
+    async def run_remote():
+        from client import WebResearchClient
+        remote_config = config.model_copy(update={"output_dir": str(Path(config.output_dir).resolve())})
+        for result in await WebResearchClient(server_url).search_multi(queries, max_results, fulltext, remote_config):
+            show(result["url"], result.get("snippet", ""), result.get("content") if fulltext else None)
+
     async def run_search():
+        started = time.perf_counter()
+        from core import WebCrawler
+        timing["engine_import"] = time.perf_counter() - started
         crawler = WebCrawler()
         try:
             if fulltext:
-                config = CrawlerConfig(embed_images=True, save_markdown=True)
-                urls, _ = crawler.search(query, max_results)
-                results = await crawler.crawl(urls, config)
-                for url, content in results.items():
-                    print(f"URL: {url}")
-                    print(Markdown(content))
+                async for page in crawler.search_iter(queries, max_results, config):
+                    show(page.url, content=page.content)
             else:
-                urls, snippets = crawler.search(query, max_results)
-                for url, snippet in zip(urls, snippets):
-                    print(f"URL: {url}\nSnippet: {snippet}\n")
+                for hit in await crawler.searcher.multi_search(queries, max_results):
+                    show(hit.url, hit.snippet)
         finally:
             await crawler.close()
-            
-    asyncio.run(run_search())
+
+    asyncio.run(run_remote() if server_url else run_search())
+    if timings:
+        _report_timings(timing, f"via {server_url}" if server_url else "in-process")
+
+def _load_urls(urls: Optional[List[str]], input_file: Optional[str]) -> List[str]:
+    """命令行参数与文件/标准输入（每行一个URL，#开头为注释）中的URL，保持顺序去重"""
+    import sys
+    lines = list(urls or [])
+    if input_file:
+        source = sys.stdin if input_file == "-" else open(input_file, encoding='utf-8')
+        with source:
+            lines += [line.strip() for line in source]
+    return list(dict.fromkeys(u for u in lines if u and not u.startswith('#')))
+
+
+def _summarize(results: List[dict], skipped: int, elapsed: float):
+    """批量读取结束时的吞吐量汇总"""
+    metas = [r["meta"] for r in results]
+    ok = [m for m in metas if m.get("status") == "success"]
+    latencies = sorted(m.get("elapsed_ms", 0) for m in metas)
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0
+    paths = {}
+    for m in ok:
+        key = "duplicate" if "duplicate_of" in m else m.get("cache") or m.get("path", "?")
+        paths[key] = paths.get(key, 0) + 1
+    chars = sum(m.get("content_length", 0) for m in ok)
+    print(f"📊 [bold]{len(results)} URLs in {elapsed:.1f}s[/bold] ({len(results) / elapsed if elapsed else 0:.2f} pages/s): "
+          f"{len(ok)} ok, {len(metas) - len(ok)} failed, {skipped} skipped (already done)")
+    print(f"   latency p50 {pick(0.5):.0f} ms, p95 {pick(0.95):.0f} ms; {chars} content chars; "
+          f"by source: {', '.join(f'{k} {v}' for k, v in sorted(paths.items())) or '-'}")
+
 
 @app.command()
 def read(
-    url: str = typer.Argument(..., help="The URL to fetch content from."),
-    md: bool = typer.Option(True, "--md/--no-md", help="Save as Markdown."),
+    urls: Optional[List[str]] = typer.Argument(None, help="URL(s) to fetch content from."),
+    input_file: Optional[str] = typer.Option(None, "--input", "-i", help="File with one URL per line ('-' for stdin)."),
+    jsonl: Optional[str] = typer.Option(None, "--jsonl", help="Append one JSON result per line to this file instead of writing per-page files."),
+    concurrency: int = typer.Option(8, "--concurrency", "-c", help="URLs processed in parallel (one browser session for the whole run)."),
+    resume: Optional[bool] = typer.Option(None, "--resume/--no-resume", help="Skip URLs finished by an earlier run (default: on with --input)."),
+    checkpoint: Optional[str] = typer.Option(None, "--checkpoint", help="File recording finished URLs (default: <jsonl>.done or <output-dir>/.read.done)."),
+    md: Optional[bool] = typer.Option(None, "--md/--no-md", help="Save as Markdown (default: on unless --jsonl)."),
     html: bool = typer.Option(False, "--html/--no-html", help="Save as HTML."),
     output_dir: str = typer.Option("output", "--output-dir", "-o", help="Output directory."),
     use_trafilatura: bool = typer.Option(False, "--use-trafilatura", help="Force use of trafilatura extractor."),
     no_embed: bool = typer.Option(False, "--no-embed", help="Disable image embedding."),
+    mode: FetchMode = typer.Option(FetchMode.browser, "--mode", help="browser | auto (plain HTTP first, browser when needed) | http"),
+    store_dir: Optional[str] = typer.Option(None, "--store-dir", help="Persistent content store directory (enables incremental re-crawls)."),
+    image_max_dim: Optional[int] = typer.Option(None, "--image-max-dim", help="Downscale embedded images to this longest side."),
+    image_format: ImageFormat = typer.Option(ImageFormat.original, "--image-format", help="Re-encode embedded images as webp/jpeg."),
+    image_budget: Optional[int] = typer.Option(None, "--image-budget", help="Max embedded image bytes per document."),
+    image_mode: ImageMode = typer.Option(ImageMode.inline, "--image-mode", help="inline (data: URIs) or assets (hash-named files under <output-dir>/assets)."),
+    bundle: Optional[str] = typer.Option(None, "--bundle", help="Also pack the results and their assets into this .zip or .tgz file."),
+    executor: ExecutorKind = typer.Option(ExecutorKind.process, "--executor", help="Run extraction in a process or thread pool."),
+    workers: Optional[int] = typer.Option(None, "--workers", min=1, max=MAX_WORKERS, clamp=True, help="Extraction pool size (default and maximum: CPU count)."),
+    block_trackers: bool = typer.Option(False, "--block-trackers/--no-block-trackers", help="Block built-in ad/tracker hosts while rendering."),
+    block_types: str = typer.Option("", "--block-types", help="Comma-separated resource types to block while rendering, e.g. Font,Media."),
+    block_urls: Optional[str] = typer.Option(None, "--block-urls", help="Comma-separated URL wildcard patterns to block while rendering."),
+    server: Optional[str] = typer.Option(None, "--server", help="Send the work to this running server (default: auto-detect a local `webresearch serve`)."),
+    local: bool = typer.Option(False, "--local", help="Always run in-process, even when a server is running (implied by --store-dir)."),
+    timings: bool = typer.Option(False, "--timings", help="Report import and first-result latency."),
 ):
-    """从URL提取内容，嵌入图像，并保存为Markdown或HTML。"""
-    from core import WebCrawler
+    """从一个或多个URL（参数、文件或标准输入）提取内容，嵌入图像，保存为Markdown/HTML文件或JSONL；批量运行可中断后继续。
+
+    本机有`webresearch serve`在运行时把任务交给它已预热的浏览器池，否则在本进程中抓取。"""
+    import json
+    from pathlib import Path
+    import httpx
 
-    if not md and not html:
+    targets = _load_urls(urls, input_file)
+    if not targets:
+        print("❌ [bold red]No URLs given (pass URLs or --input FILE).[/bold red]")
+        raise typer.Exit(1)
+    if md is None:
+        md = not jsonl
+    if not md and not html and not jsonl:
         print("⚠️ [bold yellow]No output format specified. Defaulting to Markdown.[/bold yellow]")
         md = True
+    if resume is None:
+        resume = input_file is not None
+    done_file = Path(checkpoint or (f"{jsonl}.done" if jsonl else Path(output_dir) / ".read.done"))
+    done = set()
+    if resume and done_file.exists():
+        done = set(done_file.read_text(encoding='utf-8').split())
+    pending = [u for u in targets if u not in done]
 
     config = CrawlerConfig(
         save_markdown=md,
         save_html=html,
         output_dir=output_dir,
         embed_images=not no_embed,
-        use_readability=not use_trafilatura
+        use_readability=not use_trafilatura,
+        fetch_mode=mode,
+        image_max_dimension=image_max_dim,
+        image_format=image_format,
+        image_budget_bytes=image_budget,
+        image_mode=image_mode,
+        executor=executor,
+        executor_workers=workers,
+        block_trackers=block_trackers,
+        block_types=block_types,
+        block_urls=block_urls,
     )
 
+    # 内容库属于各自的进程：指定--store-dir时不交给服务
+    server_url = _resolve_server(server, local or store_dir is not None) if pending else None
+    timing = {}
+
+    def local_asset(name: str) -> Optional[Path]:
+        path = Path(output_dir) / "assets" / Path(name).name
+        return path if path.is_file() else None
+
     async def run_crawl():
-        crawler = WebCrawler()
+        results, crawler = [], None
+        sink = open(jsonl, 'a', encoding='utf-8') if jsonl else None
+        done_log = open(done_file, 'a', encoding='utf-8') if resume else None
         try:
-            await crawler.crawl([url], config)
+            if server_url:
+                from client import WebResearchClient
+                # 服务与CLI的工作目录可能不同，输出目录用绝对路径
+                remote_config = config.model_copy(update={"output_dir": str(Path(output_dir).resolve())})
+                records = WebResearchClient(server_url).read_stream(pending, remote_config)
+            else:
+                started = time.perf_counter()
+                from core import WebCrawler
+                timing["engine_import"] = time.perf_counter() - started
+                crawler = WebCrawler(store_dir=store_dir, tabs_per_browser=min(concurrency, 10), max_concurrency=max(concurrency, 20))
+                records = (page.to_dict() async for page in crawler.crawl_iter(pending, config, limiter=asyncio.Semaphore(concurrency)))
+            async for record in records:
+                timing.setdefault("first_result", time.perf_counter())
+                meta = record["meta"]
+                if sink:
+                    sink.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    sink.flush()
+                # 只记录成功的URL：失败的下次运行重试
+                if done_log and meta.get("status") == "success":
+                    done_log.write(record["url"] + '\n')
+                    done_log.flush()
+                results.append(record if bundle else {"meta": meta})
+                print(f"📄 [{len(results)}/{len(pending)}] {meta.get('status')} {record['url']}")
+            if bundle:
+                from bundle import write_bundle
+                fmt = BundleFormat.tgz if bundle.endswith(('.tgz', '.tar.gz')) else BundleFormat.zip
+                stats = write_bundle(results, bundle, fmt, crawler.asset_path if crawler else local_asset)
+                print(f"📦 Bundle written: {bundle} ({stats['pages']} pages, {stats['assets']} assets)")
         finally:
-            await crawler.close()
+            for f in (sink, done_log):
+                if f:
+                    f.close()
+            if crawler:
+                await crawler.close()
+        return results
 
+    if resume:
+        done_file.parent.mkdir(parents=True, exist_ok=True)
     method = "trafilatura" if use_trafilatura else "readability-lxml"
-    print(f"🚀 [bold green]Starting crawl for '{url}' using {method}...[/bold green]")
-    asyncio.run(run_crawl())
+    label = f"'{targets[0]}'" if len(targets) == 1 else f"{len(pending)} URLs ({len(targets) - len(pending)} already done)"
+    via = f"via {server_url}" if server_url else "in-process"
+    print(f"🚀 [bold green]Starting crawl for {label} using {method} ({via})...[/bold green]")
+    started = time.perf_counter()
+    try:
+        results = asyncio.run(run_crawl())
+    except httpx.HTTPError as e:
+        if not server_url:
+            raise
+        print(f"❌ [bold red]Server {server_url} failed: {e}. Re-run to resume, or pass --local.[/bold red]")
+        raise typer.Exit(1)
+    if len(targets) > 1:
+        _summarize(results, len(targets) - len(pending), time.perf_counter() - started)
+    if timings:
+        _report_timings(timing, via)
     print("✅ [bold green]Crawl finished.[/bold green]")
 
 
+@app.command()
+def crawl(
+    urls: List[str] = typer.Argument(..., help="Start URL(s); their hosts define the crawl scope."),
+    output: str = typer.Option("crawl.jsonl", "--output", "-o", help="JSONL file receiving one result per line."),
+    max_pages: int = typer.Option(100, "--max-pages", help="Page budget."),
+    max_depth: int = typer.Option(3, "--max-depth", help="Maximum link hops from a start URL or sitemap entry."),
+    sitemap: bool = typer.Option(True, "--sitemap/--no-sitemap", help="Seed from robots.txt sitemaps or /sitemap.xml."),
+    sitemap_url: Optional[str] = typer.Option(None, "--sitemap-url", help="Seed from this sitemap instead of discovering one."),
+    prefix: Optional[str] = typer.Option(None, "--prefix", help="Only follow links whose path starts with this prefix."),
+    include: Optional[List[str]] = typer.Option(None, "--include", help="Only follow URLs matching this regex (repeatable)."),
+    exclude: Optional[List[str]] = typer.Option(None, "--exclude", help="Never follow URLs matching this regex (repeatable)."),
+    concurrency: int = typer.Option(4, "--concurrency", "-c", help="Pages fetched in parallel."),
+    resume: bool = typer.Option(True, "--resume/--restart", help="Continue from the checkpoint next to the output file."),
+    robots: bool = typer.Option(True, "--robots/--ignore-robots", help="Respect robots.txt disallow rules."),
+    mode: FetchMode = typer.Option(FetchMode.auto, "--mode", help="browser | auto (plain HTTP first, browser when needed) | http"),
+    no_embed: bool = typer.Option(True, "--no-embed/--embed", help="Keep image URLs instead of embedding images."),
+    store_dir: Optional[str] = typer.Option(None, "--store-dir", help="Persistent content store directory (enables incremental re-crawls)."),
+):
+    """从起始URL与sitemap出发，在页数与深度预算内抓取整个站点，结果逐行写入JSONL，可中断后继续。"""
+    import json
+    from pathlib import Path
+    from core import WebCrawler
+    from site_crawl import CheckpointError, SiteCrawler
+
+    out_path = Path(output)
+    checkpoint = out_path.with_name(out_path.name + ".checkpoint.json")
+    done_urls = set()
+    if resume and out_path.exists():
+        with out_path.open(encoding='utf-8') as f:
+            for line in f:
+                try:
+                    done_urls.add(json.loads(line)["url"])
+                except (ValueError, KeyError):
+                    pass  # 中断时写了一半的行
+    elif not resume:
+        out_path.unlink(missing_ok=True)
+        checkpoint.unlink(missing_ok=True)
+    torn_line = False
+    if out_path.exists() and out_path.stat().st_size:
+        with out_path.open('rb') as f:
+            f.seek(-1, 2)
+            torn_line = f.read(1) != b'\n'
+    config = CrawlerConfig(fetch_mode=mode, embed_images=not no_embed)
+
+    async def run_crawl():
+        crawler = WebCrawler(store_dir=store_dir)
+        site = SiteCrawler(crawler, urls, config, max_pages=max_pages, max_depth=max_depth,
+                           sitemap=sitemap_url or sitemap, path_prefix=prefix, include=include, exclude=exclude,
+                           concurrency=concurrency, respect_robots=robots, checkpoint=str(checkpoint))
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with out_path.open('a', encoding='utf-8') as f:
+                if torn_line:
+                    f.write('\n')
+                async for page in site.run(resume=resume, done_urls=done_urls):
+                    f.write(json.dumps(page.to_dict(), ensure_ascii=False) + '\n')
+                    f.flush()
+                    print(f"📄 [{site.stats['pages']}/{max_pages}] depth {page.meta['depth']} {page.url}")
+        finally:
+            await crawler.close()
+        return site.stats
+
+    print(f"🕸️ [bold green]Crawling {', '.join(urls)} (max {max_pages} pages, depth {max_depth})...[/bold green]")
+    try:
+        stats = asyncio.run(run_crawl())
+    except CheckpointError as e:
+        print(f"❌ [bold red]{e}. Pass --restart to start over, or use another --output.[/bold red]")
+        raise typer.Exit(1)
+    print(f"✅ [bold green]Crawl finished: {stats['pages']} pages ({stats['failed']} failed, "
+          f"{stats['duplicates']} duplicates) → {output}[/bold green]")
+
+
 if __name__ == "__main__":
     app()
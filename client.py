@@ -1,9 +1,49 @@
 # client.py
+import json
+import os
+import time
 import httpx
-from typing import List, Optional
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
 from dataclasses import dataclass
 from enum import Enum
 
+# `webresearch serve` 在此登记自己的地址，CLI据此把任务交给已预热的服务
+SERVER_FILE = Path(os.environ.get("WEBRESEARCH_SERVER_FILE", Path.home() / ".webresearch" / "server.json"))
+
+
+def register_server(port: int, host: str = "127.0.0.1") -> Path:
+    """写入服务登记文件（原子替换）；同一台机器上后启动的服务覆盖先前的登记"""
+    SERVER_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = SERVER_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"pid": os.getpid(), "url": f"http://{host}:{port}", "started_at": time.time()}))
+    os.replace(tmp, SERVER_FILE)
+    return SERVER_FILE
+
+
+def unregister_server():
+    """服务退出时删除登记文件（仅当仍是本进程的登记）"""
+    try:
+        if json.loads(SERVER_FILE.read_text()).get("pid") == os.getpid():
+            SERVER_FILE.unlink()
+    except (OSError, ValueError):
+        pass
+
+
+def discover_server(url: Optional[str] = None, timeout: float = 0.5) -> Optional[str]:
+    """查找正在运行的服务：指定的url或WEBRESEARCH_SERVER环境变量优先，其次为登记文件；
+    /healthz无响应时返回None（登记文件可能是崩溃后遗留的）。不用os.kill探测进程：Windows上它会结束进程"""
+    url = url or os.environ.get("WEBRESEARCH_SERVER")
+    if not url:
+        try:
+            url = json.loads(SERVER_FILE.read_text())["url"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+    try:
+        return url.rstrip("/") if httpx.get(f"{url.rstrip('/')}/healthz", timeout=timeout).status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
 class OutputFormat(str, Enum):
     html = "html"
     text = "text"
@@ -50,6 +90,41 @@ class WebResearchClient:
             response.raise_for_status()
             return response.json()
 
+    async def search_multi(self, queries: List[str], max_results: int = 3, fulltext: bool = False, config: Optional[CrawlerConfig] = None):
+        """并行执行多个查询，返回按URL去重合并后的结果（fulltext时为各页面的完整结果）"""
+        config = config or CrawlerConfig()
+        async with httpx.AsyncClient(timeout=None) as client:
+            response = await client.post(f"{self.base_url}/search/multi", json={
+                "queries": queries, "max_results": max_results, "fulltext": fulltext, "config": config.__dict__})
+            response.raise_for_status()
+            return response.json()["results"]
+
+    async def read_stream(self, urls: List[str], config: Optional[CrawlerConfig] = None) -> AsyncIterator[Dict[str, Any]]:
+        """逐个产出已完成URL的结果（url/title/content/meta），顺序为完成顺序"""
+        config = config or CrawlerConfig()
+        async with httpx.AsyncClient(timeout=None) as client:
+            async with client.stream("POST", f"{self.base_url}/read/stream", json={"urls": urls, "config": config.__dict__}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+
+    async def search_stream(self, query: str, max_results: int = 5, config: Optional[CrawlerConfig] = None) -> AsyncIterator[Dict[str, Any]]:
+        """搜索并逐个产出每条结果的全文"""
+        config = config or CrawlerConfig()
+        async with httpx.AsyncClient(timeout=None) as client:
+            async with client.stream("GET", f"{self.base_url}/search/stream", params={
+                "query": query,
+                "max_results": max_results,
+                **config.__dict__
+            }) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+
 # Example usage:
 # client = WebResearchClient()
-# results = asyncio.run(client.search("AI最新进展", max_results=3, fulltext=True))
\ No newline at end of file
+# results = asyncio.run(client.search("AI最新进展", max_results=3, fulltext=True))
+# async for page in client.read_stream(["https://example.com", "https://example.org"]):
+#     print(page["url"], page["meta"]["elapsed_ms"])
\ No newline at end of file
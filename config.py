@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+config.py - Crawler configuration model for BeepSeq WebResearch.
+Kept free of browser, extraction and web-framework imports so the CLI and
+the HTTP client can build and serialize a config without loading core.
+"""
+import hashlib
+import json
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from executor import MAX_WORKERS, ExecutorKind
+from image_processing import ImageFormat, ImageMode
+
+# 不影响输出内容的配置字段，不参与缓存指纹
+CACHE_NEUTRAL_FIELDS = {'no_cache', 'save_html', 'save_markdown', 'output_dir', 'cache_ttl',
+                        'fetch_mode', 'min_content_chars', 'detect_challenges',
+                        'executor', 'executor_workers', 'extract_timeout',
+                        'capture_images', 'block_trackers', 'block_types', 'block_urls', 'block_images', 'block_third_party_frames',
+                        'ready_budget', 'ready_quiet_ms', 'max_scrolls', 'strip_boilerplate', 'dedup_session'}
+
+class OutputFormat(str, Enum):
+    html = "html"
+    text = "text"
+    markdown = "markdown"
+
+class FetchMode(str, Enum):
+    browser = "browser"
+    auto = "auto"
+    http = "http"
+
+class CrawlerConfig(BaseModel):
+    output_format: OutputFormat = Field(default=OutputFormat.markdown, description="Output format: markdown or html")
+    include_comments: bool = Field(default=True)
+    include_tables: bool = Field(default=True)
+    include_images: bool = Field(default=True)
+    include_links: bool = Field(default=True)
+    favor_recall: bool = Field(default=True)
+    deduplicate: bool = Field(default=True)
+    strip_boilerplate: bool = Field(default=False, description="Markdown: drop paragraphs repeated on 3+ pages of the same host within one batch or crawl (headings, code and short lines are kept)")
+    dedup_session: Optional[str] = Field(default=None, max_length=128, description="Share duplicate detection and boilerplate counts across /read and /search calls that pass the same id (kept for 30 minutes after last use)")
+    with_metadata: bool = Field(default=True)
+    no_cache: bool = Field(default=False)
+    save_html: bool = Field(default=False)
+    save_markdown: bool = Field(default=False)
+    output_dir: str = Field(default="output")
+    embed_images: bool = Field(default=False, description="Embed images as data: URIs into output")
+    use_readability: bool = Field(default=True, description="Use readability-lxml; set false to use trafilatura")
+    fetch_mode: FetchMode = Field(default=FetchMode.browser, description="browser: always render; auto: plain HTTP first, escalate to the browser when needed; http: never render")
+    min_content_chars: int = Field(default=200, description="auto mode: escalate to the browser when the HTTP extraction is shorter than this")
+    detect_challenges: bool = Field(default=True, description="auto mode: escalate on bot-challenge or JS-shell markers")
+    cache_ttl: int = Field(default=86400, description="Seconds a stored page is served without revalidation")
+    image_max_dimension: Optional[int] = Field(default=None, description="Downscale embedded images so the longest side fits (needs Pillow)")
+    image_format: ImageFormat = Field(default=ImageFormat.original, description="Re-encode embedded images: original, webp or jpeg (needs Pillow)")
+    image_quality: int = Field(default=80, ge=1, le=100, description="WebP/JPEG quality for re-encoded images")
+    image_min_dimension: int = Field(default=0, description="Skip tracking pixels and icons smaller than this on either side (needs Pillow)")
+    image_max_bytes: Optional[int] = Field(default=None, description="Per-image budget in embedded bytes; larger images keep their original URL")
+    image_budget_bytes: Optional[int] = Field(default=None, description="Per-document budget for embedded image bytes")
+    collect_links: bool = Field(default=False, description="Record the page's outgoing http(s) links in meta['links'] (used by site crawls)")
+    image_mode: ImageMode = Field(default=ImageMode.inline, description="inline: data: URIs; assets: hash-named files under <output_dir>/assets, written once and referenced by path")
+    asset_base_url: Optional[str] = Field(default=None, description="assets mode: prefix for image references (default: relative 'assets/'; use '/assets/' for the server endpoint)")
+    executor: Optional[ExecutorKind] = Field(default=None, description="Where extraction runs: process or thread pool (default: crawler setting)")
+    executor_workers: Optional[int] = Field(default=None, ge=1, le=MAX_WORKERS, description="Extraction pool size, at most the CPU count (default: crawler setting)")
+    extract_timeout: Optional[float] = Field(default=None, gt=0, description="Per-task extraction timeout in seconds (default: crawler setting)")
+    capture_images: bool = Field(default=True, description="Browser: reuse the image bytes the browser already loaded instead of downloading them again")
+    block_trackers: bool = Field(default=False, description="Browser: block requests to built-in ad/analytics/tracker hosts")
+    block_types: str = Field(default="", description="Browser: comma-separated resource types to block (Font, Media, Image, Stylesheet, Script, ...)")
+    block_urls: Optional[str] = Field(default=None, description="Browser: comma-separated URL wildcard patterns to block, e.g. *://*.example-cdn.com/*")
+    block_images: bool = Field(default=False, description="Browser: block image loads while rendering (same as adding Image to block_types)")
+    block_third_party_frames: bool = Field(default=False, description="Browser: block iframes from other hosts")
+    ready_budget: float = Field(default=10.0, ge=0, description="Browser: max seconds to wait for network/DOM quiescence and lazy-load scrolling")
+    ready_quiet_ms: int = Field(default=500, ge=50, description="Browser: network idle and DOM mutation quiet time that counts as settled")
+    max_scrolls: int = Field(default=25, ge=0, description="Browser: max viewport scrolls to trigger lazy loading")
+
+    def fingerprint(self) -> str:
+        """影响输出内容的配置字段指纹，与URL一起组成缓存键"""
+        # assets模式下结果引用output_dir中的文件，目录不同则不能复用
+        neutral = CACHE_NEUTRAL_FIELDS - {'output_dir'} if self.image_mode == ImageMode.assets else CACHE_NEUTRAL_FIELDS
+        relevant = self.model_dump(mode='json', exclude=neutral)
+        return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:16]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+content_store.py - Persistent on-disk content store for BeepSeq WebResearch.
+SQLite index keyed by (URL, config fingerprint) plus zlib-compressed,
+content-addressed blobs, with HTTP validators for conditional revalidation.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    source_hash TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    title TEXT,
+    meta TEXT,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_url ON pages(url);
+"""
+
+
+def sha256(data: str) -> str:
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class StoredPage:
+    url: str
+    content: str
+    title: str
+    content_hash: str
+    source_hash: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+    expires_at: float = 0.0
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified or self.source_hash)
+
+
+class ContentStore:
+    def __init__(self, root: str = ".webresearch/store"):
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.root / "index.sqlite3", check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str, fingerprint: str) -> str:
+        return sha256(f"{url}\0{fingerprint}")
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.blobs / content_hash[:2] / f"{content_hash}.z"
+
+    def get(self, key: str) -> Optional[StoredPage]:
+        """按键读取页面；索引存在但blob丢失时视为未命中"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT url, content_hash, source_hash, etag, last_modified, title, meta, fetched_at, expires_at "
+                "FROM pages WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        url, content_hash, source_hash, etag, last_modified, title, meta, fetched_at, expires_at = row
+        try:
+            content = zlib.decompress(self._blob_path(content_hash).read_bytes()).decode('utf-8')
+        except (OSError, zlib.error):
+            return None
+        return StoredPage(url, content, title or "", content_hash, source_hash, etag, last_modified,
+                          fetched_at, expires_at, json.loads(meta or "{}"))
+
+    def put(self, key: str, fingerprint: str, page: StoredPage, ttl: float):
+        """写入页面；相同内容的blob只落盘一次"""
+        blob = self._blob_path(page.content_hash)
+        if not blob.exists():
+            blob.parent.mkdir(exist_ok=True)
+            # 临时文件名按进程与线程区分：多个线程同时写入相同内容（如空页面）时互不覆盖
+            tmp = blob.with_name(f"{blob.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(zlib.compress(page.content.encode('utf-8'), 6))
+            tmp.replace(blob)
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, page.url, fingerprint, page.content_hash, page.source_hash, page.etag,
+                 page.last_modified, page.title, json.dumps(page.meta, default=str), now, now + ttl))
+
+    def touch(self, key: str, ttl: float, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """重新验证未变化后续期，并刷新服务端返回的新校验器"""
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE pages SET fetched_at = ?, expires_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                (now, now + ttl, etag, last_modified, key))
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            entries, blobs = self.db.execute("SELECT COUNT(*), COUNT(DISTINCT content_hash) FROM pages").fetchone()
+        return {"entries": entries, "blobs": blobs}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -6,96 +6,213 @@ Handles web crawling, content extraction, and image embedding.
 from enum import Enum
 import asyncio
 import nodriver as uc
-import trafilatura
-from dataclasses import dataclass
-from cachetools import LRUCache
-from fastapi import FastAPI, HTTPException, Query, Body, Depends, Request
-from fastapi.responses import JSONResponse
-from fastapi_mcp import FastApiMCP
-from fastapi.middleware.cors import CORSMiddleware
-from ddgs.ddgs import DDGS
-from asyncio import Lock, Semaphore
+import time
+from dataclasses import dataclass, field, replace, asdict
+from contextlib import nullcontext
+from cachetools import LRUCache, TTLCache
+from asyncio import Semaphore
 import os
 import re
-import base64
+import json
+import io
 import mimetypes
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
-from typing import Dict, Tuple, List, Optional, Union
+from urllib.parse import urlparse
+from typing import Any, AsyncIterator, Dict, Tuple, List, Optional, Union
 
 from pydantic import BaseModel, Field
 
-import requests
-from readability import Document
-import markdownify
-import html2text
 import httpx
-import browser_cookie3
 
 from alive_progress import alive_bar, config_handler
 
+from blocking import BlockPolicy, RequestBlocker
+from browser_pool import BrowserPool, BrowserCrashed
+from bundle import BundleFormat, write_bundle
+from config import CrawlerConfig, FetchMode, OutputFormat
+from image_source import BrowserImageCapture, ImageCache, ImageData, cookie_header
+from content_store import ContentStore, StoredPage, sha256
+from dedup import DuplicateIndex, clean_url, find_canonical, simhash
+from extraction import Extracted, extract_content, extract_links, embed_images
+from image_processing import ImageMode, ImagePolicy, encode_images
+from executor import BoundedExecutor, ExecutorKind
+from jobs import JobManager, JobQueueFull
+from scheduler import HostScheduler
+from search import SearchHit, SearchProvider, SearchService
+from site_crawl import SiteCrawler
+from metrics import Registry, StageTimer
+from readiness import NetworkIdle, ReadyPolicy, wait_until_ready
+
 config_handler.set_global(spinner='dots', bar='smooth')
 
-class OutputFormat(str, Enum):
-    html = "html"
-    text = "text"
-    markdown = "markdown"
-
-class CrawlerConfig(BaseModel):
-    output_format: OutputFormat = Field(default=OutputFormat.markdown, description="Output format: markdown or html")
-    include_comments: bool = Field(default=True)
-    include_tables: bool = Field(default=True)
-    include_images: bool = Field(default=True)
-    include_links: bool = Field(default=True)
-    favor_recall: bool = Field(default=True)
-    deduplicate: bool = Field(default=True)
-    with_metadata: bool = Field(default=True)
-    no_cache: bool = Field(default=False)
-    save_html: bool = Field(default=False)
-    save_markdown: bool = Field(default=False)
-    output_dir: str = Field(default="output")
-    embed_images: bool = Field(default=False, description="Embed images as data: URIs into output")
-    use_readability: bool = Field(default=True, description="Use readability-lxml; set false to use trafilatura")
+DEFAULT_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36")
+
+# 反爬挑战页的强特征：出现即升级到浏览器
+CHALLENGE_MARKERS = ('cf-browser-verification', 'challenge-platform', '__cf_chl_', '<title>just a moment',
+                     'ddos-guard', 'px-captcha', 'g-recaptcha', 'h-captcha', 'datadome')
+# JS外壳页的弱特征：仅在正文偏短时生效，正常页面的<noscript>里也常见
+JS_SHELL_MARKERS = ('enable javascript', 'javascript is disabled', 'requires javascript',
+                    'id="root"></div>', 'id="app"></div>', 'id="__next"></div>')
+
+# auto模式：只有这些原因说明整个站点需要浏览器；连续出现BROWSER_HOST_STRIKES次后在一段时间内直接渲染
+STICKY_ESCALATIONS = ("bot challenge", "js shell")
+BROWSER_HOST_STRIKES = 3
+BROWSER_HOST_TTL = 1800
+DEDUP_SESSION_TTL = 1800
+
+ASSET_NAME = re.compile(r'[0-9a-f]{64}\.[a-z0-9]+')
+
+class StreamFormat(str, Enum):
+    ndjson = "ndjson"
+    sse = "sse"
 
 class ReadRequest(BaseModel):
     urls: List[str] = Field(..., description="List of webpage URLs to read")
     config: Optional[CrawlerConfig] = Field(default=None, description="Optional crawler config to override defaults")
 
+class MultiSearchRequest(BaseModel):
+    queries: List[str] = Field(..., description="Search queries to run in parallel; results are merged and deduplicated by URL")
+    max_results: int = Field(default=3, description="Maximum number of results per query")
+    fulltext: bool = Field(default=False, description="Read every merged result and return its Markdown")
+    config: Optional[CrawlerConfig] = Field(default=None, description="Optional crawler config to override defaults")
+
+class SiteCrawlRequest(BaseModel):
+    urls: List[str] = Field(..., description="Start URL(s); their hosts define the crawl scope")
+    max_pages: int = Field(default=50, ge=1, le=10000, description="Page budget")
+    max_depth: int = Field(default=2, ge=0, description="Follow links at most this many hops from a start URL or sitemap entry")
+    sitemap: Union[bool, str] = Field(default=True, description="Seed from sitemaps (robots.txt or /sitemap.xml), or the URL of a specific sitemap")
+    path_prefix: Optional[str] = Field(default=None, description="Only follow links whose path starts with this prefix")
+    include: List[str] = Field(default_factory=list, description="Only follow URLs matching one of these regexes")
+    exclude: List[str] = Field(default_factory=list, description="Never follow URLs matching one of these regexes")
+    concurrency: int = Field(default=4, ge=1, le=32, description="Pages fetched in parallel")
+    config: Optional[CrawlerConfig] = Field(default=None, description="Optional crawler config to override defaults")
+
+class JobRequest(ReadRequest):
+    priority: int = Field(default=0, description="Higher priority jobs are started first")
+
+@dataclass
+class PageResult:
+    url: str
+    content: str
+    title: str = ""
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+@dataclass
+class RenderedPage:
+    """一次浏览器渲染的产物；images/cookies仅在需要内嵌图像时采集"""
+    html: str
+    user_agent: str
+    headers: Dict[str, str]
+    blocking: Dict[str, int]
+    images: Dict[str, ImageData] = field(default_factory=dict)
+    cookies: List[Any] = field(default_factory=list)
+    readiness: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class Flight:
+    """一次进行中的抓取及其等待者数量"""
+    task: asyncio.Future
+    waiters: int = 0
+
 class WebCrawler:
-    def __init__(self, max_cache=256, max_concurrency=20):
-        self.browser = None
+    def __init__(self, max_cache=256, max_concurrency=20, pool_size=1, tabs_per_browser=5,
+                 max_pages_per_browser=200, max_browser_rss_mb=None, page_timeout=60.0, http_timeout=15.0,
+                 store_dir=None, executor=ExecutorKind.process, executor_workers=None, executor_queue=None,
+                 extract_timeout=30.0, host_rate=4.0, host_concurrency=8, max_retries=3,
+                 search_provider: Optional[SearchProvider] = None, search_ttl=3600, image_cache_mb=64):
+        self.pool = BrowserPool(size=pool_size, tabs_per_browser=tabs_per_browser,
+                                max_pages_per_browser=max_pages_per_browser, max_rss_mb=max_browser_rss_mb)
+        self.page_timeout = page_timeout
+        self.http_timeout = http_timeout
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.host_paths = TTLCache(maxsize=4096, ttl=BROWSER_HOST_TTL)  # host -> "browser"，到期后重新尝试HTTP
+        self.host_strikes = LRUCache(maxsize=4096)  # host -> 连续因挑战页/JS外壳升级的次数
         self.config = None  # Will be set during crawl
-        self.cache = LRUCache(maxsize=max_cache)
-        self.lock = Lock()
+        self.cache = LRUCache(maxsize=max_cache)  # (url, config指纹) -> PageResult
+        self.dedup_sessions = TTLCache(maxsize=256, ttl=DEDUP_SESSION_TTL)  # dedup_session -> DuplicateIndex
+        self.inflight: Dict[Tuple[str, str, bool], Flight] = {}
+        self.store = ContentStore(store_dir) if store_dir else None
+        self.executor_kind = ExecutorKind(executor)
+        self.executor_workers = executor_workers
+        self.executor_queue = executor_queue
+        self.extract_timeout = extract_timeout
+        self.executors: Dict[Tuple[ExecutorKind, Optional[int]], BoundedExecutor] = {}
         self.semaphore = Semaphore(max_concurrency)
+        # 页面加载、HTTP抓取与图像下载共用的按主机限速/限并发调度器
+        self.scheduler = HostScheduler(rate=host_rate, max_concurrency=host_concurrency, max_retries=max_retries)
+        self.searcher = SearchService(search_provider, ttl=search_ttl)
+        # assets模式写入过的资源目录（有序），/assets/{name}按顺序查找
+        self.asset_dirs: Dict[str, None] = {str(Path(CrawlerConfig().output_dir).resolve() / "assets"): None}
+        self.image_cache = ImageCache(max_bytes=int(image_cache_mb * 1024 * 1024))  # 图像URL -> (字节, MIME)，跨页面共享
+        self.started_at = time.time()
+        self.registry = Registry()
+        self._init_metrics()
+
+    def _init_metrics(self):
+        """进程级指标；回调型指标在抓取/metrics时才读取状态，热路径上只有字典计数"""
+        r = self.registry
+        self.m_pages = r.counter("webresearch_pages_total", "URLs processed, by status", ("status",))
+        self.m_page_seconds = r.histogram("webresearch_page_seconds", "End-to-end time per URL")
+        self.m_stage_seconds = r.histogram("webresearch_stage_seconds", "Time spent per pipeline stage", ("stage",))
+        self.m_cache = r.counter("webresearch_cache_lookups_total",
+                                 "Page lookups by result (memory, joined, store, revalidated, miss)", ("result",))
+        self.m_paths = r.counter("webresearch_fetch_path_total", "Fetched pages by path (http, browser, escalated)", ("path",))
+        self.m_images = r.counter("webresearch_images_total", "Images by outcome", ("outcome",))
+        self.m_image_bytes = r.counter("webresearch_image_bytes_total", "Image bytes downloaded and embedded", ("stage",))
+        self.m_duplicates = r.counter("webresearch_duplicates_total", "Results collapsed as duplicates (url, canonical, near)", ("kind",))
+        self.m_boilerplate = r.counter("webresearch_boilerplate_blocks_removed_total", "Paragraphs stripped as per-host boilerplate")
+        self.m_image_sources = r.counter("webresearch_image_sources_total", "Acquired images by source (browser, cache, http)", ("source",))
+        self.m_blocked = r.counter("webresearch_blocked_requests_total", "Browser requests blocked, by resource type or reason", ("reason",))
+        self.m_transferred = r.counter("webresearch_render_transferred_bytes_total", "Bytes the browser transferred while rendering pages")
+        self.m_ready = r.counter("webresearch_render_ready_total", "Browser renders by readiness stop reason (ready, budget, max_scrolls, unavailable)", ("reason",))
+        r.gauge("webresearch_uptime_seconds", "Seconds since the crawler started", fn=lambda: round(time.time() - self.started_at, 1))
+        r.gauge("webresearch_pages_in_flight", "Distinct pages currently being fetched", fn=lambda: len(self.inflight))
+        r.gauge("webresearch_memory_cache_entries", "Pages in the in-memory cache", fn=lambda: len(self.cache))
+        r.gauge("webresearch_image_cache_bytes", "Bytes held by the shared image cache", fn=lambda: self.image_cache.cache.currsize)
+        r.gauge("webresearch_browser_tabs", "Browser tabs by state", ("state",), fn=lambda: {
+            ("active",): sum(s["active_tabs"] for s in self.pool.stats()),
+            ("idle",): sum(s["idle_tabs"] for s in self.pool.stats())})
+        r.gauge("webresearch_browser_restarts_total", "Browser restarts by reason", ("reason",), kind="counter", fn=lambda: {
+            ("recycle",): sum(s["recycles"] for s in self.pool.stats()),
+            ("crash",): sum(s["crashes"] for s in self.pool.stats())})
+        r.gauge("webresearch_extraction_queue_depth", "Extraction tasks queued or running", ("executor",), fn=lambda: {
+            (f"{kind.value}:{workers or 'auto'}",): e.pending for (kind, workers), e in self.executors.items()})
+        r.gauge("webresearch_extraction_timeouts_total", "Extraction tasks killed by the timeout", kind="counter",
+                fn=lambda: sum(e.timeouts for e in self.executors.values()))
+        r.gauge("webresearch_host_throttled_total", "429/503 responses across all hosts", kind="counter",
+                fn=lambda: sum(h["throttled"] for h in self.scheduler.stats().values()))
 
-    def _extract_images_from_html(self, html_content: str, base_url: str) -> List[Dict[str, str]]:
-        """从HTML中提取图像信息"""
-        img_pattern = r'<img[^>]*>'
-        images = []
-        
-        for img_tag in re.finditer(img_pattern, html_content, re.IGNORECASE):
-            tag_content = img_tag.group(0)
-            
-            src_match = re.search(r'src=["\']([^"\']*)["\']', tag_content, re.IGNORECASE)
-            if not src_match or src_match.group(1).startswith('data:image'):
-                continue
-            
-            src = src_match.group(1)
-            
-            alt_match = re.search(r'alt=["\']([^"\']*)["\']', tag_content, re.IGNORECASE)
-            alt = alt_match.group(1) if alt_match else ""
-            
-            full_url = urljoin(base_url, src)
-                
-            images.append({
-                "src": src,
-                "full_url": full_url, 
-                "alt": alt,
-                "original_tag": tag_content
-            })
-        
-        return images
+    def health(self) -> Dict[str, Any]:
+        """/healthz快照：浏览器池、缓存、执行器与主机调度状态"""
+        pool = self.pool.stats()
+        return {
+            "status": "ok" if all(s["alive"] or s["active_tabs"] == 0 for s in pool) else "degraded",
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "pool": pool,
+            "cache": {"entries": len(self.cache), "max_entries": self.cache.maxsize, "in_flight": len(self.inflight)},
+            "image_cache": self.image_cache.stats(),
+            "store": self.store.stats() if self.store else None,
+            "executors": [e.stats() for e in self.executors.values()],
+            "hosts": len(self.scheduler.hosts),
+        }
+
+    def asset_path(self, name: str) -> Optional[Path]:
+        """按哈希文件名查找资源文件"""
+        if not ASSET_NAME.fullmatch(name):
+            return None
+        return next((path for d in self.asset_dirs if (path := Path(d) / name).is_file()), None)
+
+    def _asset_dir(self, config: CrawlerConfig) -> Optional[str]:
+        """assets模式的资源目录；每次请求都登记，缓存/内容库命中（包括重启后）引用的文件也能经/assets提供"""
+        if config.image_mode != ImageMode.assets:
+            return None
+        asset_dir = str(Path(config.output_dir).resolve() / "assets")
+        self.asset_dirs[asset_dir] = None
+        return asset_dir
 
     def _sanitize_filename(self, filename: str) -> str:
         """清理文件名，移除非法字符"""
@@ -103,96 +220,195 @@ class WebCrawler:
         filename = re.sub(illegal_chars, '_', filename)
         return filename[:200] if len(filename) > 200 else filename
 
-    def _extract_content(self, html_content: str, url: str, use_readability: bool) -> Tuple[str, str, str]:
-        """根据配置选择提取器提取内容"""
-        try:
-            if use_readability:
-                doc = Document(html_content)
-                title = doc.title()
-                clean_html = doc.summary()
-                h = html2text.HTML2Text()
-                h.body_width = 0
-                md_content = h.handle(clean_html)
-                return title, clean_html, md_content
-            else:
-                md_content = trafilatura.extract(html_content, include_links=True, url=url)
-                title_match = re.search(r'<title[^>]*>([^<]*)</title>', html_content, re.IGNORECASE)
-                title = title_match.group(1).strip() if title_match else 'untitled'
-                return title, html_content, md_content
-        except Exception as e:
-            print(f"⚠️ Content extraction failed: {e}")
-            title_match = re.search(r'<title[^>]*>([^<]*)</title>', html_content, re.IGNORECASE)
-            title = title_match.group(1).strip() if title_match else 'untitled'
-            return title, html_content, ""
+    def _executor_for(self, config: CrawlerConfig) -> BoundedExecutor:
+        """按(类型, 大小)复用CPU任务执行器"""
+        key = (config.executor or self.executor_kind, config.executor_workers or self.executor_workers)
+        if (executor := self.executors.get(key)) is None:
+            executor = self.executors[key] = BoundedExecutor(*key, self.executor_queue, self.extract_timeout)
+        return executor
 
-    async def _download_image(self, client: httpx.AsyncClient, img_info: Dict) -> Tuple[str, str]:
-        """使用httpx客户端并行下载单个图像"""
+    async def _run_cpu(self, config: CrawlerConfig, fn, *args):
+        """在执行器中运行CPU密集任务，避免阻塞事件循环"""
+        return await self._executor_for(config).run(fn, *args, timeout=config.extract_timeout)
+
+    async def _extract_content(self, html_content: str, url: str, config: CrawlerConfig,
+                               timer: Optional[StageTimer] = None) -> Extracted:
+        """根据配置选择提取器提取内容（单次解析，见extraction.extract_content）"""
+        if timer:
+            timer.add_size("html", len(html_content))
+            with timer.stage("extract"):
+                return await self._extract_content(html_content, url, config)
+        return await self._run_cpu(config, extract_content, html_content, url, config.use_readability, config.embed_images)
+
+    async def _download_image(self, image_url: str, headers: Dict[str, str]) -> Tuple[str, Optional[bytes], str]:
+        """用共享的HTTP客户端下载单个图像，返回(URL, 原始字节, MIME类型)"""
         async with self.semaphore:
             try:
-                response = await client.get(img_info['full_url'], timeout=30)
+                async with self.scheduler.slot(image_url, kind="image") as ticket:
+                    response = await self._get_http_client().get(image_url, headers=headers, timeout=30)
+                    ticket.observe(response.status_code, response.headers.get('retry-after'))
                 response.raise_for_status()
-                content = await response.aread()
-                return img_info['full_url'], base64.b64encode(content).decode('utf-8')
+                content_type = response.headers.get('content-type', '').split(';')[0].strip()
+                mime_type = content_type if content_type.startswith('image/') else self._get_mime_type(image_url)
+                return image_url, response.content, mime_type
             except Exception:
                 pass
-        return img_info['full_url'], None
+        return image_url, None, ''
+
+    async def _acquire_image(self, image_url: str, rendered: Optional[RenderedPage], headers: Dict[str, str]
+                             ) -> Tuple[str, Optional[bytes], str, str]:
+        """依次从渲染时捕获的响应、跨页面缓存、HTTP下载取得图像，返回(URL, 字节, MIME, 来源)"""
+        if rendered and (item := rendered.images.get(image_url)):
+            source = "browser"
+        elif item := self.image_cache.get(image_url):
+            return image_url, *item, "cache"
+        else:
+            if rendered and (cookies := cookie_header(rendered.cookies, image_url)):
+                headers = {**headers, 'Cookie': cookies}
+            _, data, mime_type = await self._download_image(image_url, headers)
+            if not data:
+                return image_url, None, '', "http"
+            item, source = (data, mime_type), "http"
+        self.image_cache.put(image_url, *item)
+        return image_url, *item, source
     
     def _get_mime_type(self, image_url: str) -> str:
         """根据URL推断MIME类型，提供默认值"""
         ext = os.path.splitext(urlparse(image_url).path)[1].lower()
         return mimetypes.types_map.get(ext, 'application/octet-stream')
 
-    def _replace_image_src(self, content: str, img_info: Dict, data_uri: str) -> str:
-        """在HTML或Markdown内容中替换图像src为data URI"""
-        return content.replace(img_info['src'], data_uri).replace(img_info['full_url'], data_uri)
+    @staticmethod
+    def _image_policy(config: CrawlerConfig) -> ImagePolicy:
+        return ImagePolicy(config.image_max_dimension, config.image_format, config.image_quality,
+                           config.image_min_dimension, config.image_max_bytes, config.image_budget_bytes)
 
     async def fetch(self, url: str, config: CrawlerConfig):
         """核心抓取与处理方法"""
-        if not config.no_cache and (cached := self.cache.get(url)):
-            return cached
-        
-        page = None
+        return (await self.fetch_page(url, config)).content
+
+    async def fetch_page(self, url: str, config: CrawlerConfig) -> PageResult:
+        """抓取并处理单个URL，返回内容及元数据；相同(URL, 配置指纹)的并发请求共享同一次抓取"""
+        fingerprint = config.fingerprint()
+        self._asset_dir(config)
+        if not config.no_cache and (cached := self.cache.get((url, fingerprint))):
+            self.m_cache.inc(result="memory")
+            return replace(cached, meta={**cached.meta, "cache": "memory"})
+
+        key = (url, fingerprint, config.no_cache)
+        if (flight := self.inflight.get(key)) is None:
+            flight = self.inflight[key] = Flight(asyncio.ensure_future(self._fetch_page(url, config, fingerprint)))
+            flight.task.add_done_callback(lambda _: self.inflight.pop(key, None) if self.inflight.get(key) is flight else None)
+        else:
+            self.m_cache.inc(result="joined")
+            print(f"🔗 Joining in-flight fetch for {url}")
+        flight.waiters += 1
         try:
-            page = await self.browser.get(url, new_tab=True)
-            await page.wait()
-            await page.scroll_down(1080); await page.wait(1)
-            await page.scroll_down(1080); await page.wait(1)
-            
-            original_html = await page.get_content()
-            user_agent = await page.evaluate('navigator.userAgent')
+            # shield: 单个调用方取消不影响其他仍在等待的调用方
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                # 取消后的收尾（如关闭标签页）可能持续数秒，立即移除，之后的调用方重新发起抓取而不是加入将被取消的任务
+                if self.inflight.get(key) is flight:
+                    del self.inflight[key]
 
-            title, clean_html, md_content = self._extract_content(original_html, url, config.use_readability)
+    async def _fetch_page(self, url: str, config: CrawlerConfig, fingerprint: str) -> PageResult:
+        response = None
+        timer = StageTimer(url, self.m_stage_seconds)
+        if self.store and not config.no_cache:
+            store_key = ContentStore.key(url, fingerprint)
+            with timer.stage("store_lookup"):
+                stored, response = await self._lookup_store(store_key, config)
+            if stored:
+                self.m_cache.inc(result=stored.meta["cache"])
+                stored = replace(stored, meta={**stored.meta, **timer.to_meta()})
+                self.cache[(url, fingerprint)] = stored
+                return stored
+        if not config.no_cache:
+            self.m_cache.inc(result="miss")
 
-            if config.embed_images:
-                images_info = self._extract_images_from_html(clean_html, url)
-                if images_info:
-                    cookie_file_path = Path(self.browser.config.user_data_dir) / "Default" / "Cookies"
-                    
-                    try:
-                        cj = browser_cookie3.chrome(cookie_file=str(cookie_file_path))
-                    except Exception:
-                        cj = None
-
-                    headers = {'User-Agent': user_agent, 'Referer': url}
-                    async with httpx.AsyncClient(headers=headers, cookies=cj, http2=True, verify=False) as client:
-                        tasks = [self._download_image(client, img) for img in images_info]
-                        results = await asyncio.gather(*tasks)
-                        
-                        image_map = {url: data for url, data in results if data}
-                        
-                        for img_info in images_info:
-                            if base64_data := image_map.get(img_info['full_url']):
-                                mime_type = self._get_mime_type(img_info['full_url'])
-                                data_uri = f"data:{mime_type};base64,{base64_data}"
-                                clean_html = self._replace_image_src(clean_html, img_info, data_uri)
-                                md_content = self._replace_image_src(md_content, img_info, data_uri)
-                        print(f"📊 图像嵌入统计: {len(image_map)}/{len(images_info)} 成功")
-
-            if config.save_html or config.save_markdown:
+        meta, validators = {}, {}
+        user_agent, rendered, extracted = DEFAULT_USER_AGENT, None, None
+        host = urlparse(url).netloc
+        if config.fetch_mode == FetchMode.http:
+            extracted, reason, response = await self._fetch_http(url, config, response, timer)
+            if extracted is None:
+                raise RuntimeError(f"HTTP fetch failed: {reason}")
+            meta["path"] = "http"
+        elif config.fetch_mode == FetchMode.auto and self.host_paths.get(host) != "browser":
+            extracted, reason, response = await self._fetch_http(url, config, response, timer)
+            self._remember_path(host, reason)
+            if reason:
+                extracted = None
+                meta["escalated"] = reason
+                print(f"🔼 Escalating {url} to browser: {reason}")
+            else:
+                meta["path"] = "http"
+        if extracted is not None:
+            source_html = response.text
+            validators = {"etag": response.headers.get("etag"),
+                          "last_modified": response.headers.get("last-modified"),
+                          "source_hash": sha256(response.text)}
+
+        if extracted is None:
+            rendered = await self._render(url, timer, self._block_policy(config),
+                                          capture_images=config.embed_images and config.capture_images,
+                                          ready=ReadyPolicy(config.ready_budget, config.ready_quiet_ms, config.max_scrolls))
+            user_agent, meta["blocking"], meta["readiness"] = rendered.user_agent, rendered.blocking, rendered.readiness
+            extracted = await self._extract_content(rendered.html, url, config, timer)
+            meta["path"] = "browser"
+            source_html = rendered.html
+            validators = {"etag": rendered.headers.get("etag"), "last_modified": rendered.headers.get("last-modified")}
+        title, clean_html, md_content, images_info = extracted
+        clean_html, md_content = clean_html or "", md_content or ""
+        if canonical := find_canonical(source_html, url):
+            meta["canonical"] = canonical
+        if config.collect_links:
+            meta["links"] = await self._run_cpu(config, extract_links, source_html, url)
+
+        if config.embed_images and images_info:
+            headers = {'User-Agent': user_agent, 'Referer': url}
+            image_urls = list(dict.fromkeys(img['full_url'] for img in images_info))
+            with timer.stage("image_download"):
+                results = await asyncio.gather(*(self._acquire_image(u, rendered, headers) for u in image_urls))
+
+            # 缩放/重编码/base64均为CPU密集操作，放到事件循环之外
+            downloaded = [(image_url, data, mime_type) for image_url, data, mime_type, _ in results if data]
+            sources = {}
+            for _, data, _, source in results:
+                if data:
+                    sources[source] = sources.get(source, 0) + 1
+            asset_dir = self._asset_dir(config)
+            with timer.stage("image_encode"):
+                image_map, image_stats = await self._run_cpu(config, encode_images, downloaded, self._image_policy(config),
+                                                             asset_dir, config.asset_base_url or "assets/")
+            replacements = {}
+            for img_info in images_info:
+                if new_src := image_map.get(img_info['full_url']):
+                    replacements[img_info['src']] = replacements[img_info['full_url']] = new_src
+            with timer.stage("image_rewrite"):
+                clean_html, md_content = await self._run_cpu(config, embed_images, clean_html, md_content, replacements)
+            meta["images"] = {"found": len(image_urls), "downloaded": len(downloaded), "sources": sources, **image_stats}
+            timer.add_size("images_downloaded", image_stats["bytes_before"])
+            timer.add_size("images_embedded", image_stats["bytes_after"])
+            self.m_images.inc(len(downloaded), outcome="downloaded")
+            self.m_images.inc(len(image_urls) - len(downloaded), outcome="failed")
+            for source, count in sources.items():
+                self.m_image_sources.inc(count, source=source)
+            for outcome in ("embedded", "skipped_small", "over_budget"):
+                self.m_images.inc(image_stats[outcome], outcome=outcome)
+            self.m_image_bytes.inc(image_stats["bytes_before"], stage="downloaded")
+            self.m_image_bytes.inc(image_stats["bytes_after"], stage="embedded")
+            print(f"📊 图像嵌入统计: {image_stats['embedded']}/{len(image_urls)} 成功, "
+                  f"{image_stats['bytes_before']} → {image_stats['bytes_after']} bytes")
+
+        if config.save_html or config.save_markdown:
+            with timer.stage("save"):
                 safe_title = self._sanitize_filename(title)
                 output_path = Path(config.output_dir)
                 output_path.mkdir(exist_ok=True)
-                
+
                 if config.save_html:
                     html_file = output_path / f"{safe_title}.html"
                     html_file.write_text(clean_html, encoding='utf-8')
@@ -202,58 +418,372 @@ class WebCrawler:
                     md_file.write_text(md_content, encoding='utf-8')
                     print(f"📝 Markdown saved: {md_file}")
 
-            final_content = md_content if config.output_format == OutputFormat.markdown else clean_html
-            self.cache[url] = final_content
-            return final_content
+        # 抽取器可能返回None（空页面），统一为空字符串再计算哈希与写入内容库
+        final_content = (md_content if config.output_format == OutputFormat.markdown else clean_html) or ""
+        self.m_paths.inc(path=meta["path"])
+        if "escalated" in meta:
+            self.m_paths.inc(path="escalated")
+        timer.add_size("content", len(final_content))
+        if config.deduplicate:
+            with timer.stage("fingerprint"):
+                text_hash, words = await self._run_cpu(config, simhash, final_content)
+            meta.update(simhash=f"{text_hash:016x}", words=words)
+        if self.store:
+            with timer.stage("store_put"):
+                stored = StoredPage(url, final_content, title, sha256(final_content), meta=meta, **validators)
+                await asyncio.to_thread(self.store.put, ContentStore.key(url, fingerprint), fingerprint, stored, config.cache_ttl)
+        result = PageResult(url, final_content, title, {**meta, **timer.to_meta()})
+        self.cache[(url, fingerprint)] = result
+        return result
+
+    async def _lookup_store(self, store_key: str, config: CrawlerConfig) -> Tuple[Optional[PageResult], Optional[httpx.Response]]:
+        """查询持久化存储；过期条目用条件请求重新验证，未变化则续期并跳过渲染与提取"""
+        stored = await asyncio.to_thread(self.store.get, store_key)
+        if stored is None:
+            return None, None
+        if stored.fresh:
+            return PageResult(stored.url, stored.content, stored.title, {**stored.meta, "cache": "store"}), None
+        if not stored.revalidatable:
+            return None, None
+        headers = {}
+        if stored.etag:
+            headers['If-None-Match'] = stored.etag
+        if stored.last_modified:
+            headers['If-Modified-Since'] = stored.last_modified
+        try:
+            response = await self._http_get(stored.url, headers)
+        except httpx.HTTPError:
+            return None, None
+        unchanged = response.status_code == 304 or (
+            response.status_code == 200 and stored.source_hash == sha256(response.text))
+        if not unchanged:
+            return None, response if response.status_code == 200 else None
+        await asyncio.to_thread(self.store.touch, store_key, config.cache_ttl,
+                                response.headers.get('etag'), response.headers.get('last-modified'))
+        print(f"♻️ Unchanged since last crawl: {stored.url}")
+        return PageResult(stored.url, stored.content, stored.title, {**stored.meta, "cache": "revalidated"}), None
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """共享的、带连接池的HTTP客户端"""
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                headers={'User-Agent': DEFAULT_USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'},
+                http2=True, verify=False, follow_redirects=True, timeout=self.http_timeout,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+        return self.http_client
+
+    async def _http_get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """经主机调度器发出GET；429/503按Retry-After/指数退避后重试"""
+        for attempt in range(self.scheduler.max_retries + 1):
+            async with self.scheduler.slot(url) as ticket:
+                response = await self._get_http_client().get(url, headers=headers)
+                ticket.observe(response.status_code, response.headers.get('retry-after'))
+            if not ticket.throttled:
+                break
+        return response
+
+    async def _fetch_http(self, url: str, config: CrawlerConfig, response: Optional[httpx.Response] = None,
+                          timer: Optional[StageTimer] = None
+                          ) -> Tuple[Optional[Tuple[str, str, str]], Optional[str], Optional[httpx.Response]]:
+        """普通HTTP GET + 提取；返回(提取结果, 需要升级到浏览器的原因, 响应)，可复用重新验证时已取得的响应"""
+        if response is None:
+            try:
+                with timer.stage("http_fetch") if timer else nullcontext():
+                    response = await self._http_get(url)
+            except httpx.HTTPError as e:
+                return None, f"http error: {e!r}", None
+        if response.status_code >= 400:
+            return None, f"status {response.status_code}", response
+        if 'html' not in response.headers.get('content-type', 'text/html'):
+            return None, f"content-type {response.headers['content-type']}", response
+        extracted = await self._extract_content(response.text, url, config, timer)
+        return extracted, self._escalation_reason(response.text, extracted.md_content, config), response
+
+
+    def _remember_path(self, host: str, reason: Optional[str]):
+        """auto模式记录HTTP结果：404、网络错误或单个短页面不影响站点；连续的挑战页/JS外壳才让站点暂时直接走浏览器"""
+        if not reason:
+            self.host_strikes.pop(host, None)
+        elif reason.startswith(STICKY_ESCALATIONS):
+            strikes = self.host_strikes[host] = self.host_strikes.get(host, 0) + 1
+            if strikes >= BROWSER_HOST_STRIKES:
+                self.host_paths[host] = "browser"
+                self.host_strikes.pop(host, None)
+                print(f"🧭 {host} needs the browser, skipping plain HTTP for {BROWSER_HOST_TTL // 60} min")
+
+    def _escalation_reason(self, html_content: str, md_content: str, config: CrawlerConfig) -> Optional[str]:
+        """判断HTTP结果是否需要浏览器渲染；可在子类中覆盖以自定义规则"""
+        text_len = len((md_content or "").strip())
+        if text_len < config.min_content_chars:
+            return f"content too short ({text_len} chars)"
+        if config.detect_challenges:
+            head = html_content[:65536].lower()
+            if marker := next((m for m in CHALLENGE_MARKERS if m in head), None):
+                return f"bot challenge ({marker})"
+            if text_len < 4 * config.min_content_chars and (
+                    marker := next((m for m in JS_SHELL_MARKERS if m in head), None)):
+                return f"js shell ({marker})"
+        return None
+
+    async def _render(self, url: str, timer: StageTimer, policy: BlockPolicy = BlockPolicy(),
+                      capture_images: bool = False, ready: ReadyPolicy = ReadyPolicy()) -> RenderedPage:
+        """在浏览器池中渲染页面：先取得主机名额再占用标签页，按policy拦截无用请求，按ready等待页面就绪；capture_images时
+        在归还标签页前取回已加载图像的字节与Cookie。文档返回429/503时退避重试，浏览器崩溃时自动换新实例重试一次"""
+        crashed = throttled = 0
+        while True:
+            queued_at = time.perf_counter()
+            doc_headers, doc_status = {}, []
+            navigate_at = None
+            blocker = RequestBlocker(policy, url)
+            capture = BrowserImageCapture() if capture_images else None
+            network = NetworkIdle(ready.max_inflight)
+
+            def on_response(event: uc.cdp.network.ResponseReceived):
+                if event.type_ == uc.cdp.network.ResourceType.DOCUMENT and not doc_status:
+                    doc_status.append(event.response.status)
+                    doc_headers.update({k.lower(): v for k, v in event.response.headers.items()})
+
+            async def prepare(tab):
+                ticket.started = time.monotonic()  # 延迟只计导航本身，不含等待标签页的时间
+                timer.add("queue", time.perf_counter() - queued_at)
+                nonlocal navigate_at
+                navigate_at = time.perf_counter()
+                tab.add_handler(uc.cdp.network.ResponseReceived, on_response)
+                await tab.send(uc.cdp.network.enable())
+                network.install(tab)
+                await blocker.install(tab)
+                if capture:
+                    capture.install(tab)
+
+            try:
+                async with self.scheduler.slot(url, kind="render") as ticket, \
+                        self.pool.page(url, timeout=self.page_timeout, prepare=prepare) as page:
+                    timer.add("navigate", time.perf_counter() - navigate_at)
+                    try:
+                        ticket.observe(doc_status[0] if doc_status else None, doc_headers.get('retry-after'))
+                        if ticket.throttled and throttled < self.scheduler.max_retries:
+                            throttled += 1
+                            continue
+                        html_content, user_agent, readiness = await asyncio.wait_for(
+                            self._read_page(page, timer, network, ready), timeout=self.page_timeout)
+                        rendered = RenderedPage(html_content, user_agent, doc_headers, blocker.stats(),
+                                                readiness=readiness)
+                        if capture:
+                            with timer.stage("image_capture"):
+                                rendered.images = await capture.collect()
+                                rendered.cookies = await capture.cookies()
+                    finally:
+                        page.remove_handler(uc.cdp.network.ResponseReceived, on_response)
+                        network.uninstall()
+                        await blocker.uninstall()  # 标签页会被复用，必须在归还前关闭拦截
+                        if capture:
+                            capture.uninstall()
+                    for key, count in blocker.blocked.items():
+                        self.m_blocked.inc(count, reason=key)
+                    self.m_transferred.inc(rendered.blocking["bytes_transferred"])
+                    self.m_ready.inc(reason=rendered.readiness["reason"])
+                    return rendered
+            except BrowserCrashed as e:
+                if crashed:
+                    raise
+                crashed += 1
+                print(f"♻️ {e}, retrying")
+
+    @staticmethod
+    def _block_policy(config: CrawlerConfig) -> BlockPolicy:
+        """由配置生成渲染时的请求拦截策略（均需显式开启）"""
+        types = set(BlockPolicy.parse_types(config.block_types))
+        if config.block_images:
+            types.add("Image")
+        return BlockPolicy(frozenset(types), BlockPolicy.split(config.block_urls),
+                           config.block_trackers, config.block_third_party_frames)
+
+    async def _read_page(self, page, timer: StageTimer, network: NetworkIdle,
+                         ready: ReadyPolicy) -> Tuple[str, str, Dict[str, Any]]:
+        """等待页面就绪（网络空闲、DOM平静、滚动至不再增长）后读取页面HTML与UA，并返回就绪统计"""
+        readiness = await wait_until_ready(page, network, ready, timer)
+        with timer.stage("get_content"):
+            original_html = await page.get_content()
+        user_agent = await page.evaluate('navigator.userAgent')
+        return original_html, user_agent, readiness
+
+    async def _fetch_isolated(self, url: str, config: CrawlerConfig) -> PageResult:
+        """抓取单个URL并附加状态与耗时；失败不抛出，以错误结果返回。deduplicate时先去掉跟踪参数"""
+        started = time.perf_counter()
+        try:
+            page = await self.fetch_page(clean_url(url) if config.deduplicate else url, config)
+            status = {"status": "success"}
+        except Exception as e:
+            page = PageResult(url, f"Error: {e}")
+            status = {"status": "failed", "error": str(e)}
+            print(f"❌ Error processing {url}: {e}")
+        elapsed = time.perf_counter() - started
+        self.m_pages.inc(status=status["status"])
+        self.m_page_seconds.observe(elapsed)
+        # 缓存中的PageResult是共享对象，只在副本上附加本次请求的元数据
+        meta = {**page.meta, **status, "elapsed_ms": round(elapsed * 1000, 1),
+                "content_length": len(page.content or "")}
+        return replace(page, url=url, meta=meta)
+
+    async def _fetch_limited(self, url: str, config: CrawlerConfig, limiter: Semaphore) -> PageResult:
+        async with limiter:
+            return await self._fetch_isolated(url, config)
+
+    async def _fetch_unique(self, url: str, config: CrawlerConfig, limiter: Optional[Semaphore],
+                            index: Optional[DuplicateIndex]) -> PageResult:
+        """规范URL已在本批次出现时不再抓取，直接返回指向首个副本的引用"""
+        if index is not None and config.deduplicate and (first := index.claim(url)):
+            return self._duplicate(PageResult(url, "", meta={"status": "success"}), first, "url")
+        return await (self._fetch_limited(url, config, limiter) if limiter else self._fetch_isolated(url, config))
+
+    def _duplicate(self, page: PageResult, first: str, kind: str) -> PageResult:
+        self.m_duplicates.inc(kind=kind)
+        print(f"🪞 {page.url} duplicates {first} ({kind})")
+        content = f"Duplicate of {first}"
+        return replace(page, content=content, meta={**page.meta, "duplicate_of": first, "duplicate": kind,
+                                                    "content_length": len(content)})
+
+    @staticmethod
+    def _uses_index(config: CrawlerConfig) -> bool:
+        """去重与模板段落统计共用一个批次级索引"""
+        return config.deduplicate or config.strip_boilerplate
+
+    def _index_for(self, config: CrawlerConfig, index: Optional[DuplicateIndex] = None) -> Optional[DuplicateIndex]:
+        """本批次使用的去重索引：显式传入的 > dedup_session共享的（每次使用后续期）> 新建的"""
+        if not self._uses_index(config):
+            return None
+        if index is None and config.dedup_session:
+            index = self.dedup_sessions.get(config.dedup_session) or DuplicateIndex()
+            self.dedup_sessions[config.dedup_session] = index
+        return index or DuplicateIndex()
+
+    async def _dedup(self, page: PageResult, config: CrawlerConfig, index: Optional[DuplicateIndex]) -> PageResult:
+        """抓取后去重：rel=canonical或SimHash相近的结果折叠为引用；strip_boilerplate时移除本批次内按主机重复出现的模板段落"""
+        if index is None or page.meta.get("status") != "success" or "duplicate_of" in page.meta:
+            return page
+        if config.deduplicate:
+            if "simhash" in page.meta:
+                text_hash, words = int(page.meta["simhash"], 16), page.meta["words"]
+            else:
+                text_hash, words = await self._run_cpu(config, simhash, page.content or "")
+            first, kind = index.check(page.url, page.meta.get("canonical"), text_hash, words)
+            if first:
+                return self._duplicate(page, first, kind)
+        if config.strip_boilerplate and config.output_format == OutputFormat.markdown and page.content:
+            content, removed = index.boilerplate.strip(urlparse(page.url).netloc, page.url, page.content)
+            if removed:
+                self.m_boilerplate.inc(removed)
+                page = replace(page, content=content, meta={**page.meta, "boilerplate_removed": removed,
+                                                            "content_length": len(content)})
+        return page
+
+    async def crawl_iter(self, urls: List[str], config: CrawlerConfig, limiter: Optional[Semaphore] = None,
+                         index: Optional[DuplicateIndex] = None) -> AsyncIterator[PageResult]:
+        """并行处理多个URL，按完成顺序逐个产出结果；limiter可在多个批次间共享以限制总并发；
+        deduplicate时重复结果折叠为引用（传入同一index或dedup_session可跨批次去重与统计模板段落）；迭代器提前关闭时取消剩余任务"""
+        index = self._index_for(config, index)
+        tasks = [asyncio.ensure_future(self._fetch_unique(url, config, limiter, index)) for url in dict.fromkeys(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                page = await self._dedup(await next_done, config, index)
+                print(f"📖 Parsed {page.url}")
+                yield page
         finally:
-            if page:
-                await page.close()
+            for task in tasks:
+                task.cancel()
 
     async def crawl(self, urls: List[str], config: CrawlerConfig):
         """并行处理多个URL"""
         results = {}
-        async with self.lock:
-            if not self.browser:
-                # uc.start() returns a tuple (browser, config)
-                self.browser = await uc.start()
-        
-        async def worker(url):
-            try:
-                results[url] = await self.fetch(url, config)
-            except Exception as e:
-                results[url] = f"Error: {e}"
-                print(f"❌ Error processing {url}: {e}")
-            finally:
+        with alive_bar(len(set(urls))) as bar:
+            async for page in self.crawl_iter(urls, config):
+                results[page.url] = page.content
                 bar()
-                print(f"📖 Parsed {url}")
-
-        with alive_bar(len(urls)) as bar:
-            await asyncio.gather(*(worker(url) for url in urls))
         return results
 
     async def close(self):
-        """关闭浏览器实例"""
-        async with self.lock:
-            if self.browser:
-                try:
-                    await self.browser.stop()
-                except Exception as e:
-                    print(f"⚠️ Error closing browser: {e}")
-                finally:
-                    self.browser = None
+        """关闭浏览器池与HTTP连接池"""
+        if self.http_client:
+            await self.http_client.aclose()
+            self.http_client = None
+        await self.pool.close()
+        for executor in self.executors.values():
+            executor.shutdown()
+        self.executors.clear()
+        if self.store:
+            self.store.close()
     
-    def search(self, query, max_results=5):
-        """使用DDGS进行搜索"""
-        return [(r['href'], r['body']) for r in DDGS().text(query, max_results=max_results)]
+    async def search(self, query, max_results=5):
+        """搜索（不阻塞事件循环，结果按TTL缓存），返回[(URL, 摘要)]"""
+        return [(hit.url, hit.snippet) for hit in await self.searcher.search(query, max_results)]
+
+    async def _fetch_hit(self, hit: SearchHit, config: CrawlerConfig, limiter: Optional[Semaphore],
+                         index: Optional[DuplicateIndex]) -> PageResult:
+        page = await self._fetch_unique(hit.url, config, limiter, index)
+        return replace(page, meta={**page.meta, "search": {"query": hit.query, "rank": hit.rank, "snippet": hit.snippet}})
+
+    async def search_iter(self, queries: List[str], max_results: int, config: CrawlerConfig,
+                          limiter: Optional[Semaphore] = None,
+                          index: Optional[DuplicateIndex] = None) -> AsyncIterator[PageResult]:
+        """流水线式搜索→读取：每个搜索结果一产出就开始抓取（跨查询按URL去重，deduplicate时折叠镜像与近似副本），
+        按完成顺序产出页面"""
+        done: asyncio.Queue = asyncio.Queue()
+        pending = set()
+        index = self._index_for(config, index)
+
+        async def feed():
+            async for hit in self.searcher.iter_hits(queries, max_results):
+                task = asyncio.ensure_future(self._fetch_hit(hit, config, limiter, index))
+                pending.add(task)
+                task.add_done_callback(done.put_nowait)
+
+        feeder = asyncio.ensure_future(feed())
+        feeder.add_done_callback(lambda _: done.put_nowait(None))
+        try:
+            feeding = True
+            while feeding or pending:
+                task = await done.get()
+                if task is None:
+                    feeding = False
+                    feeder.result()
+                    continue
+                pending.discard(task)
+                page = await self._dedup(task.result(), config, index)
+                print(f"📖 Parsed {page.url}")
+                yield page
+        finally:
+            feeder.cancel()
+            for task in pending:
+                task.cancel()
+
+async def _encode_stream(pages: AsyncIterator[PageResult], fmt: StreamFormat) -> AsyncIterator[str]:
+    """把逐个完成的结果编码为NDJSON行或SSE事件"""
+    async for page in pages:
+        line = json.dumps(page.to_dict(), ensure_ascii=False)
+        yield f"event: result\ndata: {line}\n\n" if fmt == StreamFormat.sse else f"{line}\n"
+    if fmt == StreamFormat.sse:
+        yield "event: done\ndata: {}\n\n"
+
+def stream_response(pages: AsyncIterator[PageResult], fmt: StreamFormat) -> "StreamingResponse":
+    from fastapi.responses import StreamingResponse
+    media_type = "text/event-stream" if fmt == StreamFormat.sse else "application/x-ndjson"
+    return StreamingResponse(_encode_stream(pages, fmt), media_type=media_type,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def create_app(crawler: Optional[WebCrawler] = None, jobs: Optional[JobManager] = None):
+    """创建FastAPI应用（FastAPI与MCP只在启动服务时导入，CLI的其他命令不必承担其导入开销）"""
+    from fastapi import FastAPI, HTTPException, Query, Depends
+    from fastapi.responses import FileResponse, PlainTextResponse, Response
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi_mcp import FastApiMCP
 
-def create_app():
-    """创建FastAPI应用"""
     app = FastAPI(
         title="BeepSeq-WebResearch",
         description="A powerful web research tool for crawling and extracting content from websites, with MCP support.",
         version="1.0.0",
     )
-    crawler = WebCrawler()
+    crawler = crawler or WebCrawler()
+    jobs = jobs or JobManager(crawler, CrawlerConfig)
 
     # CORS to maximize consumption flexibility (agents, tools, browsers)
     app.add_middleware(
@@ -264,8 +794,16 @@ def create_app():
         allow_headers=["*"],
     )
 
+    crawler.registry.gauge("webresearch_jobs", "Jobs by status", ("status",), fn=lambda: {
+        (status,): count for status, count in jobs.stats().items() if not status.startswith("max_")})
+
+    @app.on_event("startup")
+    async def startup_event():
+        await jobs.start()
+
     @app.on_event("shutdown")
     async def shutdown_event():
+        await jobs.close()
         await crawler.close()
 
     @app.get(
@@ -332,14 +870,228 @@ def create_app():
         Finds relevant pages via DuckDuckGo. Return snippets by default, or set fulltext=true to read and return Markdown for each result automatically.
         Great for "search-then-read" workflows.
         """
-        urls_snippets = crawler.search(query, max_results)
         if not fulltext:
-            return {"results": [{"url": u, "snippet": s} for u, s in urls_snippets]}
-        urls_to_crawl = [u for u, _ in urls_snippets]
-        return await crawler.crawl(urls_to_crawl, config)
+            return {"results": [{"url": u, "snippet": s} for u, s in await crawler.search(query, max_results)]}
+        # 每个结果一到就开始读取，返回时按搜索排名排序
+        pages = [page async for page in crawler.search_iter([query], max_results, config)]
+        return {page.url: page.content for page in sorted(pages, key=lambda p: p.meta["search"]["rank"])}
+
+    @app.post(
+        "/search/multi",
+        operation_id="search_web_multi",
+        tags=["webresearch", "mcp"],
+        summary="Run several searches and merge the results",
+    )
+    async def search_multi(body: MultiSearchRequest):
+        """
+        Multi Search
+
+        Runs several queries in parallel and merges their results, deduplicated by URL (each result lists the
+        queries that found it). With fulltext=true every merged result is read as soon as its query returns.
+        """
+        if not body.queries:
+            raise HTTPException(status_code=400, detail="No queries provided.")
+        if not body.fulltext:
+            return {"results": [hit.to_dict() for hit in await crawler.searcher.multi_search(body.queries, body.max_results)]}
+        pages = crawler.search_iter(body.queries, body.max_results, body.config or CrawlerConfig())
+        return {"results": [page.to_dict() async for page in pages]}
+
+    @app.get(
+        "/read/stream",
+        operation_id="read_urls_stream",
+        tags=["webresearch", "stream"],
+        summary="Stream webpage reads as NDJSON/SSE",
+    )
+    async def read_stream_get(
+        urls: str = Query(..., description="Comma-separated list of URLs to read"),
+        format: StreamFormat = Query(StreamFormat.ndjson, description="ndjson or sse"),
+        config: CrawlerConfig = Depends()
+    ):
+        """
+        Read Stream (GET)
+
+        Emits one result object (url, title, content, meta) per URL as soon as it finishes.
+        """
+        target_urls = [u.strip() for u in urls.split(',') if u.strip()]
+        if not target_urls:
+            raise HTTPException(status_code=400, detail="No URLs provided.")
+        return stream_response(crawler.crawl_iter(target_urls, config), format)
+
+    @app.post(
+        "/read/stream",
+        operation_id="read_urls_stream_post",
+        tags=["webresearch", "stream"],
+        summary="Stream batch webpage reads as NDJSON/SSE",
+    )
+    async def read_stream_post(body: ReadRequest, format: StreamFormat = Query(StreamFormat.ndjson, description="ndjson or sse")):
+        """
+        Read Stream (POST)
+
+        Same as POST /read, but each URL's result and metadata are streamed as soon as they complete.
+        """
+        if not body.urls:
+            raise HTTPException(status_code=400, detail="No URLs provided.")
+        return stream_response(crawler.crawl_iter(body.urls, body.config or CrawlerConfig()), format)
+
+    @app.get(
+        "/search/stream",
+        operation_id="search_web_stream",
+        tags=["webresearch", "stream"],
+        summary="Search the web and stream fulltext results as NDJSON/SSE",
+    )
+    async def search_stream(
+        query: str = Query(..., description="The search query to look up."),
+        max_results: int = Query(3, description="The maximum number of search results to read."),
+        format: StreamFormat = Query(StreamFormat.ndjson, description="ndjson or sse"),
+        config: CrawlerConfig = Depends()
+    ):
+        """
+        Search Stream
+
+        Streams the fulltext of each result as soon as it has been read; reading starts as soon as the search returns.
+        """
+        return stream_response(crawler.search_iter([query], max_results, config), format)
+
+    @app.post(
+        "/jobs",
+        operation_id="submit_read_job",
+        tags=["webresearch", "jobs"],
+        summary="Submit an asynchronous batch read job",
+        status_code=202,
+    )
+    async def submit_job(body: JobRequest):
+        """
+        Submit Job
+
+        Queues the URLs as a background job and returns its id immediately. Poll GET /jobs/{id} for progress
+        and partial results. Responds 429 with Retry-After when the queue is full.
+        """
+        if not body.urls:
+            raise HTTPException(status_code=400, detail="No URLs provided.")
+        try:
+            job = await jobs.submit(body.urls, body.config or CrawlerConfig(), body.priority)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        return job.to_dict(include_results=False)
+
+    @app.get(
+        "/jobs",
+        operation_id="list_jobs",
+        tags=["webresearch", "jobs"],
+        summary="List jobs and queue statistics",
+    )
+    async def list_jobs():
+        """
+        List Jobs
+
+        Returns queue statistics and every known job without results.
+        """
+        return {"stats": jobs.stats(), "jobs": [job.to_dict(include_results=False) for job in jobs.jobs.values()]}
+
+    @app.get(
+        "/jobs/{job_id}",
+        operation_id="get_job",
+        tags=["webresearch", "jobs"],
+        summary="Get job status, progress and results",
+    )
+    async def get_job(job_id: str, results: bool = Query(True, description="Include the (partial) results")):
+        """
+        Get Job
+
+        Returns the job's status and progress, plus the results of every URL finished so far.
+        """
+        if (job := jobs.get(job_id)) is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return job.to_dict(include_results=results)
+
+    @app.delete(
+        "/jobs/{job_id}",
+        operation_id="cancel_job",
+        tags=["webresearch", "jobs"],
+        summary="Cancel a queued or running job",
+    )
+    async def cancel_job(job_id: str):
+        """
+        Cancel Job
+
+        Cancels a queued or running job. Results finished before cancellation are kept.
+        """
+        if (job := jobs.cancel(job_id)) is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return job.to_dict(include_results=False)
+
+    @app.post(
+        "/crawl",
+        operation_id="crawl_site",
+        tags=["webresearch", "stream"],
+        summary="Crawl a site within a page and depth budget, streaming results",
+    )
+    async def crawl_site(body: SiteCrawlRequest, format: StreamFormat = Query(StreamFormat.ndjson, description="ndjson or sse")):
+        """
+        Crawl Site
+
+        Seeds from the start URLs and the site's sitemap, follows in-scope links breadth-first up to `max_depth`
+        and `max_pages`, and streams each page as soon as it is extracted (with `meta.depth`).
+        """
+        if not body.urls:
+            raise HTTPException(status_code=400, detail="'urls' must be a non-empty list")
+        site = SiteCrawler(crawler, body.urls, body.config or CrawlerConfig(), max_pages=body.max_pages,
+                           max_depth=body.max_depth, sitemap=body.sitemap, path_prefix=body.path_prefix,
+                           include=body.include, exclude=body.exclude, concurrency=body.concurrency)
+        return stream_response(site.run(), format)
+
+    @app.post(
+        "/read/bundle",
+        operation_id="read_bundle",
+        tags=["webresearch", "files"],
+        summary="Batch read webpages into a zip/tar bundle",
+    )
+    async def read_bundle(body: ReadRequest, format: BundleFormat = Query(BundleFormat.zip, description="zip or tgz")):
+        """
+        Read Bundle
+
+        Reads the URLs like `POST /read` and returns one archive with a Markdown file per page, every referenced
+        image asset once (use `image_mode=assets`) and a `manifest.json` with each page's URL, title and metadata.
+        """
+        if not body.urls:
+            raise HTTPException(status_code=400, detail="'urls' must be a non-empty list")
+        config = body.config or CrawlerConfig()
+        pages = [page.to_dict() async for page in crawler.crawl_iter(body.urls, config)]
+        buffer = io.BytesIO()
+        extension = "md" if config.output_format == OutputFormat.markdown else "html"
+        await asyncio.to_thread(write_bundle, pages, buffer, format, crawler.asset_path, extension)
+        media_type = "application/zip" if format == BundleFormat.zip else "application/gzip"
+        filename = f"webresearch-{int(time.time())}.{format.value}"
+        return Response(buffer.getvalue(), media_type=media_type,
+                        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+    @app.get("/assets/{name}", tags=["files"])
+    async def get_asset(name: str):
+        """
+        Asset
+
+        Serves an image written in `image_mode=assets` by its content hash. Assets never change, so they are cacheable forever.
+        """
+        if (path := crawler.asset_path(name)) is None:
+            raise HTTPException(status_code=404, detail="Asset not found.")
+        return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+    @app.get("/metrics", tags=["ops"], include_in_schema=False)
+    async def metrics():
+        """Prometheus指标"""
+        return PlainTextResponse(crawler.registry.render(), media_type="text/plain; version=0.0.4")
+
+    @app.get("/healthz", tags=["ops"])
+    async def healthz():
+        """
+        Health
+
+        Reports browser pool, cache, executor and job queue state.
+        """
+        return {**crawler.health(), "jobs": jobs.stats()}
 
-    # 创建并挂载 MCP
-    mcp = FastApiMCP(app, name="WebResearch MCP")
+    # 创建并挂载 MCP（流式、文件与运维接口不适合作为MCP工具）
+    mcp = FastApiMCP(app, name="WebResearch MCP", exclude_tags=["stream", "files", "ops"])
     mcp.mount()
 
     return app
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+dedup.py - Duplicate detection for BeepSeq WebResearch batches.
+URL canonicalization (tracking parameters, AMP and mobile variants,
+rel=canonical) catches mirrors before they are fetched; a 64-bit SimHash
+over word shingles catches syndicated near-duplicates after extraction;
+and an optional per-host paragraph counter, scoped to one batch or crawl,
+strips boilerplate blocks that repeat across pages of the same site.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from cachetools import LRUCache
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = {'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl',
+                   'ref_src', 'ref_url', 'spm', 'scm', 'share', 'cmpid', 'ncid', 'sr_share', 'mkt_tok', 'vero_id'}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_', 'oly_')
+AMP_PARAMS = {'amp', 'outputtype', 'usqp'}
+MIRROR_HOST_PREFIXES = ('www.', 'amp.', 'm.', 'mobile.')
+
+CANONICAL_LINK = re.compile(r'<link\b[^>]*\brel\s*=\s*["\']?canonical\b[^>]*>', re.I)
+HREF = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+DATA_URI = re.compile(r'\(data:[^)]*\)|data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+')
+WORD = re.compile(r'\w+', re.U)
+BLOCK_SPLIT = re.compile(r'\n\s*\n')
+FENCE = re.compile(r'^\s*(```|~~~)', re.M)
+
+
+def _is_tracking(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def clean_url(url: str) -> str:
+    """去掉片段与跟踪参数，其余参数保持原顺序；抓取前使用"""
+    parts = urlsplit(url)
+    pairs = parse_qsl(parts.query, keep_blank_values=True)
+    query = [(k, v) for k, v in pairs if not _is_tracking(k)]
+    # 没有可去掉的参数时保留原始查询串，避免重新编码改变URL
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, parts.query if len(query) == len(pairs) else urlencode(query), ''))
+
+
+def canonical_key(url: str) -> str:
+    """比较用的规范形式：小写主机并去掉www/amp/m前缀与默认端口，去掉AMP路径与参数、末尾斜杠，参数排序"""
+    parts = urlsplit(clean_url(url.strip()))
+    host = (parts.hostname or '').lower()
+    for prefix in MIRROR_HOST_PREFIXES:
+        if host.startswith(prefix) and host.count('.') > 1:
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r'/amp(?=/|$)', '', parts.path)
+    path = re.sub(r'\.amp(\.html?)$', r'\1', path).rstrip('/') or '/'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in AMP_PARAMS)
+    return urlunsplit(('', host, path, urlencode(query), ''))
+
+
+def find_canonical(html: str, base_url: str) -> Optional[str]:
+    """读取<head>中的<link rel="canonical">，返回绝对URL"""
+    head = html[:html.find('</head>')] if '</head>' in html[:262144] else html[:262144]
+    if not (tag := CANONICAL_LINK.search(head)) or not (href := HREF.search(tag.group(0))):
+        return None
+    value = next(g for g in href.groups() if g is not None).strip()
+    return urljoin(base_url, value) if value else None
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text: str, shingle: int = 3) -> Tuple[int, int]:
+    """正文的64位SimHash（词级shingle，忽略内嵌图像数据），返回(指纹, 词数)"""
+    words = WORD.findall(DATA_URI.sub(' ', text).lower())
+    if len(words) < shingle:
+        return 0, len(words)
+    hashes = [_hash64(s) for s in {' '.join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)}]
+    threshold = len(hashes) / 2
+    fingerprint = 0
+    for bit in range(64):
+        if sum((h >> bit) & 1 for h in hashes) > threshold:
+            fingerprint |= 1 << bit
+    return fingerprint, len(words)
+
+
+class DuplicateIndex:
+    """一批结果内的重复检测：规范URL精确匹配 + SimHash海明距离（分4段索引，距离≤3必有一段相同）"""
+
+    def __init__(self, max_distance: int = 3, min_words: int = 50):
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self.urls: Dict[str, str] = {}  # 规范URL -> 首个URL
+        self.bands: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in range(4)]
+        self.boilerplate = BoilerplateFilter()  # 模板段落统计与去重索引同生命周期，结果不受之前批次影响
+
+    def claim(self, url: str) -> Optional[str]:
+        """抓取前调用：规范URL已出现时返回首个URL，否则登记"""
+        return self._claim_key(canonical_key(url), url)
+
+    def _claim_key(self, key: str, url: str) -> Optional[str]:
+        first = self.urls.setdefault(key, url)
+        return first if first != url else None
+
+    def check(self, url: str, canonical: Optional[str], fingerprint: int, words: int) -> Tuple[Optional[str], str]:
+        """抓取后调用：返回(首个副本URL, 重复类型)；不重复时登记本页并返回(None, "")"""
+        if canonical and (first := self._claim_key(canonical_key(canonical), url)):
+            return first, "canonical"
+        if words < self.min_words:
+            return None, ""
+        for band, table in enumerate(self.bands):
+            for other, other_url in table.get((fingerprint >> (16 * band)) & 0xFFFF, ()):
+                if other_url != url and bin(fingerprint ^ other).count('1') <= self.max_distance:
+                    return other_url, "near"
+        for band, table in enumerate(self.bands):
+            table.setdefault((fingerprint >> (16 * band)) & 0xFFFF, []).append((fingerprint, url))
+        return None, ""
+
+
+class BoilerplateFilter:
+    """按主机统计段落在多少个不同页面出现过；达到min_pages的段落视为模板内容（导航、页脚、订阅提示）。
+    标题、代码块与短于min_chars的段落不参与统计，文档站点上重复的"## Parameters"之类不会被删除"""
+
+    def __init__(self, min_pages: int = 3, min_chars: int = 40, max_hosts: int = 1024, max_blocks: int = 20000,
+                 max_pages: int = 2048):
+        self.min_pages = min_pages
+        self.min_chars = min_chars
+        self.max_blocks = max_blocks
+        self.max_pages = max_pages
+        self.hosts = LRUCache(maxsize=max_hosts)  # 主机 -> (已计数页面, 段落哈希 -> 页面数)
+
+    @staticmethod
+    def _block_key(block: str) -> int:
+        return _hash64(' '.join(block.split()).lower())
+
+    def _candidates(self, blocks: List[str]) -> List[bool]:
+        """每个段落是否可能是模板内容：跳过标题、围栏/缩进代码块（含其中的空行分段）与短段落"""
+        flags, in_fence = [], False
+        for block in blocks:
+            fences = len(FENCE.findall(block))
+            code = in_fence or fences > 0 or all(line.startswith(('    ', '\t')) for line in block.splitlines() if line.strip())
+            in_fence ^= fences % 2 == 1
+            text = block.strip()
+            flags.append(not code and not text.startswith('#') and len(' '.join(text.split())) >= self.min_chars)
+        return flags
+
+    def strip(self, host: str, url: str, text: str) -> Tuple[str, int]:
+        """移除已达到阈值的重复段落并更新计数（同一URL只计一次），返回(文本, 移除段落数)"""
+        if (state := self.hosts.get(host)) is None:
+            state = self.hosts[host] = (LRUCache(maxsize=self.max_pages), LRUCache(maxsize=self.max_blocks))
+        pages, counts = state
+        blocks = [b for b in BLOCK_SPLIT.split(text) if b.strip()]
+        keys = [self._block_key(b) if candidate else None for b, candidate in zip(blocks, self._candidates(blocks))]
+        if url not in pages:
+            pages[url] = True
+            for key in set(keys) - {None}:
+                counts[key] = counts.get(key, 0) + 1
+        kept = [b for b, key in zip(blocks, keys) if key is None or counts.get(key, 0) < self.min_pages]
+        removed = len(blocks) - len(kept)
+        if not removed or not kept:
+            return text, 0
+        return '\n\n'.join(kept) + '\n', removed
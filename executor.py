@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+executor.py - Bounded executors for CPU-bound extraction work.
+Runs parsing, Markdown conversion and image encoding in a process pool
+(default) or a thread pool, with bounded queueing and per-task timeouts
+that kill runaway parses.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+MAX_WORKERS = os.cpu_count() or 1  # CPU密集任务，超过核数的进程只会增加内存与调度开销
+
+
+class ExecutorKind(str, Enum):
+    process = "process"
+    thread = "thread"
+
+
+class ExtractionTimeout(TimeoutError):
+    """提取任务超过时限"""
+
+
+def _mp_context():
+    """优先forkserver：子进程从预加载了提取依赖的干净进程fork，既不继承事件循环/浏览器线程，
+    也不必像spawn那样在每个worker（及超时重建后）重新导入lxml/trafilatura"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        ctx.set_forkserver_preload(['__main__', 'extraction', 'image_processing'])
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+
+class BoundedExecutor:
+    def __init__(self, kind: ExecutorKind = ExecutorKind.process, workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, task_timeout: Optional[float] = 30.0):
+        self.kind = ExecutorKind(kind)
+        self.workers = min(max(1, workers or MAX_WORKERS), MAX_WORKERS)
+        self.queue_size = queue_size or self.workers * 4
+        self.task_timeout = task_timeout
+        self.slots = asyncio.Semaphore(self.queue_size)
+        self.executor: Optional[Executor] = None
+        self.pending = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.kind == ExecutorKind.process:
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=_mp_context())
+            else:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='extract')
+        return self.executor
+
+    def _kill(self, executor: Executor):
+        """终止进程池（唯一能中止正在运行的解析的方式），下次提交时重建"""
+        if self.executor is executor:
+            self.executor = None
+            self.restarts += 1
+        for proc in list((getattr(executor, '_processes', None) or {}).values()):
+            proc.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """在池中执行fn(*args)；排队数超过queue_size时在事件循环中等待"""
+        loop = asyncio.get_running_loop()
+        timeout = timeout or self.task_timeout
+        async with self.slots:
+            self.pending += 1
+            try:
+                for attempt in range(2):
+                    executor = self._get_executor()
+                    try:
+                        return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout)
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        if self.kind == ExecutorKind.process:
+                            self._kill(executor)
+                        # 线程无法被终止，只能放弃等待其结果
+                        raise ExtractionTimeout(f"{fn.__name__} exceeded {timeout}s")
+                    except BrokenProcessPool:
+                        # 其他任务超时导致进程池被终止：在新池中重试一次
+                        self._kill(executor)
+                        if attempt:
+                            raise
+            finally:
+                self.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"kind": self.kind.value, "workers": self.workers, "queue_size": self.queue_size,
+                "pending": self.pending, "timeouts": self.timeouts, "restarts": self.restarts}
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
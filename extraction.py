@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+extraction.py - HTML → clean HTML/Markdown pipeline for BeepSeq WebResearch.
+Each document is parsed once; images (including srcset and lazy-load
+attributes) are collected and normalised on that tree, and later embedded
+into the HTML and Markdown with a single substitution pass each.
+Functions are pure and module level so they can run in worker processes.
+"""
+import html as html_lib
+import re
+from typing import Dict, List, NamedTuple, Tuple
+from urllib.parse import quote, urljoin
+
+import html2text
+import lxml.html
+import trafilatura
+from readability import Document
+
+LAZY_SRC_ATTRS = ('data-src', 'data-original', 'data-lazy-src', 'data-actualsrc', 'data-url')
+LAZY_SRCSET_ATTRS = ('srcset', 'data-srcset', 'data-lazy-srcset')
+
+
+class Extracted(NamedTuple):
+    title: str
+    clean_html: str
+    md_content: str
+    images: List[Dict[str, str]]
+
+
+def _largest_srcset_candidate(srcset: str) -> str:
+    """取srcset中宽度/像素密度最大的候选URL"""
+    best, best_size = "", -1.0
+    for candidate in srcset.split(','):
+        parts = candidate.split()
+        if not parts:
+            continue
+        descriptor = parts[1] if len(parts) > 1 else "1x"
+        try:
+            size = float(descriptor[:-1])
+        except ValueError:
+            size = 0.0
+        if size > best_size:
+            best, best_size = parts[0], size
+    return best
+
+
+def _image_source(img) -> str:
+    """懒加载占位图时取data-src/srcset中的真实地址"""
+    src = (img.get('src') or '').strip()
+    if src and not src.startswith('data:'):
+        return src
+    for attr in LAZY_SRC_ATTRS:
+        if lazy := (img.get(attr) or '').strip():
+            return lazy
+    for attr in LAZY_SRCSET_ATTRS:
+        if srcset := img.get(attr):
+            return _largest_srcset_candidate(srcset)
+    return src
+
+
+def collect_images(tree, base_url: str) -> List[Dict[str, str]]:
+    """从已解析的树中收集图像，把真实地址写回src并移除srcset/懒加载属性，使后续替换只需匹配src"""
+    images, seen = [], set()
+    for img in tree.iter('img'):
+        src = _image_source(img)
+        if not src or src.startswith('data:'):
+            continue
+        img.set('src', src)
+        for attr in (*LAZY_SRC_ATTRS, *LAZY_SRCSET_ATTRS):
+            img.attrib.pop(attr, None)
+        if src not in seen:
+            seen.add(src)
+            images.append({"src": src, "full_url": urljoin(base_url, src), "alt": img.get('alt') or ""})
+    return images
+
+
+def _html_to_markdown(clean_html: str) -> str:
+    h = html2text.HTML2Text()
+    h.body_width = 0
+    return h.handle(clean_html)
+
+
+def _title(tree) -> str:
+    return (tree.findtext('.//title') or '').strip() or 'untitled'
+
+
+def extract_content(html_content: str, url: str, use_readability: bool, want_images: bool = False) -> Extracted:
+    """根据配置选择提取器提取内容；want_images时顺带从同一棵树中收集图像"""
+    try:
+        if use_readability:
+            doc = Document(html_content)
+            title = doc.title()
+            clean_html = doc.summary()
+            images = []
+            if want_images:
+                tree = lxml.html.fromstring(clean_html)
+                images = collect_images(tree, url)
+                clean_html = lxml.html.tostring(tree, encoding='unicode')
+            return Extracted(title, clean_html, _html_to_markdown(clean_html), images)
+        tree = lxml.html.fromstring(html_content)
+        title = _title(tree)
+        images = []
+        if want_images:
+            # trafilatura会就地修改树，先收集图像并序列化
+            images = collect_images(tree, url)
+            html_content = lxml.html.tostring(tree, encoding='unicode')
+        md_content = trafilatura.extract(tree, include_links=True, url=url)
+        return Extracted(title, html_content, md_content, images)
+    except Exception as e:
+        print(f"⚠️ Content extraction failed: {e}")
+        title_match = re.search(r'<title[^>]*>([^<]*)</title>', html_content, re.IGNORECASE)
+        title = title_match.group(1).strip() if title_match else 'untitled'
+        return Extracted(title, html_content, "", [])
+
+
+ANCHOR_HREF = re.compile(r'<a\b[^>]*?\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+BASE_HREF = re.compile(r'<base\b[^>]*?\bhref\s*=\s*["\']?([^"\'\s>]+)', re.I)
+
+
+def extract_links(html_content: str, url: str) -> List[str]:
+    """收集原始HTML中<a href>指向的http(s)绝对URL（去掉片段、保持首次出现顺序）；用正则而非再解析一次整棵树"""
+    if base := BASE_HREF.search(html_content):
+        url = urljoin(url, html_lib.unescape(base.group(1)))
+    links = {}
+    for match in ANCHOR_HREF.finditer(html_content):
+        href = html_lib.unescape(next(g for g in match.groups() if g is not None).strip())
+        if not href or href.startswith(('#', 'javascript:', 'mailto:', 'tel:', 'data:')):
+            continue
+        link = urljoin(url, href).split('#', 1)[0]
+        if link.startswith(('http://', 'https://')):
+            links[link] = None
+    return list(links)
+
+
+def _escape_attr(value: str) -> str:
+    """与lxml序列化src属性一致：转义&<>，空格与非ASCII字符按%XX编码"""
+    value = value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return re.sub(r'[^\x21-\x7e]+', lambda m: quote(m.group(0)), value)
+
+
+def _substitute(content: str, replacements: Dict[str, str], before: str, after: str) -> str:
+    keys = sorted(replacements, key=len, reverse=True)
+    pattern = re.compile(f'(?<={before})(?:' + '|'.join(map(re.escape, keys)) + f')(?={after})')
+    return pattern.sub(lambda m: replacements[m.group(0)], content)
+
+
+def embed_images(clean_html: str, md_content: str, replacements: Dict[str, str]) -> Tuple[str, str]:
+    """按URL→新地址映射，对HTML的src属性与Markdown的图像链接各做一次替换"""
+    if not replacements:
+        return clean_html, md_content
+    clean_html = _substitute(clean_html, {_escape_attr(k): v for k, v in replacements.items()},
+                             r'\bsrc=["\']', r'["\']')
+    if md_content:
+        md_content = _substitute(md_content, replacements, r'\]\(', r'[\s)]')
+    return clean_html, md_content
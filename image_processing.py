@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+image_processing.py - Optional image transcoding and byte budgets for embedded images.
+Downscales, re-encodes (WebP/JPEG), drops tracking pixels and tiny icons and
+enforces per-image / per-document byte budgets before images are base64 encoded
+or written to a content-addressed asset directory.
+Meant to run off the event loop.
+"""
+import base64
+import functools
+import hashlib
+import io
+import mimetypes
+import os
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+@functools.lru_cache(maxsize=None)
+def _pil():
+    """按需导入Pillow，导入本模块（如CLI启动时读取枚举）不必加载它"""
+    try:
+        from PIL import Image
+    except ImportError:  # without Pillow images are embedded as-is, budgets still apply
+        return None
+    return Image
+
+
+class ImageFormat(str, Enum):
+    original = "original"
+    webp = "webp"
+    jpeg = "jpeg"
+
+
+class ImageMode(str, Enum):
+    inline = "inline"
+    assets = "assets"
+
+
+ASSET_EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/webp': '.webp',
+                    'image/svg+xml': '.svg', 'image/avif': '.avif', 'image/x-icon': '.ico', 'image/bmp': '.bmp'}
+
+
+class ImagePolicy(NamedTuple):
+    max_dimension: Optional[int] = None
+    format: ImageFormat = ImageFormat.original
+    quality: int = 80
+    min_dimension: int = 0
+    max_bytes: Optional[int] = None
+    budget_bytes: Optional[int] = None
+
+    @property
+    def transcodes(self) -> bool:
+        return bool(self.max_dimension or self.min_dimension or self.format != ImageFormat.original)
+
+
+def transcode_image(data: bytes, mime_type: str, policy: ImagePolicy) -> Optional[Tuple[bytes, str]]:
+    """按策略缩放/重编码单张图像；过小的图像（追踪像素、图标）返回None"""
+    Image = _pil()
+    if Image is None or not policy.transcodes or mime_type == 'image/svg+xml':
+        return data, mime_type
+    try:
+        img = Image.open(io.BytesIO(data))
+        if min(img.size) < policy.min_dimension:
+            return None
+        if getattr(img, 'is_animated', False):
+            return data, mime_type
+        resized = bool(policy.max_dimension and max(img.size) > policy.max_dimension)
+        if resized:
+            img.thumbnail((policy.max_dimension, policy.max_dimension))
+        if policy.format == ImageFormat.original and not resized:
+            return data, mime_type
+        fmt = policy.format.value if policy.format != ImageFormat.original else (img.format or 'PNG').lower()
+        if fmt == 'jpeg' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt.upper(), quality=policy.quality, optimize=True)
+        encoded = buffer.getvalue()
+        # 未缩放且重编码反而更大时保留原图
+        if not resized and len(encoded) >= len(data):
+            return data, mime_type
+        return encoded, f"image/{fmt}"
+    except Exception:
+        return data, mime_type
+
+
+def write_asset(data: bytes, mime_type: str, asset_dir: str) -> Tuple[str, bool]:
+    """按内容哈希写入资源文件（已存在则跳过），返回(文件名, 是否新写入)"""
+    ext = ASSET_EXTENSIONS.get(mime_type) or mimetypes.guess_extension(mime_type) or '.bin'
+    name = hashlib.sha256(data).hexdigest() + ext
+    path = Path(asset_dir) / name
+    if path.exists():
+        return name, False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)  # 原子替换：并发写同一资源时读者不会看到半个文件
+    return name, True
+
+
+def encode_images(images: List[Tuple[str, bytes, str]], policy: ImagePolicy,
+                  asset_dir: Optional[str] = None, asset_prefix: str = "assets/") -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """按文档顺序处理并编码图像，返回(URL→替换地址, 字节统计)。
+    默认内嵌为data: URI，预算按写入文档的base64字节计；给定asset_dir时写为哈希命名的文件并引用asset_prefix+文件名，
+    预算按文件字节计。超出预算的图像以原始绝对URL作为占位"""
+    replacements = {}
+    stats = {"bytes_before": 0, "bytes_after": 0, "embedded": 0, "skipped_small": 0, "over_budget": 0}
+    if asset_dir:
+        stats.update(assets_written=0, assets=[])
+    for url, data, mime_type in images:
+        stats["bytes_before"] += len(data)
+        if (processed := transcode_image(data, mime_type, policy)) is None:
+            stats["skipped_small"] += 1
+            continue
+        data, mime_type = processed
+        size = len(data) if asset_dir else (len(data) + 2) // 3 * 4
+        if (policy.max_bytes and size > policy.max_bytes) or (
+                policy.budget_bytes and stats["bytes_after"] + size > policy.budget_bytes):
+            stats["over_budget"] += 1
+            replacements[url] = url
+            continue
+        if asset_dir:
+            name, written = write_asset(data, mime_type, asset_dir)
+            replacements[url] = asset_prefix + name
+            stats["assets_written"] += written
+            if name not in stats["assets"]:
+                stats["assets"].append(name)
+        else:
+            replacements[url] = f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+        stats["bytes_after"] += size
+        stats["embedded"] += 1
+    return replacements, stats
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+image_source.py - Image acquisition for embedded images.
+Captures the image responses the browser already loaded during a render
+(CDP Network.getResponseBody) together with the browser's cookies, and
+keeps a byte-bounded LRU of image bytes shared across pages so logos and
+sprites that repeat across a site are fetched once.
+"""
+import asyncio
+import base64
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import nodriver as uc
+from cachetools import LRUCache
+
+# (原始字节, MIME类型)
+ImageData = Tuple[bytes, str]
+
+
+class ImageCache:
+    """跨页面的图像字节缓存，容量按字节计；过大的单个图像不缓存"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: int = 1024 * 1024):
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self.cache = LRUCache(maxsize=max(max_bytes, 1), getsizeof=lambda item: len(item[0]) or 1)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[ImageData]:
+        if (item := self.cache.get(url)) is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return item
+
+    def put(self, url: str, data: bytes, mime_type: str):
+        if 0 < len(data) <= self.max_item_bytes:
+            self.cache[url] = (data, mime_type)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.cache), "bytes": int(self.cache.currsize), "max_bytes": int(self.cache.maxsize),
+                "hits": self.hits, "misses": self.misses}
+
+
+class BrowserImageCapture:
+    """渲染期间记录浏览器加载完成的图像响应；在标签页归还前取回响应体与Cookie"""
+
+    def __init__(self, max_images: int = 200, max_bytes: int = 32 * 1024 * 1024):
+        self.max_images = max_images
+        self.max_bytes = max_bytes
+        self.tab = None
+        self.responses: Dict[uc.cdp.network.RequestId, Tuple[str, str]] = {}  # request_id -> (URL, MIME)
+        self.finished: Dict[uc.cdp.network.RequestId, int] = {}  # request_id -> 传输字节
+
+    def _on_response(self, event: uc.cdp.network.ResponseReceived):
+        response = event.response
+        if event.type_ == uc.cdp.network.ResourceType.IMAGE and response.status == 200 \
+                and response.url.startswith(('http://', 'https://')):
+            self.responses[event.request_id] = (response.url, response.mime_type)
+
+    def _on_finished(self, event: uc.cdp.network.LoadingFinished):
+        if event.request_id in self.responses:
+            self.finished[event.request_id] = int(event.encoded_data_length)
+
+    def install(self, tab):
+        """在导航前调用（需已启用Network域）"""
+        self.tab = tab
+        tab.add_handler(uc.cdp.network.ResponseReceived, self._on_response)
+        tab.add_handler(uc.cdp.network.LoadingFinished, self._on_finished)
+
+    def uninstall(self):
+        if self.tab is not None:
+            self.tab.remove_handler(uc.cdp.network.ResponseReceived, self._on_response)
+            self.tab.remove_handler(uc.cdp.network.LoadingFinished, self._on_finished)
+
+    async def _body(self, request_id) -> Optional[bytes]:
+        try:
+            body, is_base64 = await self.tab.send(uc.cdp.network.get_response_body(request_id))
+        except Exception:
+            return None  # 响应体已被浏览器回收
+        return base64.b64decode(body) if is_base64 else body.encode('utf-8')
+
+    async def collect(self) -> Dict[str, ImageData]:
+        """取回已加载完成图像的字节（按数量与总字节数限额），返回URL→(字节, MIME)"""
+        selected, total, urls = [], 0, set()
+        for request_id, size in self.finished.items():
+            url = self.responses[request_id][0]
+            if url in urls or len(selected) >= self.max_images or total + size > self.max_bytes:
+                continue
+            urls.add(url)
+            selected.append(request_id)
+            total += size
+        bodies = await asyncio.gather(*(self._body(request_id) for request_id in selected))
+        return {self.responses[request_id][0]: (body, self.responses[request_id][1])
+                for request_id, body in zip(selected, bodies) if body}
+
+    async def cookies(self) -> List[uc.cdp.network.Cookie]:
+        """浏览器上下文中的全部Cookie（替代读取磁盘上的Cookie数据库）"""
+        try:
+            return await self.tab.send(uc.cdp.storage.get_cookies())
+        except Exception:
+            return []
+
+
+def cookie_header(cookies: List[uc.cdp.network.Cookie], url: str) -> Optional[str]:
+    """按域名、路径与secure属性选出发往url的Cookie，生成Cookie请求头"""
+    parsed = urlparse(url)
+    host, path = parsed.hostname or '', parsed.path or '/'
+    pairs = []
+    for cookie in cookies:
+        domain = cookie.domain.lstrip('.')
+        if not (host == domain or (cookie.domain.startswith('.') and host.endswith('.' + domain))):
+            continue
+        if not path.startswith(cookie.path or '/') or (cookie.secure and parsed.scheme != 'https'):
+            continue
+        pairs.append(f"{cookie.name}={cookie.value}")
+    return '; '.join(pairs) or None
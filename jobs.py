@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+jobs.py - Asynchronous crawl jobs for BeepSeq WebResearch.
+A bounded, priority-ordered scheduler in front of WebCrawler: jobs are queued,
+run a few at a time under a global URL concurrency limit, report progress and
+partial results, can be cancelled, and queued jobs survive restarts.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+FINISHED = (JobStatus.done, JobStatus.failed, JobStatus.cancelled)
+
+
+class JobQueueFull(RuntimeError):
+    """排队作业已满，调用方应在retry_after秒后重试"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    id: str
+    urls: List[str]
+    config: BaseModel
+    priority: int = 0
+    status: JobStatus = JobStatus.queued
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    results: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def progress(self) -> Dict[str, int]:
+        failed = sum(1 for r in self.results.values() if r["meta"].get("status") == "failed")
+        return {"total": len(self.urls), "done": len(self.results), "failed": failed}
+
+    def to_dict(self, include_results: bool = True) -> Dict[str, Any]:
+        data = {"id": self.id, "status": self.status.value, "priority": self.priority, "urls": self.urls,
+                "progress": self.progress(), "created_at": self.created_at, "started_at": self.started_at,
+                "finished_at": self.finished_at, "error": self.error}
+        if include_results:
+            data["results"] = list(self.results.values())
+        return data
+
+
+class JobManager:
+    def __init__(self, crawler, config_model: Type[BaseModel], max_running: int = 2, max_queued: int = 100,
+                 max_concurrent_urls: int = 20, max_finished: int = 1000, state_dir: Optional[str] = None):
+        self.crawler = crawler
+        self.config_model = config_model
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.url_slots = asyncio.Semaphore(max_concurrent_urls)
+        self.state_file = Path(state_dir) / "jobs.json" if state_dir else None
+        self.jobs: Dict[str, Job] = {}
+        self.finished = deque()
+        self.heap = []  # (-priority, 序号, job_id)，已取消的作业在出队时跳过
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Condition()
+        self.running: Dict[str, asyncio.Task] = {}
+        self.workers: List[asyncio.Task] = []
+        self.avg_job_seconds = 10.0
+        self.closing = False
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == JobStatus.queued)
+
+    def _retry_after(self) -> int:
+        """按平均作业耗时估算队列腾出空位的时间"""
+        return max(1, round(self.avg_job_seconds * (self.queued - self.max_queued + 1) / self.max_running))
+
+    async def start(self):
+        """恢复持久化的作业并启动工作协程"""
+        for job in self._load():
+            self.jobs[job.id] = job
+            heapq.heappush(self.heap, (-job.priority, next(self.counter), job.id))
+        if self.heap:
+            print(f"📥 Restored {len(self.heap)} queued job(s)")
+        self.workers = [asyncio.ensure_future(self._worker()) for _ in range(self.max_running)]
+
+    async def submit(self, urls: List[str], config: BaseModel, priority: int = 0) -> Job:
+        """提交作业；队列已满时抛出JobQueueFull"""
+        if self.queued >= self.max_queued:
+            raise JobQueueFull(self._retry_after())
+        job = Job(uuid.uuid4().hex[:12], list(dict.fromkeys(urls)), config, priority)
+        self.jobs[job.id] = job
+        heapq.heappush(self.heap, (-priority, next(self.counter), job.id))
+        self._save()
+        async with self.wakeup:
+            self.wakeup.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """取消排队或运行中的作业；已完成的结果保留"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        if task := self.running.get(job_id):
+            job.status = JobStatus.cancelled
+            task.cancel()
+        else:
+            self._finish(job, JobStatus.cancelled)
+        return job
+
+    async def _next_job(self) -> Job:
+        async with self.wakeup:
+            while True:
+                while self.heap:
+                    job = self.jobs.get(heapq.heappop(self.heap)[2])
+                    if job and job.status == JobStatus.queued:
+                        return job
+                await self.wakeup.wait()
+
+    async def _worker(self):
+        while True:
+            job = await self._next_job()
+            job.status, job.started_at = JobStatus.running, time.time()
+            self.running[job.id] = task = asyncio.ensure_future(self._run(job))
+            try:
+                await task
+            except asyncio.CancelledError:
+                if self.closing or job.status != JobStatus.cancelled:
+                    # 服务关闭或工作协程本身被取消（而非cancel()取消作业）：作业保持未完成状态并持久化，重启后重新执行
+                    raise
+                self._finish(job, JobStatus.cancelled)
+            except Exception as e:
+                job.error = str(e)
+                self._finish(job, JobStatus.failed)
+            else:
+                self._finish(job, JobStatus.done)
+                self.avg_job_seconds = 0.8 * self.avg_job_seconds + 0.2 * (job.finished_at - job.started_at)
+            finally:
+                self.running.pop(job.id, None)
+
+    async def _run(self, job: Job):
+        print(f"🗂️ Job {job.id} started ({len(job.urls)} URLs, priority {job.priority})")
+        pending = [url for url in job.urls if url not in job.results]
+        async for page in self.crawler.crawl_iter(pending, job.config, limiter=self.url_slots):
+            job.results[page.url] = page.to_dict()
+
+    def _finish(self, job: Job, status: JobStatus):
+        job.status, job.finished_at = status, time.time()
+        self.finished.append(job.id)
+        while len(self.finished) > self.max_finished:
+            self.jobs.pop(self.finished.popleft(), None)
+        self._save()
+        print(f"🗂️ Job {job.id} {status.value}: {job.progress()}")
+
+    def _save(self):
+        """持久化未完成的作业（运行中的作业重启后从头执行，已有结果由缓存/存储复用）"""
+        if not self.state_file:
+            return
+        pending = [{"id": job.id, "urls": job.urls, "config": job.config.model_dump(mode='json'),
+                    "priority": job.priority, "created_at": job.created_at}
+                   for job in self.jobs.values() if job.status not in FINISHED]
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(pending, ensure_ascii=False), encoding='utf-8')
+        tmp.replace(self.state_file)
+
+    def _load(self) -> List[Job]:
+        if not self.state_file or not self.state_file.exists():
+            return []
+        try:
+            entries = json.loads(self.state_file.read_text(encoding='utf-8'))
+            return [Job(e["id"], e["urls"], self.config_model(**e["config"]), e["priority"],
+                        created_at=e["created_at"]) for e in entries]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Ignoring unreadable job state {self.state_file}: {e}")
+            return []
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status.value: 0 for status in JobStatus}
+        for job in self.jobs.values():
+            counts[job.status.value] += 1
+        return {**counts, "max_running": self.max_running, "max_queued": self.max_queued}
+
+    async def close(self):
+        """停止工作协程；未完成的作业保留在持久化状态中"""
+        self.closing = True
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        for task in list(self.running.values()):
+            task.cancel()
+        self.workers.clear()
+        self._save()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+metrics.py - Lightweight instrumentation for BeepSeq WebResearch.
+Counters, gauges and histograms rendered in the Prometheus text format
+(no client library needed), a per-URL StageTimer whose timings and sizes
+are attached to each result, and an optional tracer hook.
+Everything runs on the event loop thread, so updates are plain dict
+operations without locks.
+"""
+import bisect
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 可选的追踪钩子：(span名, 属性) -> 上下文管理器，例如OpenTelemetry的tracer.start_as_current_span
+Tracer = Callable[[str, Dict[str, Any]], ContextManager]
+_tracer: Optional[Tracer] = None
+
+
+def set_tracer(tracer: Optional[Tracer]):
+    """注册（或用None移除）追踪钩子；未注册时阶段计时不产生额外开销"""
+    global _tracer
+    _tracer = tracer
+
+
+def span(name: str, **attributes) -> ContextManager:
+    return _tracer(name, attributes) if _tracer else nullcontext()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Prometheus文本格式的样本行"""
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """数值型指标；提供fn时在抓取/metrics时回调取值（可返回{标签值元组: 数值}）"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 fn: Optional[Callable[[], Any]] = None, kind: Optional[str] = None):
+        super().__init__(name, help, labelnames)
+        self.values: Dict[Tuple, float] = {}
+        self.fn = fn
+        if kind:
+            self.kind = kind  # 由外部状态累计的计数器也以回调方式导出
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterator[str]:
+        values = self.values
+        if self.fn:
+            current = self.fn()
+            values = current if isinstance(current, dict) else {(): current}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple, List] = {}  # 标签 -> [各桶计数(非累计), 总和, 次数]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        if (entry := self.values.get(key)) is None:
+            entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = (), fn=None, kind=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, fn, kind))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus文本格式（text/plain; version=0.0.4）"""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+class StageTimer:
+    """单个URL的分阶段耗时与大小；结束时写入结果meta，并计入阶段直方图"""
+    __slots__ = ('url', 'histogram', 'timings', 'sizes')
+
+    def __init__(self, url: str, histogram: Optional[Histogram] = None):
+        self.url = url
+        self.histogram = histogram
+        self.timings: Dict[str, float] = {}
+        self.sizes: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=stage)
+
+    def add_size(self, name: str, count: int):
+        self.sizes[name] = self.sizes.get(name, 0) + count
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            with span(f"webresearch.{name}", url=self.url):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def to_meta(self) -> Dict[str, Any]:
+        """timings_ms按阶段累计；sizes中HTML/正文按字符、图像按字节计"""
+        return {"timings_ms": {k: round(v * 1000, 1) for k, v in self.timings.items()}, "sizes": dict(self.sizes)}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+readiness.py - Event-driven page readiness for browser renders.
+Instead of fixed sleeps, waits until the network is idle (tracked from CDP
+request events) and the DOM has stopped mutating (an injected
+MutationObserver), then scrolls one viewport at a time until the document
+stops growing and lazy images have loaded, all under a time budget.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+import nodriver as uc
+
+# 记录最近一次DOM变化（performance.now()），初始为0：安装前的变化视为已经平静
+INSTALL_JS = """(() => {
+  if (window.__wrReady) return;
+  const state = window.__wrReady = {last: 0};
+  new MutationObserver(() => { state.last = performance.now(); }).observe(document, {
+    childList: true, subtree: true, attributes: true, attributeFilter: ['src', 'srcset', 'style', 'class']});
+})()"""
+
+# 可选滚动一屏，返回[文档高度, 是否到底, 距最近DOM变化的毫秒数, 未加载完成的图像数]
+PROBE_JS = """((scroll) => {
+  if (scroll) window.scrollBy(0, Math.max(window.innerHeight * 0.9, 600));
+  const root = document.scrollingElement || document.documentElement;
+  const height = Math.max(root.scrollHeight, document.body ? document.body.scrollHeight : 0);
+  const atBottom = window.scrollY + window.innerHeight >= height - 4;
+  const last = window.__wrReady ? window.__wrReady.last : 0;
+  const pending = Array.from(document.images).filter(img => !img.complete || (!img.getAttribute('src') &&
+      (img.dataset.src || img.dataset.original || img.dataset.lazySrc))).length;
+  return JSON.stringify([height, atBottom, performance.now() - last, pending]);
+})(%s)"""
+
+
+class ReadyPolicy(NamedTuple):
+    budget: float = 10.0  # 等待与滚动的总时间上限（秒）
+    quiet_ms: int = 500  # 网络与DOM需保持平静的时长
+    max_scrolls: int = 25
+    max_inflight: int = 2  # 允许长连接、统计信标等始终挂着的请求
+
+
+class NetworkIdle:
+    """按CDP请求事件统计标签页上进行中的请求数，记录请求数降到阈值以下的时刻"""
+
+    def __init__(self, max_inflight: int = 2):
+        self.max_inflight = max_inflight
+        self.inflight = set()
+        self.idle_since: Optional[float] = time.monotonic()
+        self.tab = None
+
+    def _update(self):
+        if len(self.inflight) > self.max_inflight:
+            self.idle_since = None
+        elif self.idle_since is None:
+            self.idle_since = time.monotonic()
+
+    def _on_request(self, event: uc.cdp.network.RequestWillBeSent):
+        self.inflight.add(event.request_id)
+        # 新请求也算网络活动：即使仍在阈值内，也重新开始计算空闲时间
+        self.idle_since = None if len(self.inflight) > self.max_inflight else time.monotonic()
+
+    def _on_done(self, event):
+        self.inflight.discard(event.request_id)
+        self._update()
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.idle_since if self.idle_since is not None else 0.0
+
+    def install(self, tab):
+        """在导航前调用（需已启用Network域）"""
+        self.tab = tab
+        tab.add_handler(uc.cdp.network.RequestWillBeSent, self._on_request)
+        # nodriver按事件类型登记处理器，每种事件单独添加
+        tab.add_handler(uc.cdp.network.LoadingFinished, self._on_done)
+        tab.add_handler(uc.cdp.network.LoadingFailed, self._on_done)
+
+    def uninstall(self):
+        if self.tab is not None:
+            self.tab.remove_handler(uc.cdp.network.RequestWillBeSent, self._on_request)
+            self.tab.remove_handler(uc.cdp.network.LoadingFinished, self._on_done)
+            self.tab.remove_handler(uc.cdp.network.LoadingFailed, self._on_done)
+
+
+class _Probe(NamedTuple):
+    height: int
+    at_bottom: bool
+    dom_quiet_ms: float
+    pending_images: int
+
+
+async def _probe(tab, scroll: bool = False) -> Optional[_Probe]:
+    result = await tab.evaluate(PROBE_JS % ('true' if scroll else 'false'), return_by_value=True)
+    try:
+        return _Probe(*json.loads(result))
+    except (TypeError, ValueError):
+        return None  # 页面正在跳转或脚本被禁用
+
+
+async def _settle(tab, network: NetworkIdle, quiet: float, deadline: float, min_wait: float = 0.0) -> Optional[_Probe]:
+    """等到网络空闲且DOM在quiet秒内没有变化（或到达截止时间），返回最后一次探测结果"""
+    if min_wait:
+        await asyncio.sleep(min(min_wait, max(0.0, deadline - time.monotonic())))
+    while True:
+        probe = await _probe(tab)
+        if probe is None or time.monotonic() >= deadline or (
+                network.idle_for() >= quiet and probe.dom_quiet_ms >= quiet * 1000):
+            return probe
+        await asyncio.sleep(0.1)
+
+
+async def wait_until_ready(tab, network: NetworkIdle, policy: ReadyPolicy, timer) -> Dict[str, Any]:
+    """等待页面就绪：先等网络与DOM平静，再逐屏滚动直到文档不再增长且图像加载完成；返回就绪统计"""
+    started = time.monotonic()
+    deadline = started + policy.budget
+    quiet = policy.quiet_ms / 1000
+    await tab.evaluate(INSTALL_JS)
+    with timer.stage("wait"):
+        probe = await _settle(tab, network, quiet, deadline)
+    waited = time.monotonic() - started
+    scrolls, reason = 0, "ready"
+    with timer.stage("scroll"):
+        last_height = probe.height if probe else 0
+        while probe and not (probe.at_bottom and probe.pending_images == 0):
+            if time.monotonic() >= deadline:
+                reason = "budget"
+                break
+            if scrolls >= policy.max_scrolls:
+                reason = "max_scrolls"
+                break
+            await _probe(tab, scroll=True)
+            scrolls += 1
+            # 懒加载请求在滚动后的下一帧才发出，至少等一小段时间再判断是否平静
+            probe = await _settle(tab, network, quiet / 2, min(deadline, time.monotonic() + 2.0), min_wait=0.15)
+            if probe and probe.at_bottom and probe.height == last_height:
+                break  # 已到底且不再增长；仍未加载的图像不再等待
+            last_height = probe.height if probe else last_height
+    if probe is None:
+        reason = "unavailable"
+    return {"wait_ms": round(waited * 1000, 1), "total_ms": round((time.monotonic() - started) * 1000, 1),
+            "scrolls": scrolls, "height": probe.height if probe else None,
+            "pending_images": probe.pending_images if probe else None, "reason": reason}
+
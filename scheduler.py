@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+scheduler.py - Per-host politeness scheduler for BeepSeq WebResearch.
+Every request to a host (page loads, plain HTTP fetches, image downloads)
+takes a slot from that host's token bucket and adaptive concurrency limit.
+429/503 responses and Retry-After pause the host with exponential backoff;
+the concurrency limit grows while the host answers quickly and shrinks on
+errors or rising latency (AIMD). Latency is judged against a separate
+baseline per request kind (browser render, HTTP GET, image download), and
+only page loads grow the limit, so a burst of small images cannot open the
+host up for expensive renders.
+"""
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+from cachetools import LRUCache
+
+THROTTLE_STATUSES = (429, 503)
+GROWTH_KINDS = ("render", "http")  # 只有页面加载的快速成功会提高并发上限
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After（秒数或HTTP日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class HostState:
+    limit: float
+    tokens: float
+    refilled_at: float = field(default_factory=time.monotonic)
+    active: int = 0
+    blocked_until: float = 0.0
+    failures: int = 0  # 连续被限流次数，决定退避时长
+    latency: Dict[str, float] = field(default_factory=dict)  # 请求类型 -> 成功请求的延迟EWMA
+    min_latency: Dict[str, float] = field(default_factory=dict)  # 请求类型 -> 最低延迟（基线）
+    requests: int = 0
+    errors: int = 0
+    throttled: int = 0
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+
+@dataclass
+class HostTicket:
+    """一次已获准的请求；调用方用observe()报告响应状态"""
+    host: str
+    started: float
+    kind: str = "http"
+    status: Optional[int] = None
+    retry_after: Optional[float] = None
+    latency: Optional[float] = None
+
+    def observe(self, status: Optional[int], retry_after: Optional[str] = None):
+        self.status = status
+        self.retry_after = parse_retry_after(retry_after)
+        self.latency = time.monotonic() - self.started
+
+    @property
+    def throttled(self) -> bool:
+        return self.status in THROTTLE_STATUSES
+
+
+class HostScheduler:
+    def __init__(self, rate: float = 4.0, burst: int = 8, initial_concurrency: int = 2, max_concurrency: int = 8,
+                 min_concurrency: int = 1, latency_factor: float = 3.0, base_backoff: float = 1.0,
+                 max_backoff: float = 120.0, max_retries: int = 3):
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.latency_factor = latency_factor
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.hosts: Dict[str, HostState] = LRUCache(maxsize=4096)
+
+    def _state(self, host: str) -> HostState:
+        if (state := self.hosts.get(host)) is None:
+            state = self.hosts[host] = HostState(float(self.initial_concurrency), float(self.burst))
+        return state
+
+    def _refill(self, state: HostState, now: float):
+        state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate)
+        state.refilled_at = now
+
+    async def _acquire(self, state: HostState):
+        """等待退避结束、并发名额与令牌；返回前占用一个名额"""
+        async with state.changed:
+            while True:
+                now = time.monotonic()
+                if now < state.blocked_until:
+                    delay = state.blocked_until - now
+                elif state.active >= max(1, int(state.limit)):
+                    delay = None  # 等待其他请求释放名额
+                else:
+                    self._refill(state, now)
+                    if state.tokens >= 1:
+                        state.tokens -= 1
+                        state.active += 1
+                        return
+                    delay = (1 - state.tokens) / self.rate
+                try:
+                    await asyncio.wait_for(state.changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _record(self, state: HostState, ticket: HostTicket, error: bool):
+        """AIMD：快速成功时线性增加并发，限流/错误时减半，延迟明显升高时缓降"""
+        now = time.monotonic()
+        state.requests += 1
+        if ticket.throttled:
+            state.throttled += 1
+            state.failures += 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (state.failures - 1)) * (1 + random.random() / 4)
+            if ticket.retry_after is not None:
+                delay = min(self.max_backoff, max(delay, ticket.retry_after))
+            state.blocked_until = max(state.blocked_until, now + delay)
+            state.tokens = 0.0
+            state.limit = max(self.min_concurrency, state.limit / 2)
+            print(f"🐢 {ticket.host} answered {ticket.status}, backing off {delay:.1f}s "
+                  f"(concurrency {state.limit:.1f})")
+        elif error or (ticket.status or 0) >= 500:
+            state.errors += 1
+            state.limit = max(self.min_concurrency, state.limit / 2)
+        else:
+            state.failures = 0
+            kind = ticket.kind
+            latency = ticket.latency if ticket.latency is not None else now - ticket.started
+            average = state.latency[kind] = latency if kind not in state.latency else \
+                0.8 * state.latency[kind] + 0.2 * latency
+            baseline = state.min_latency[kind] = min(state.min_latency.get(kind, latency), latency)
+            if average > self.latency_factor * max(baseline, 0.1):
+                state.limit = max(self.min_concurrency, state.limit * 0.9)
+            elif kind in GROWTH_KINDS:
+                state.limit = min(self.max_concurrency, state.limit + 1 / state.limit)
+
+    @asynccontextmanager
+    async def slot(self, url: str, kind: str = "http") -> AsyncIterator[HostTicket]:
+        """按URL所属主机获取请求名额（kind区分render/http/image的延迟基线）；块内抛出的异常（取消除外）计为错误"""
+        host = urlparse(url).netloc
+        state = self._state(host)
+        await self._acquire(state)
+        ticket = HostTicket(host, time.monotonic(), kind)
+        error = cancelled = False
+        try:
+            yield ticket
+        except Exception:
+            error = True
+            raise
+        except BaseException:
+            cancelled = True
+            raise
+        finally:
+            state.active -= 1
+            if not cancelled:
+                self._record(state, ticket, error and ticket.status is None)
+            async with state.changed:
+                state.changed.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        return {host: {"concurrency": round(state.limit, 2), "active": state.active,
+                       "latency_ms": {kind: round(latency * 1000, 1) for kind, latency in state.latency.items()},
+                       "blocked_for": round(max(0.0, state.blocked_until - now), 1),
+                       "requests": state.requests, "errors": state.errors, "throttled": state.throttled}
+                for host, state in list(self.hosts.items())}
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+search.py - Async, cached web search for BeepSeq WebResearch.
+Search providers are pluggable (DuckDuckGo via DDGS by default, or a static
+JSON backend for offline tests); blocking backends run off the event loop,
+results are cached with a TTL, and multi-query searches are fanned out and
+merged with URLs deduplicated across queries.
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag
+
+from cachetools import TTLCache
+from ddgs.ddgs import DDGS
+
+
+@dataclass
+class SearchHit:
+    url: str
+    snippet: str = ""
+    title: str = ""
+    query: str = ""
+    rank: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SearchProvider(ABC):
+    """搜索后端接口：子类实现search()，返回按排名排序的结果"""
+    name = "base"
+
+    @abstractmethod
+    async def search(self, query: str, max_results: int) -> List[SearchHit]:
+        ...
+
+
+class DDGSProvider(SearchProvider):
+    name = "ddgs"
+
+    async def search(self, query: str, max_results: int) -> List[SearchHit]:
+        """DDGS为同步接口，放到线程中执行以免阻塞事件循环"""
+        rows = await asyncio.to_thread(lambda: DDGS().text(query, max_results=max_results))
+        return [SearchHit(r['href'], r.get('body', ''), r.get('title', ''), query, rank)
+                for rank, r in enumerate(rows or [])]
+
+
+class StaticSearchProvider(SearchProvider):
+    """本地固定结果：{query: [{url, snippet, title}, ...]}，用于离线测试；未知查询返回"*"项或空列表"""
+    name = "static"
+
+    def __init__(self, results: Dict[str, List[Dict[str, str]]], delay: float = 0.0):
+        self.results = results
+        self.delay = delay
+
+    @classmethod
+    def from_file(cls, path: str, delay: float = 0.0) -> "StaticSearchProvider":
+        return cls(json.loads(Path(path).read_text(encoding='utf-8')), delay)
+
+    async def search(self, query: str, max_results: int) -> List[SearchHit]:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        rows = self.results.get(query, self.results.get("*", []))[:max_results]
+        return [SearchHit(r['url'], r.get('snippet', ''), r.get('title', ''), query, rank)
+                for rank, r in enumerate(rows)]
+
+
+@dataclass
+class MergedHit:
+    """多查询合并后的结果，记录命中的全部查询"""
+    url: str
+    snippet: str = ""
+    title: str = ""
+    queries: List[str] = field(default_factory=list)
+    rank: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SearchService:
+    def __init__(self, provider: Optional[SearchProvider] = None, ttl: float = 3600, max_cache: int = 1024):
+        self.provider = provider or DDGSProvider()
+        self.cache = TTLCache(maxsize=max_cache, ttl=ttl)  # (query, max_results) -> List[SearchHit]
+        self.inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def search(self, query: str, max_results: int = 5) -> List[SearchHit]:
+        """带TTL缓存的单次搜索；相同查询的并发请求共享一次后端调用"""
+        key = (query.strip(), max_results)
+        if (hits := self.cache.get(key)) is not None:
+            return hits
+        if (task := self.inflight.get(key)) is None:
+            task = self.inflight[key] = asyncio.ensure_future(self.provider.search(*key))
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Tuple[str, int], task: asyncio.Future):
+        """后端调用结束时写入缓存（即使发起方已取消等待），失败不缓存"""
+        self.inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.cache[key] = task.result()
+
+    async def iter_hits(self, queries: List[str], max_results: int = 5) -> AsyncIterator[SearchHit]:
+        """并发执行多个查询，按查询完成顺序逐条产出结果，跨查询按URL去重；单个查询失败只记录不中断"""
+        seen = set()
+        tasks = [asyncio.ensure_future(self.search(q, max_results)) for q in dict.fromkeys(queries)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    hits = await next_done
+                except Exception as e:
+                    print(f"⚠️ Search failed: {e}")
+                    continue
+                for hit in hits:
+                    if (key := urldefrag(hit.url).url) not in seen:
+                        seen.add(key)
+                        yield hit
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def multi_search(self, queries: List[str], max_results: int = 5) -> List[MergedHit]:
+        """合并多个查询的结果：同一URL只保留一条并记录所有命中的查询，按最佳排名排序"""
+        results = await asyncio.gather(*(self.search(q, max_results) for q in dict.fromkeys(queries)),
+                                       return_exceptions=True)
+        merged: Dict[str, MergedHit] = {}
+        for hits in results:
+            if isinstance(hits, Exception):
+                print(f"⚠️ Search failed: {hits}")
+                continue
+            for hit in hits:
+                key = urldefrag(hit.url).url
+                if (entry := merged.get(key)) is None:
+                    entry = merged[key] = MergedHit(hit.url, hit.snippet, hit.title, rank=hit.rank)
+                entry.queries.append(hit.query)
+                entry.rank = min(entry.rank, hit.rank)
+        return sorted(merged.values(), key=lambda h: (h.rank, -len(h.queries)))
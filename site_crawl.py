@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+site_crawl.py - Bounded site crawls for BeepSeq WebResearch.
+Seeds from start URLs and/or sitemaps, follows in-scope links through a
+priority frontier (shallowest first) up to a depth and page budget, remembers
+visited URLs as 64-bit hashes of their canonical form, and checkpoints the
+frontier so an interrupted crawl can resume. Every page goes through
+WebCrawler.crawl_iter, so caching, host scheduling, dedup and the content
+store all apply.
+"""
+import asyncio
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from dedup import DuplicateIndex, canonical_key
+
+# 明显不是HTML页面的链接
+SKIP_EXTENSIONS = re.compile(r'\.(?:pdf|zip|gz|tgz|tar|rar|7z|exe|dmg|msi|iso|apk|png|jpe?g|gif|webp|svg|ico|bmp|'
+                             r'mp[34]|avi|mov|webm|wav|ogg|woff2?|ttf|eot|css|js|json|xml|rss|atom|txt|csv)$', re.I)
+MAX_SITEMAPS = 50
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointError(ValueError):
+    """检查点无法用于本次抓取（版本不符或起始URL不同）"""
+
+
+def url_hash(url: str) -> int:
+    """规范URL的64位哈希；已访问集合只存整数，十万级URL仅占数MB"""
+    return int.from_bytes(hashlib.blake2b(canonical_key(url).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _site(url: str) -> str:
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class SiteCrawler:
+    def __init__(self, crawler, seeds: List[str], config, max_pages: int = 100, max_depth: int = 3,
+                 sitemap: Union[bool, str] = True, path_prefix: Optional[str] = None,
+                 include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 concurrency: int = 4, respect_robots: bool = True,
+                 checkpoint: Optional[str] = None, checkpoint_every: int = 20):
+        self.crawler = crawler
+        self.seeds = list(dict.fromkeys(seeds))
+        self.config = config.model_copy(update={"collect_links": True})
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.sitemap = sitemap
+        self.sites = {_site(seed) for seed in self.seeds}
+        self.path_prefix = path_prefix or '/'
+        self.include = [re.compile(p) for p in include or []]
+        self.exclude = [re.compile(p) for p in exclude or []]
+        self.concurrency = max(1, concurrency)
+        self.respect_robots = respect_robots
+        self.checkpoint = Path(checkpoint) if checkpoint else None
+        self.checkpoint_every = checkpoint_every
+        self.index = DuplicateIndex() if config.deduplicate or config.strip_boilerplate else None  # 跨整个站点抓取共享
+        self.seen: Set[int] = set()
+        self.frontier: List[Tuple[int, float, int, int, str]] = []  # (深度, -sitemap优先级, 路径层数, 序号, URL)
+        self.in_flight: Dict[str, int] = {}  # URL -> 深度
+        self.robots: Dict[str, Optional[RobotFileParser]] = {}
+        self.sequence = 0
+        self.stats = {"pages": 0, "failed": 0, "duplicates": 0, "sitemap_urls": 0, "out_of_scope": 0,
+                      "robots_blocked": 0}
+
+    def in_scope(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or _site(url) not in self.sites:
+            return False
+        if not (parts.path or '/').startswith(self.path_prefix) or SKIP_EXTENSIONS.search(parts.path):
+            return False
+        if self.include and not any(p.search(url) for p in self.include):
+            return False
+        return not any(p.search(url) for p in self.exclude)
+
+    def _push(self, url: str, depth: int, priority: float = 0.5, force: bool = False) -> bool:
+        """加入待抓队列（按规范URL哈希去重）；force时跳过范围检查（起始URL）"""
+        if not force and not self.in_scope(url):
+            self.stats["out_of_scope"] += 1
+            return False
+        key = url_hash(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.sequence += 1
+        path_depth = urlsplit(url).path.rstrip('/').count('/')
+        heapq.heappush(self.frontier, (depth, -priority, path_depth, self.sequence, url))
+        return True
+
+    async def _get_text(self, url: str) -> Optional[bytes]:
+        try:
+            response = await self.crawler._http_get(url)
+        except Exception:
+            return None
+        return response.content if response.status_code == 200 else None
+
+    async def _robots(self, url: str) -> Optional[RobotFileParser]:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self.robots:
+            body = await self._get_text(f"{origin}/robots.txt")
+            parser = None
+            if body is not None:
+                parser = RobotFileParser()
+                parser.parse(body.decode('utf-8', 'replace').splitlines())
+            self.robots[origin] = parser
+        return self.robots[origin]
+
+    async def _allowed(self, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        parser = await self._robots(url)
+        return parser is None or parser.can_fetch("*", url)
+
+    async def _sitemap_urls(self) -> List[Tuple[str, float]]:
+        """读取sitemap（含sitemap索引与.gz），返回[(URL, 优先级)]；未指定时从robots.txt的Sitemap行或/sitemap.xml发现"""
+        if isinstance(self.sitemap, str):
+            pending = [self.sitemap]
+        else:
+            pending = []
+            for seed in self.seeds:
+                parts = urlsplit(seed)
+                parser = await self._robots(seed)
+                pending += (parser.site_maps() if parser else None) or [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+        urls, fetched = [], set()
+        while pending and len(fetched) < MAX_SITEMAPS:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+            if (body := await self._get_text(sitemap_url)) is None:
+                continue
+            try:
+                root = ET.fromstring(gzip.decompress(body) if body[:2] == b'\x1f\x8b' else body)
+            except (ET.ParseError, OSError):
+                print(f"⚠️ Unreadable sitemap: {sitemap_url}")
+                continue
+            for entry in root:
+                fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in entry}
+                if not fields.get('loc'):
+                    continue
+                if entry.tag.endswith('sitemap'):
+                    pending.append(fields['loc'])
+                else:
+                    try:
+                        priority = float(fields.get('priority') or 0.5)
+                    except ValueError:
+                        priority = 0.5
+                    urls.append((fields['loc'], priority))
+        return urls
+
+    async def _seed(self):
+        for seed in self.seeds:
+            self._push(seed, 0, priority=1.0, force=True)
+        if self.sitemap:
+            for url, priority in await self._sitemap_urls():
+                if self._push(url, 0, priority):
+                    self.stats["sitemap_urls"] += 1
+            print(f"🗺️ Sitemap: {self.stats['sitemap_urls']} in-scope URLs")
+
+    def save_checkpoint(self, complete: bool = False):
+        """原子写入检查点：已访问哈希、待抓队列与进行中的URL（恢复时重新抓取）"""
+        if not self.checkpoint:
+            return
+        state = {"version": CHECKPOINT_VERSION, "seeds": self.seeds, "complete": complete, "stats": self.stats,
+                 "sequence": self.sequence, "seen": list(self.seen), "frontier": self.frontier,
+                 "in_flight": list(self.in_flight.items())}
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint.with_suffix('.tmp')
+        tmp.write_text(json.dumps(state), encoding='utf-8')
+        os.replace(tmp, self.checkpoint)
+
+    def load_checkpoint(self, done_urls: Optional[Set[str]] = None) -> bool:
+        """从检查点恢复；done_urls为输出中已有的URL，对应的进行中条目不再重抓。无检查点时返回False；
+        检查点属于其他起始URL时抛出CheckpointError，避免把另一个站点的队列混进本次输出"""
+        if not self.checkpoint or not self.checkpoint.exists():
+            return False
+        state = json.loads(self.checkpoint.read_text(encoding='utf-8'))
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise CheckpointError(f"Unsupported checkpoint version in {self.checkpoint}")
+        if sorted(state.get("seeds") or ()) != sorted(self.seeds):
+            raise CheckpointError(f"Checkpoint {self.checkpoint} was written for seeds {', '.join(state.get('seeds') or ())}")
+        self.stats.update(state["stats"])
+        self.sequence = state["sequence"]
+        self.seen = set(state["seen"])
+        self.frontier = [tuple(entry) for entry in state["frontier"]]
+        for url, depth in state["in_flight"]:
+            if url not in (done_urls or ()):
+                self.sequence += 1
+                self.frontier.append((depth, -1.0, 0, self.sequence, url))
+        heapq.heapify(self.frontier)
+        print(f"⏯️ Resuming crawl: {self.stats['pages']} pages done, {len(self.frontier)} queued")
+        return True
+
+    async def _fetch(self, url: str, depth: int):
+        async for page in self.crawler.crawl_iter([url], self.config, index=self.index):
+            return url, depth, page
+
+    def _finish(self, url: str, depth: int, page):
+        """记录一个完成的页面并把页内链接加入队列，返回去掉链接列表后的结果；URL仍留在in_flight中，由调用方在产出后移除"""
+        meta = dict(page.meta)
+        links = meta.pop("links", None) or []
+        self.stats["pages"] += 1
+        if meta.get("status") != "success":
+            self.stats["failed"] += 1
+        elif "duplicate_of" in meta:
+            self.stats["duplicates"] += 1
+        elif depth < self.max_depth:
+            for link in links:
+                self._push(link, depth + 1)
+        return replace(page, meta={**meta, "depth": depth, "links_found": len(links)})
+
+    async def run(self, resume: bool = False, done_urls: Optional[Set[str]] = None) -> AsyncIterator[Any]:
+        """按完成顺序产出页面，直到队列为空或达到页数上限；每产出checkpoint_every个页面写一次检查点"""
+        if not (resume and self.load_checkpoint(done_urls)):
+            await self._seed()
+        active, complete = set(), False
+        try:
+            while True:
+                while self.frontier and len(active) < self.concurrency and \
+                        self.stats["pages"] + len(active) < self.max_pages:
+                    depth, *_, url = heapq.heappop(self.frontier)
+                    if not await self._allowed(url):
+                        self.stats["robots_blocked"] += 1
+                        continue
+                    self.in_flight[url] = depth
+                    active.add(asyncio.ensure_future(self._fetch(url, depth)))
+                if not active:
+                    break
+                done, active = await asyncio.wait(active, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # 先产出再移出in_flight：检查点里不在进行中的页面一定已被调用方写出；
+                    # 调用方在yield处停止时，该URL仍在in_flight中，恢复时会重新抓取
+                    url, depth, page = task.result()
+                    yield self._finish(url, depth, page)
+                    self.in_flight.pop(url, None)
+                    if self.stats["pages"] % self.checkpoint_every == 0:
+                        self.save_checkpoint()
+            complete = True
+            self.save_checkpoint(complete=True)
+            print(f"🏁 Site crawl finished: {self.stats}")
+        finally:
+            for task in active:
+                task.cancel()
+            if not complete:
+                self.save_checkpoint()  # 中断：进行中的URL留在检查点里，恢复时重新抓取
@@ -0,0 +1,40 @@
+import asyncio
+
+from config import CrawlerConfig, ImageMode
+from content_store import ContentStore, StoredPage, sha256
+from core import PageResult, WebCrawler
+
+URL = "https://example.com/gallery"
+ASSET = "ab" * 32 + ".webp"
+
+
+def test_store_hit_after_restart_registers_asset_dir(tmp_path):
+    config = CrawlerConfig(image_mode=ImageMode.assets, output_dir=str(tmp_path / "out"))
+    (tmp_path / "out" / "assets").mkdir(parents=True)
+    (tmp_path / "out" / "assets" / ASSET).write_bytes(b"RIFF")
+    content = f"![photo](assets/{ASSET})"
+    fingerprint = config.fingerprint()
+    store = ContentStore(str(tmp_path / "store"))
+    store.put(ContentStore.key(URL, fingerprint), fingerprint, StoredPage(URL, content, "Gallery", sha256(content)), 60)
+    store.close()
+
+    # 重启后的新进程：资源目录只有在服务过该配置后才会被登记
+    crawler = WebCrawler(store_dir=str(tmp_path / "store"))
+    try:
+        assert crawler.asset_path(ASSET) is None
+        page = asyncio.run(crawler.fetch_page(URL, config))
+        assert page.meta["cache"] == "store" and page.content == content
+        assert crawler.asset_path(ASSET) == tmp_path / "out" / "assets" / ASSET
+        assert crawler.asset_path("../secret.webp") is None
+    finally:
+        crawler.store.close()
+
+
+def test_memory_cache_hit_registers_asset_dir(tmp_path):
+    config = CrawlerConfig(image_mode=ImageMode.assets, output_dir=str(tmp_path / "out"))
+    (tmp_path / "out" / "assets").mkdir(parents=True)
+    (tmp_path / "out" / "assets" / ASSET).write_bytes(b"RIFF")
+    crawler = WebCrawler()
+    crawler.cache[(URL, config.fingerprint())] = PageResult(URL, f"![photo](assets/{ASSET})", "Gallery")
+    asyncio.run(crawler.fetch_page(URL, config))
+    assert crawler.asset_path(ASSET) is not None
@@ -0,0 +1,24 @@
+import pytest
+
+from blocking import BlockPolicy
+from config import CrawlerConfig
+from core import WebCrawler
+
+
+def test_blocking_is_opt_in():
+    policy = WebCrawler._block_policy(CrawlerConfig())
+    assert not policy.active
+    assert not WebCrawler._block_policy(CrawlerConfig(embed_images=False)).active
+
+
+def test_opted_in_blocking():
+    policy = WebCrawler._block_policy(CrawlerConfig(block_types="font, MEDIA", block_images=True, block_trackers=True,
+                                                    block_urls="*://cdn.example.com/*, ", block_third_party_frames=True))
+    assert policy.resource_types == {"Font", "Media", "Image"}
+    assert policy.url_patterns == ("*://cdn.example.com/*",)
+    assert policy.trackers and policy.third_party_frames and policy.active
+
+
+def test_unknown_resource_type_is_rejected():
+    with pytest.raises(ValueError, match="Fonts"):
+        BlockPolicy.parse_types("Fonts")
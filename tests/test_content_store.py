@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import httpx
+
+from config import CrawlerConfig, OutputFormat
+from content_store import ContentStore, StoredPage, sha256
+
+URL = "https://example.com/article"
+
+
+def _page(content="# Title\n\nBody", **fields):
+    return StoredPage(URL, content, "Title", sha256(content), **fields)
+
+
+def test_put_get_round_trip(tmp_path):
+    store = ContentStore(str(tmp_path))
+    page = _page(meta={"path": "http", "words": 3}, etag='"v1"', source_hash=sha256("<html>"))
+    store.put("k", "fp", page, ttl=60)
+    loaded = store.get("k")
+    assert (loaded.url, loaded.content, loaded.title, loaded.meta) == (URL, page.content, "Title", page.meta)
+    assert loaded.etag == '"v1"' and loaded.source_hash == sha256("<html>")
+    assert store.get("missing") is None
+    store.close()
+
+
+def test_identical_content_shares_one_blob(tmp_path):
+    store = ContentStore(str(tmp_path))
+    store.put("a", "fp", _page(), ttl=60)
+    store.put("b", "fp", _page(), ttl=60)
+    assert store.stats() == {"entries": 2, "blobs": 1}
+    store.close()
+
+
+def test_missing_blob_is_a_miss(tmp_path):
+    store = ContentStore(str(tmp_path))
+    page = _page()
+    store.put("k", "fp", page, ttl=60)
+    store._blob_path(page.content_hash).unlink()
+    assert store.get("k") is None
+    store.close()
+
+
+def test_ttl_freshness_and_touch(tmp_path):
+    store = ContentStore(str(tmp_path))
+    store.put("k", "fp", _page(etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT"), ttl=-1)
+    stale = store.get("k")
+    assert not stale.fresh and stale.revalidatable
+
+    store.touch("k", ttl=60, etag='"v2"')
+    renewed = store.get("k")
+    assert renewed.fresh and renewed.expires_at > time.time() + 50
+    assert renewed.etag == '"v2"'
+    assert renewed.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"  # 未返回的校验器保持不变
+    store.close()
+
+
+def test_keys_separate_urls_and_config_fingerprints():
+    html = CrawlerConfig(output_format=OutputFormat.html).fingerprint()
+    markdown = CrawlerConfig(output_format=OutputFormat.markdown).fingerprint()
+    assert html != markdown
+    assert ContentStore.key(URL, html) != ContentStore.key(URL, markdown)
+    assert ContentStore.key(URL, html) != ContentStore.key(URL + "/2", html)
+    # 不影响输出的字段不改变指纹
+    assert CrawlerConfig(no_cache=True, cache_ttl=5).fingerprint() == CrawlerConfig().fingerprint()
+
+
+def test_html_and_markdown_are_stored_separately(tmp_path):
+    store = ContentStore(str(tmp_path))
+    for fmt, content in ((OutputFormat.html, "<h1>Title</h1>"), (OutputFormat.markdown, "# Title")):
+        fingerprint = CrawlerConfig(output_format=fmt).fingerprint()
+        store.put(ContentStore.key(URL, fingerprint), fingerprint, _page(content), ttl=60)
+    for fmt, content in ((OutputFormat.html, "<h1>Title</h1>"), (OutputFormat.markdown, "# Title")):
+        fingerprint = CrawlerConfig(output_format=fmt).fingerprint()
+        assert store.get(ContentStore.key(URL, fingerprint)).content == content
+    store.close()
+
+
+def _revalidate(tmp_path, response: httpx.Response):
+    """过期条目经_lookup_store重新验证，返回(结果, 续期后的条目)"""
+    from core import WebCrawler
+
+    crawler = WebCrawler(store_dir=str(tmp_path))
+    crawler.store.put("k", "fp", _page(etag='"v1"', source_hash=sha256("<html>same</html>")), ttl=-1)
+    requests = []
+
+    async def fake_get(url, headers=None):
+        requests.append(headers)
+        return response
+
+    crawler._http_get = fake_get
+    try:
+        page, _ = asyncio.run(crawler._lookup_store("k", CrawlerConfig(cache_ttl=60)))
+        return page, crawler.store.get("k"), requests
+    finally:
+        crawler.store.close()
+
+
+def test_not_modified_response_renews_entry(tmp_path):
+    response = httpx.Response(304, headers={"etag": '"v2"'}, request=httpx.Request("GET", URL))
+    page, stored, requests = _revalidate(tmp_path, response)
+    assert requests == [{"If-None-Match": '"v1"'}]
+    assert page.meta["cache"] == "revalidated" and page.content == "# Title\n\nBody"
+    assert stored.fresh and stored.etag == '"v2"'
+
+
+def test_identical_body_renews_entry(tmp_path):
+    response = httpx.Response(200, text="<html>same</html>", request=httpx.Request("GET", URL))
+    page, stored, _ = _revalidate(tmp_path, response)
+    assert page.meta["cache"] == "revalidated"
+    assert stored.fresh
+
+
+def test_changed_body_is_a_miss(tmp_path):
+    response = httpx.Response(200, text="<html>new</html>", request=httpx.Request("GET", URL))
+    page, stored, _ = _revalidate(tmp_path, response)
+    assert page is None
+    assert not stored.fresh
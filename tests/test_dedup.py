@@ -0,0 +1,112 @@
+import random
+
+from dedup import BoilerplateFilter, DuplicateIndex, canonical_key, clean_url, simhash
+
+
+def test_canonical_key_strips_mirror_hosts_and_amp():
+    base = canonical_key("https://example.com/news/story")
+    for variant in ("https://www.example.com/news/story/", "https://amp.example.com/news/story",
+                    "https://m.example.com/news/story", "http://example.com/news/story/amp",
+                    "https://example.com/news/story?amp=1&utm_source=x#top"):
+        assert canonical_key(variant) == base
+    # 只有两段的主机不去前缀（m.com本身就是站点）
+    assert canonical_key("https://m.com/a") != canonical_key("https://com/a")
+    assert canonical_key("https://example.com/a?b=2&a=1") == canonical_key("https://example.com/a?a=1&b=2")
+
+
+def test_clean_url_keeps_untouched_query_verbatim():
+    assert clean_url("https://x.org/p?q=a%20b&utm_medium=mail#frag") == "https://x.org/p?q=a+b"
+    assert clean_url("https://x.org/p?q=a%20b") == "https://x.org/p?q=a%20b"
+
+
+def _article(seed: int, words: int = 300) -> str:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def test_near_duplicates_match_within_distance():
+    index = DuplicateIndex()
+    text = _article(1)
+    fingerprint, words = simhash(text)
+    assert index.check("https://a.com/1", None, fingerprint, words) == (None, "")
+
+    near = fingerprint ^ 0b101  # 海明距离2
+    assert index.check("https://b.com/1", None, near, words) == ("https://a.com/1", "near")
+    far = fingerprint ^ 0b1111  # 海明距离4
+    assert index.check("https://c.com/1", None, far, words) == (None, "")
+
+
+def test_simhash_of_lightly_edited_text_is_close():
+    text = _article(2)
+    words = text.split()
+    words[100] = "changed"
+    edited = " ".join(words)
+    a, _ = simhash(text)
+    b, _ = simhash(edited)
+    assert bin(a ^ b).count("1") <= 3
+    c, _ = simhash(_article(3))
+    assert bin(a ^ c).count("1") > 3
+
+
+def test_short_pages_are_never_near_duplicates():
+    index = DuplicateIndex(min_words=50)
+    fingerprint, words = simhash("only a handful of words here")
+    assert words < 50
+    assert index.check("https://a.com/", None, fingerprint, words) == (None, "")
+    assert index.check("https://b.com/", None, fingerprint, words) == (None, "")
+
+
+def test_canonical_and_url_claims():
+    index = DuplicateIndex()
+    assert index.claim("https://www.example.com/a") is None
+    assert index.claim("https://example.com/a/?utm_source=feed") == "https://www.example.com/a"
+    assert index.check("https://mirror.org/a", "https://example.com/a", 0, 0) == ("https://www.example.com/a", "canonical")
+
+
+def test_boilerplate_keeps_headings_code_and_short_lines():
+    nav = "Subscribe to our newsletter to get the latest documentation updates every week."
+    page = """# Function {i}
+
+Function number {i} does something unique to itself, revision {i}.
+
+## Parameters
+
+```python
+x = 1
+
+y = 2
+```
+
+    indented_code_line()
+
+{nav}
+
+See also
+"""
+    boilerplate = BoilerplateFilter(min_pages=3)
+    for i in range(4):
+        text, removed = boilerplate.strip("docs.example.com", f"https://docs.example.com/{i}", page.format(i=i, nav=nav))
+    assert removed == 1
+    assert nav not in text
+    for kept in ("## Parameters", "x = 1", "y = 2", "indented_code_line()", "See also", "revision 3"):
+        assert kept in text
+
+
+def test_boilerplate_counts_each_url_once():
+    block = "A long enough repeated paragraph that would look like boilerplate on this host."
+    boilerplate = BoilerplateFilter(min_pages=2)
+    for _ in range(3):
+        text, removed = boilerplate.strip("h", "https://h/same", f"unique body text\n\n{block}\n")
+    assert removed == 0
+
+
+def test_dedup_session_shares_index_across_calls():
+    from core import CrawlerConfig, WebCrawler
+
+    crawler = WebCrawler()
+    shared = crawler._index_for(CrawlerConfig(dedup_session="research"))
+    assert crawler._index_for(CrawlerConfig(dedup_session="research")) is shared
+    assert crawler._index_for(CrawlerConfig()) is not shared
+    assert crawler._index_for(CrawlerConfig(dedup_session="other")) is not shared
+    assert crawler._index_for(CrawlerConfig(deduplicate=False, dedup_session="research")) is None
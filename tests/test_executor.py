@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from executor import MAX_WORKERS, BoundedExecutor, ExecutorKind, ExtractionTimeout
+
+
+def test_worker_count_is_clamped():
+    assert BoundedExecutor(workers=0).workers == MAX_WORKERS
+    assert BoundedExecutor(workers=-3).workers == 1
+    assert BoundedExecutor(workers=MAX_WORKERS * 10).workers == MAX_WORKERS
+
+
+def test_config_rejects_out_of_range_workers():
+    from pydantic import ValidationError
+
+    from config import CrawlerConfig
+
+    for workers in (0, -1, MAX_WORKERS + 1):
+        with pytest.raises(ValidationError):
+            CrawlerConfig(executor_workers=workers)
+    assert CrawlerConfig(executor_workers=1).executor_workers == 1
+
+
+def test_timeout_kills_process_pool_and_recovers():
+    executor = BoundedExecutor(ExecutorKind.process, workers=1, task_timeout=0.5)
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(ExtractionTimeout):
+            await executor.run(time.sleep, 30)
+        assert time.monotonic() - started < 10
+        return await executor.run(abs, -4)
+
+    try:
+        assert asyncio.run(run()) == 4
+        assert executor.timeouts == 1 and executor.restarts == 1
+    finally:
+        executor.shutdown()
+
+
+def test_tasks_on_a_killed_pool_are_retried_once():
+    executor = BoundedExecutor(ExecutorKind.process, workers=2, task_timeout=1.0)
+
+    async def run():
+        # sleep(0.1)让第一个任务先开始；另一个任务在池被终止时失败，应在新池中重试成功
+        runaway = asyncio.ensure_future(executor.run(time.sleep, 30))
+        await asyncio.sleep(0.1)
+        survivor = asyncio.ensure_future(executor.run(time.sleep, 2, timeout=10))
+        return await asyncio.gather(runaway, survivor, return_exceptions=True)
+
+    try:
+        runaway, survivor = asyncio.run(run())
+        assert isinstance(runaway, ExtractionTimeout)
+        assert survivor is None
+        assert executor.restarts == 1  # 重试时丢弃的是已被替换的旧池，不重复计数
+    finally:
+        executor.shutdown()
+
+
+def test_broken_pool_is_raised_after_one_retry():
+    executor = BoundedExecutor(ExecutorKind.process, workers=1, task_timeout=10)
+
+    try:
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(executor.run(os._exit, 1))
+        assert executor.restarts == 2
+    finally:
+        executor.shutdown()
+
+
+def test_thread_executor_times_out_without_restart():
+    executor = BoundedExecutor(ExecutorKind.thread, workers=1, task_timeout=0.2)
+
+    try:
+        with pytest.raises(ExtractionTimeout):
+            asyncio.run(executor.run(time.sleep, 0.5))
+        assert executor.timeouts == 1 and executor.restarts == 0
+    finally:
+        executor.shutdown()
@@ -0,0 +1,71 @@
+import lxml.html
+
+from extraction import _escape_attr, collect_images, embed_images, extract_content, extract_links
+
+BASE = "https://example.com/blog/post.html"
+PAYLOAD = "data:image/png;base64,AAAA"
+
+
+def _collect(fragment: str):
+    tree = lxml.html.fromstring(f"<div>{fragment}</div>")
+    return tree, collect_images(tree, BASE)
+
+
+def test_relative_sources_resolve_against_page_url():
+    _, images = _collect('<img src="img/a.png" alt="A"><img src="/root.png"><img src="//cdn.example.net/c.png">'
+                         '<img src="img/a.png">')
+    assert [(i["src"], i["full_url"], i["alt"]) for i in images] == [
+        ("img/a.png", "https://example.com/blog/img/a.png", "A"),
+        ("/root.png", "https://example.com/root.png", ""),
+        ("//cdn.example.net/c.png", "https://cdn.example.net/c.png", ""),
+    ]
+
+
+def test_lazy_attributes_are_promoted_to_src():
+    tree, images = _collect('<img src="data:image/gif;base64,R0lGOD" data-src="real.jpg">'
+                            '<img data-lazy-src="lazy.jpg">'
+                            '<img srcset="small.jpg 480w, large.jpg 1200w, medium.jpg 800w">'
+                            '<img data-srcset="one.jpg 1x, two.jpg 2x">'
+                            '<img src="data:image/png;base64,AAAA">')
+    assert [i["src"] for i in images] == ["real.jpg", "lazy.jpg", "large.jpg", "two.jpg"]
+    imgs = tree.findall(".//img")
+    assert [img.get("src") for img in imgs[:4]] == ["real.jpg", "lazy.jpg", "large.jpg", "two.jpg"]
+    for img in imgs[:4]:
+        assert not {"srcset", "data-src", "data-lazy-src", "data-srcset"} & set(img.attrib)
+
+
+def test_escape_attr_matches_lxml_serialization():
+    for src in ("a.png?w=1&h=2", "dir/my image.png", "bild-ü.png", "x.png?q=<b>"):
+        tree = lxml.html.fromstring("<div><img></div>")
+        tree.find(".//img").set("src", src)
+        serialized = lxml.html.tostring(tree, encoding="unicode")
+        assert f'src="{_escape_attr(src)}"' in serialized
+
+
+def test_embed_images_handles_ampersands_in_html_and_markdown():
+    src = "https://img.example.com/p.png?w=100&h=50"
+    page = f'<html><head><title>T</title></head><body><article><h1>Heading</h1><p>{"Text. " * 40}</p>' \
+           f'<img src="{src.replace("&", "&amp;")}" alt="pic"><p>{"More. " * 40}</p></article></body></html>'
+    extracted = extract_content(page, BASE, use_readability=True, want_images=True)
+    assert [i["src"] for i in extracted.images] == [src]
+
+    html_out, md_out = embed_images(extracted.clean_html, extracted.md_content, {src: PAYLOAD})
+    assert f'src="{PAYLOAD}"' in html_out
+    assert "p.png" not in html_out
+    assert f"]({PAYLOAD})" in md_out
+
+
+def test_embed_images_prefers_longest_match_and_keeps_other_urls():
+    html = '<img src="a.png"><img src="a.png.webp"><img src="b.png">'
+    md = "![](a.png) ![](a.png.webp) ![](b.png \"title\")"
+    html_out, md_out = embed_images(html, md, {"a.png": "A", "a.png.webp": "W", "b.png": "B"})
+    assert html_out == '<img src="A"><img src="W"><img src="B">'
+    assert md_out == '![](A) ![](W) ![](B "title")'
+    assert embed_images(html, md, {}) == (html, md)
+
+
+def test_extract_links_resolves_base_and_entities():
+    page = '<base href="https://docs.example.org/v2/"><a href="guide.html#intro">x</a>' \
+           '<a href="/search?q=a&amp;page=2">y</a><a href="mailto:me@example.org">z</a><a href="guide.html">dup</a>'
+    assert extract_links(page, BASE) == ["https://docs.example.org/v2/guide.html",
+                                         "https://docs.example.org/search?q=a&page=2"]
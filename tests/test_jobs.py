@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+from config import CrawlerConfig
+from core import PageResult
+from jobs import JobManager, JobQueueFull, JobStatus
+
+
+class FakeCrawler:
+    """记录作业开始的顺序；gate未打开时每个URL都挂起"""
+
+    def __init__(self):
+        self.started = []
+        self.gate = asyncio.Event()
+
+    async def crawl_iter(self, urls, config, limiter=None):
+        self.started.append(urls[0])
+        for url in urls:
+            await self.gate.wait()
+            yield PageResult(url, f"content of {url}", meta={"status": "success"})
+
+
+async def _until(predicate, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_jobs_run_in_priority_order():
+    async def run():
+        crawler = FakeCrawler()
+        manager = JobManager(crawler, CrawlerConfig, max_running=1)
+        blocker = await manager.submit(["https://a/blocker"], CrawlerConfig())
+        await manager.start()
+        await _until(lambda: crawler.started)
+        low = await manager.submit(["https://a/low"], CrawlerConfig(), priority=0)
+        high = await manager.submit(["https://a/high"], CrawlerConfig(), priority=5)
+        also_low = await manager.submit(["https://a/low-2"], CrawlerConfig(), priority=0)
+        crawler.gate.set()
+        await _until(lambda: all(manager.get(job.id).status == JobStatus.done
+                                 for job in (blocker, low, high, also_low)))
+        await manager.close()
+        return crawler.started
+
+    assert asyncio.run(run()) == ["https://a/blocker", "https://a/high", "https://a/low", "https://a/low-2"]
+
+
+def test_cancel_queued_and_running_jobs():
+    async def run():
+        crawler = FakeCrawler()
+        manager = JobManager(crawler, CrawlerConfig, max_running=1)
+        await manager.start()
+        running = await manager.submit(["https://a/1", "https://a/2"], CrawlerConfig())
+        queued = await manager.submit(["https://a/3"], CrawlerConfig())
+        await _until(lambda: running.status == JobStatus.running)
+
+        assert manager.cancel(queued.id).status == JobStatus.cancelled
+        manager.cancel(running.id)
+        await _until(lambda: running.id not in manager.running)
+        assert running.status == JobStatus.cancelled and running.finished_at is not None
+        assert manager.cancel("missing") is None
+
+        crawler.gate.set()
+        await asyncio.sleep(0.05)
+        await manager.close()
+        return crawler.started, manager.stats()
+
+    started, stats = asyncio.run(run())
+    assert started == ["https://a/1"]  # 已取消的排队作业不会开始
+    assert stats["cancelled"] == 2
+
+
+def test_cancelled_worker_does_not_start_the_next_job():
+    async def run():
+        crawler = FakeCrawler()
+        manager = JobManager(crawler, CrawlerConfig, max_running=1)
+        await manager.start()
+        first = await manager.submit(["https://a/1"], CrawlerConfig())
+        await _until(lambda: first.status == JobStatus.running)
+        await manager.submit(["https://a/2"], CrawlerConfig())
+        manager.workers[0].cancel()
+        await asyncio.gather(*manager.workers, return_exceptions=True)
+        return crawler.started, first.status
+
+    started, status = asyncio.run(run())
+    assert started == ["https://a/1"]
+    assert status == JobStatus.running  # 未完成，持久化后重启时重新执行
+
+
+def test_full_queue_raises_with_retry_after():
+    async def run():
+        manager = JobManager(FakeCrawler(), CrawlerConfig, max_running=2, max_queued=2)
+        manager.avg_job_seconds = 30
+        for i in range(2):
+            await manager.submit([f"https://a/{i}"], CrawlerConfig())
+        try:
+            await manager.submit(["https://a/overflow"], CrawlerConfig())
+        except JobQueueFull as e:
+            return e
+        raise AssertionError("submit should have been refused")
+
+    error = asyncio.run(run())
+    assert error.retry_after == 15  # 平均30秒/作业，2个并行，腾出一个位置约15秒
+
+
+def test_full_queue_answers_429(monkeypatch):
+    import fastapi_mcp
+    from fastapi.testclient import TestClient
+
+    from core import WebCrawler, create_app
+
+    class NoMCP:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def mount(self):
+            pass
+
+    monkeypatch.setattr(fastapi_mcp, "FastApiMCP", NoMCP)
+    crawler = WebCrawler()
+    jobs = JobManager(FakeCrawler(), CrawlerConfig, max_running=1, max_queued=1)
+    with TestClient(create_app(crawler, jobs)) as client:
+        assert client.post("/jobs", json={"urls": ["https://a/1"]}).status_code == 202
+        assert client.post("/jobs", json={"urls": ["https://a/2"]}).status_code == 202
+        refused = client.post("/jobs", json={"urls": ["https://a/3"]})
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
+
+
+def test_unfinished_jobs_are_restored_from_state_file(tmp_path):
+    async def first_run():
+        manager = JobManager(FakeCrawler(), CrawlerConfig, max_running=1, state_dir=str(tmp_path))
+        await manager.start()
+        running = await manager.submit(["https://a/1"], CrawlerConfig(output_format="html"), priority=1)
+        await _until(lambda: running.status == JobStatus.running)
+        queued = await manager.submit(["https://a/2", "https://a/2"], CrawlerConfig(), priority=3)
+        cancelled = await manager.submit(["https://a/3"], CrawlerConfig())
+        manager.cancel(cancelled.id)
+        await manager.close()
+        return running.id, queued.id
+
+    running_id, queued_id = asyncio.run(first_run())
+    saved = json.loads((tmp_path / "jobs.json").read_text())
+    assert {entry["id"] for entry in saved} == {running_id, queued_id}
+
+    async def second_run():
+        crawler = FakeCrawler()
+        crawler.gate.set()
+        manager = JobManager(crawler, CrawlerConfig, max_running=1, state_dir=str(tmp_path))
+        await manager.start()
+        await _until(lambda: all(manager.get(i).status == JobStatus.done for i in (running_id, queued_id)))
+        restored = manager.get(running_id)
+        await manager.close()
+        return crawler.started, restored, manager.get(queued_id)
+
+    started, restored, queued = asyncio.run(second_run())
+    assert started == ["https://a/2", "https://a/1"]  # 恢复后仍按优先级执行
+    assert restored.config.output_format.value == "html"
+    assert queued.urls == ["https://a/2"]
+    assert list(queued.results) == ["https://a/2"]
+    assert json.loads((tmp_path / "jobs.json").read_text()) == []
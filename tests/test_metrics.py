@@ -0,0 +1,40 @@
+import pytest
+
+from metrics import Metric, Registry, StageTimer
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("x", "help")
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    pages = registry.counter("pages_total", "Pages", ("status",))
+    pages.inc(status="success")
+    pages.inc(2, status="failed")
+    registry.gauge("queued", "Queued jobs", fn=lambda: 3)
+    seconds = registry.histogram("page_seconds", "Page time", buckets=(0.1, 1.0))
+    seconds.observe(0.05)
+    seconds.observe(0.5)
+    text = registry.render()
+    assert "# TYPE pages_total counter" in text
+    assert 'pages_total{status="success"} 1' in text and 'pages_total{status="failed"} 2' in text
+    assert "queued 3" in text
+    assert 'page_seconds_bucket{le="0.1"} 1' in text
+    assert 'page_seconds_bucket{le="1"} 2' in text
+    assert 'page_seconds_bucket{le="+Inf"} 2' in text
+    assert "page_seconds_count 2" in text
+
+
+def test_stage_timer_accumulates_and_observes():
+    registry = Registry()
+    histogram = registry.histogram("stage_seconds", "Stages", ("stage",))
+    timer = StageTimer("https://example.com/", histogram)
+    for _ in range(2):
+        with timer.stage("extract"):
+            pass
+    timer.add_size("html", 10)
+    meta = timer.to_meta()
+    assert set(meta["timings_ms"]) == {"extract"} and meta["sizes"] == {"html": 10}
+    assert histogram.values[("extract",)][2] == 2
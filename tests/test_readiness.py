@@ -0,0 +1,89 @@
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import nodriver as uc  # noqa: E402
+
+from readiness import NetworkIdle, _settle  # noqa: E402
+
+
+class FakeTab:
+    """按事件类型登记处理器（与nodriver一致），evaluate返回预设的探测结果"""
+
+    def __init__(self, dom_quiet_ms=10000.0):
+        self.handlers = defaultdict(list)
+        self.dom_quiet_ms = dom_quiet_ms
+        self.probes = 0
+
+    def add_handler(self, event_type, callback):
+        hash(event_type)  # nodriver用事件类型作字典键，列表会在这里报错
+        if callback not in self.handlers[event_type]:
+            self.handlers[event_type].append(callback)
+
+    def remove_handler(self, event_type, callback):
+        callbacks = self.handlers.get(event_type)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self.handlers[event_type]
+
+    def emit(self, event_type, **fields):
+        for callback in list(self.handlers.get(event_type, ())):
+            callback(SimpleNamespace(**fields))
+
+    async def evaluate(self, expression, return_by_value=False):
+        self.probes += 1
+        return json.dumps([1000, True, self.dom_quiet_ms, 0])
+
+
+def test_install_and_uninstall_register_each_event_type():
+    tab, network = FakeTab(), NetworkIdle(max_inflight=0)
+    network.install(tab)
+    assert set(tab.handlers) == {uc.cdp.network.RequestWillBeSent, uc.cdp.network.LoadingFinished,
+                                 uc.cdp.network.LoadingFailed}
+
+    tab.emit(uc.cdp.network.RequestWillBeSent, request_id="1")
+    tab.emit(uc.cdp.network.RequestWillBeSent, request_id="2")
+    assert network.idle_for() == 0.0
+    tab.emit(uc.cdp.network.LoadingFinished, request_id="1")
+    tab.emit(uc.cdp.network.LoadingFailed, request_id="2")
+    assert network.idle_since is not None
+
+    network.uninstall()
+    assert not tab.handlers
+
+
+def test_settle_waits_for_network_idle():
+    tab, network = FakeTab(), NetworkIdle(max_inflight=0)
+    network.install(tab)
+    tab.emit(uc.cdp.network.RequestWillBeSent, request_id="1")
+
+    async def finish_later():
+        await asyncio.sleep(0.2)
+        tab.emit(uc.cdp.network.LoadingFinished, request_id="1")
+
+    async def run():
+        started = time.monotonic()
+        finisher = asyncio.ensure_future(finish_later())
+        probe = await _settle(tab, network, 0.1, time.monotonic() + 5)
+        await finisher
+        return probe, time.monotonic() - started
+
+    probe, elapsed = asyncio.run(run())
+    assert probe.height == 1000
+    assert 0.3 <= elapsed < 2  # 请求结束后还需保持0.1秒空闲
+    network.uninstall()
+
+
+def test_settle_stops_at_deadline_when_dom_keeps_changing():
+    tab, network = FakeTab(dom_quiet_ms=0.0), NetworkIdle()
+    started = time.monotonic()
+    probe = asyncio.run(_settle(tab, network, 0.1, time.monotonic() + 0.3))
+    assert probe is not None
+    assert 0.3 <= time.monotonic() - started < 1
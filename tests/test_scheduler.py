@@ -0,0 +1,126 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+from scheduler import HostScheduler, HostTicket, parse_retry_after
+
+URL = "https://example.com/page"
+
+
+def _ticket(status=200, latency=0.05, kind="render", retry_after=None):
+    ticket = HostTicket("example.com", time.monotonic() - latency, kind)
+    ticket.observe(status, retry_after)
+    ticket.latency = latency
+    return ticket
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 25 <= parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+
+
+def test_retry_after_extends_backoff():
+    scheduler = HostScheduler(base_backoff=1.0, max_backoff=120.0)
+    state = scheduler._state("example.com")
+    started = time.monotonic()
+    scheduler._record(state, _ticket(429, retry_after="40"), error=False)
+    assert 40 <= state.blocked_until - started <= 41
+    assert state.tokens == 0.0 and state.throttled == 1
+
+    capped = HostScheduler(max_backoff=10.0)
+    state = capped._state("example.com")
+    capped._record(state, _ticket(503, retry_after="3600"), error=False)
+    assert state.blocked_until - time.monotonic() <= 10
+
+
+def test_backoff_grows_exponentially_and_resets_on_success():
+    scheduler = HostScheduler(base_backoff=1.0, max_backoff=120.0)
+    state = scheduler._state("example.com")
+    delays = []
+    for _ in range(4):
+        state.blocked_until = 0.0
+        now = time.monotonic()
+        scheduler._record(state, _ticket(429), error=False)
+        delays.append(state.blocked_until - now)
+    for attempt, delay in enumerate(delays):
+        assert 2 ** attempt <= delay <= 2 ** attempt * 1.25 + 0.01  # 含至多25%的抖动
+    scheduler._record(state, _ticket(200), error=False)
+    assert state.failures == 0
+
+
+def test_aimd_increases_on_fast_pages_and_halves_on_errors():
+    scheduler = HostScheduler(initial_concurrency=2, max_concurrency=8)
+    state = scheduler._state("example.com")
+    for _ in range(50):
+        scheduler._record(state, _ticket(200, latency=0.2), error=False)
+    assert state.limit == 8
+
+    scheduler._record(state, _ticket(500), error=False)
+    assert state.limit == 4
+    scheduler._record(state, _ticket(429), error=False)
+    assert state.limit == 2
+    scheduler._record(state, _ticket(None), error=True)
+    assert state.limit == 1  # 不低于min_concurrency
+    scheduler._record(state, _ticket(None), error=True)
+    assert state.limit == 1
+
+
+def test_rising_latency_decreases_limit():
+    scheduler = HostScheduler(initial_concurrency=4, latency_factor=3.0)
+    state = scheduler._state("example.com")
+    scheduler._record(state, _ticket(200, latency=0.2), error=False)
+    before = state.limit
+    for _ in range(10):
+        scheduler._record(state, _ticket(200, latency=5.0), error=False)
+    assert state.limit < before
+
+
+def test_latency_baselines_are_per_kind():
+    scheduler = HostScheduler(initial_concurrency=2, max_concurrency=8, latency_factor=3.0)
+    state = scheduler._state("example.com")
+    # 大量快速的图像下载既不提高上限，也不会让较慢的页面渲染看起来像是变慢了
+    for _ in range(50):
+        scheduler._record(state, _ticket(200, latency=0.01, kind="image"), error=False)
+    assert state.limit == 2
+    for _ in range(5):
+        scheduler._record(state, _ticket(200, latency=2.0, kind="render"), error=False)
+    assert state.limit > 2
+    assert state.min_latency == {"image": 0.01, "render": 2.0}
+
+
+def test_slot_limits_concurrency_and_records_kind():
+    scheduler = HostScheduler(rate=1000, initial_concurrency=1, max_concurrency=1)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with scheduler.slot(URL, kind="image") as ticket:
+            peak = max(peak, scheduler.hosts["example.com"].active)
+            await asyncio.sleep(0.01)
+            ticket.observe(200)
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(5)))
+
+    asyncio.run(run())
+    assert peak == 1
+    stats = scheduler.stats()["example.com"]
+    assert stats["requests"] == 5 and set(stats["latency_ms"]) == {"image"}
+
+
+def test_slot_counts_exceptions_as_errors():
+    scheduler = HostScheduler(initial_concurrency=4)
+
+    async def run():
+        async with scheduler.slot(URL):
+            raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+    state = scheduler.hosts["example.com"]
+    assert state.errors == 1 and state.limit == 2 and state.active == 0
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from search import SearchHit, SearchProvider, SearchService, StaticSearchProvider
+
+
+def test_provider_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SearchProvider()
+
+    class Incomplete(SearchProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_custom_provider_results_are_cached():
+    class Counting(SearchProvider):
+        name = "counting"
+
+        def __init__(self):
+            self.calls = 0
+
+        async def search(self, query, max_results):
+            self.calls += 1
+            return [SearchHit(f"https://example.com/{query}/{i}", "", query=query, rank=i) for i in range(max_results)]
+
+    provider = Counting()
+    service = SearchService(provider, ttl=60)
+
+    async def run():
+        first = await service.search("python", 2)
+        second = await service.search("python", 2)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [hit.url for hit in first] == [hit.url for hit in second] == ["https://example.com/python/0",
+                                                                         "https://example.com/python/1"]
+    assert provider.calls == 1
+    assert isinstance(StaticSearchProvider({}), SearchProvider)
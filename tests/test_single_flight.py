@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from config import CrawlerConfig
+from core import PageResult, WebCrawler
+
+URL = "https://example.com/"
+
+
+class SlowFetch:
+    """代替WebCrawler._fetch_page：记录调用次数，按release事件完成或抛出"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.cancelled = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self, url, config, fingerprint):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return PageResult(url, f"content #{self.calls}", "Title")
+
+
+def _crawler(fetch: SlowFetch) -> WebCrawler:
+    crawler = WebCrawler()
+    crawler._fetch_page = fetch
+    return crawler
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def run():
+        fetch = SlowFetch()
+        crawler, config = _crawler(fetch), CrawlerConfig()
+        callers = [asyncio.ensure_future(crawler.fetch_page(URL, config)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert len(crawler.inflight) == 1
+        fetch.release.set()
+        pages = await asyncio.gather(*callers)
+        assert fetch.calls == 1
+        assert {page.content for page in pages} == {"content #1"}
+        assert not crawler.inflight
+        assert crawler.m_cache.values[("joined",)] == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def run():
+        fetch = SlowFetch()
+        crawler, config = _crawler(fetch), CrawlerConfig()
+        leaving = asyncio.ensure_future(crawler.fetch_page(URL, config))
+        staying = asyncio.ensure_future(crawler.fetch_page(URL, config))
+        await asyncio.sleep(0.05)
+        leaving.cancel()
+        await asyncio.sleep(0.05)
+        assert fetch.cancelled == 0
+        fetch.release.set()
+        assert (await staying).content == "content #1"
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+
+    asyncio.run(run())
+
+
+def test_last_caller_leaving_cancels_the_fetch():
+    async def run():
+        fetch = SlowFetch()
+        crawler, config = _crawler(fetch), CrawlerConfig()
+        callers = [asyncio.ensure_future(crawler.fetch_page(URL, config)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        assert not crawler.inflight  # 立即移除，新的调用方不会加入正在取消的任务
+        await asyncio.sleep(0)
+        assert fetch.cancelled == 1
+
+        fetch.release.set()
+        assert (await crawler.fetch_page(URL, config)).content == "content #2"
+
+    asyncio.run(run())
+
+
+def test_exception_reaches_every_waiter():
+    async def run():
+        fetch = SlowFetch(error=RuntimeError("boom"))
+        crawler, config = _crawler(fetch), CrawlerConfig()
+        callers = [asyncio.ensure_future(crawler.fetch_page(URL, config)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        fetch.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) and str(result) == "boom" for result in results)
+        assert fetch.calls == 1
+        assert not crawler.inflight
+
+    asyncio.run(run())
+
+
+def test_different_configs_do_not_share():
+    async def run():
+        fetch = SlowFetch()
+        crawler = _crawler(fetch)
+        callers = [asyncio.ensure_future(crawler.fetch_page(URL, config))
+                   for config in (CrawlerConfig(), CrawlerConfig(output_format="html"), CrawlerConfig(no_cache=True))]
+        await asyncio.sleep(0.05)
+        fetch.release.set()
+        await asyncio.gather(*callers)
+        assert fetch.calls == 3
+
+    asyncio.run(run())
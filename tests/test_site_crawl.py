@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import pytest
+
+from config import CrawlerConfig
+from core import PageResult
+from site_crawl import CheckpointError, SiteCrawler
+
+SITE = {
+    "https://docs.example.com/": ["https://docs.example.com/a", "https://docs.example.com/b"],
+    "https://docs.example.com/a": ["https://docs.example.com/a/1", "https://other.example.org/x"],
+    "https://docs.example.com/b": ["https://docs.example.com/a", "https://docs.example.com/b/1"],
+    "https://docs.example.com/a/1": [],
+    "https://docs.example.com/b/1": [],
+}
+
+
+class FakeCrawler:
+    def __init__(self):
+        self.fetched = []
+
+    async def crawl_iter(self, urls, config, index=None):
+        for url in urls:
+            self.fetched.append(url)
+            yield PageResult(url, f"content of {url}", meta={"status": "success", "links": SITE.get(url, [])})
+
+
+def _site(checkpoint, seeds=("https://docs.example.com/",), **options):
+    return SiteCrawler(FakeCrawler(), list(seeds), CrawlerConfig(), sitemap=False, respect_robots=False,
+                       concurrency=1, checkpoint=str(checkpoint), checkpoint_every=1, **options)
+
+
+async def _collect(site, resume=False, done_urls=None, stop_after=None):
+    """模拟CLI：写出每个产出的页面；stop_after时在收到该序号的页面后、写出前中断"""
+    written = []
+    pages = site.run(resume=resume, done_urls=done_urls)
+    try:
+        async for page in pages:
+            if stop_after is not None and len(written) == stop_after:
+                break
+            written.append(page.url)
+    finally:
+        await pages.aclose()
+    return written
+
+
+def test_crawl_follows_in_scope_links_breadth_first(tmp_path):
+    site = _site(tmp_path / "crawl.checkpoint.json")
+    written = asyncio.run(_collect(site))
+    assert written == ["https://docs.example.com/", "https://docs.example.com/a", "https://docs.example.com/b",
+                       "https://docs.example.com/a/1", "https://docs.example.com/b/1"]
+    assert site.stats["pages"] == 5 and site.stats["out_of_scope"] == 1
+    state = json.loads((tmp_path / "crawl.checkpoint.json").read_text())
+    assert state["complete"] and state["in_flight"] == [] and state["frontier"] == []
+
+
+def test_resume_refetches_page_that_was_yielded_but_not_written(tmp_path):
+    checkpoint = tmp_path / "crawl.checkpoint.json"
+    first = asyncio.run(_collect(_site(checkpoint), stop_after=2))
+    assert first == ["https://docs.example.com/", "https://docs.example.com/a"]
+
+    state = json.loads(checkpoint.read_text())
+    # 第三个页面已产出但调用方在写出前停止：仍记录为进行中
+    assert [url for url, _ in state["in_flight"]] == ["https://docs.example.com/b"]
+
+    resumed = _site(checkpoint)
+    second = asyncio.run(_collect(resumed, resume=True, done_urls=set(first)))
+    assert sorted(first + second) == sorted(SITE)
+    assert resumed.crawler.fetched[0] == "https://docs.example.com/b"
+
+
+def test_resume_skips_in_flight_pages_already_written(tmp_path):
+    checkpoint = tmp_path / "crawl.checkpoint.json"
+    first = asyncio.run(_collect(_site(checkpoint), stop_after=2))
+    # 进行中的页面其实已写入输出（例如写出后、检查点更新前中断）
+    resumed = _site(checkpoint)
+    second = asyncio.run(_collect(resumed, resume=True, done_urls=set(first) | {"https://docs.example.com/b"}))
+    assert "https://docs.example.com/b" not in resumed.crawler.fetched
+    assert "https://docs.example.com/b" not in second
+
+
+def test_checkpoint_for_other_seeds_is_refused(tmp_path):
+    checkpoint = tmp_path / "crawl.checkpoint.json"
+    asyncio.run(_collect(_site(checkpoint), stop_after=1))
+
+    other = _site(checkpoint, seeds=["https://blog.example.com/"])
+    with pytest.raises(CheckpointError, match="docs.example.com"):
+        asyncio.run(_collect(other, resume=True))
+    assert other.crawler.fetched == []
+
+    # 起始URL相同、顺序不同时照常恢复
+    state = json.loads(checkpoint.read_text())
+    state["seeds"] = ["https://docs.example.com/", "https://docs.example.com/guide/"]
+    checkpoint.write_text(json.dumps(state))
+    assert _site(checkpoint, seeds=["https://docs.example.com/guide/", "https://docs.example.com/"]).load_checkpoint()
+
+
+def test_checkpoint_with_unknown_version_is_refused(tmp_path):
+    checkpoint = tmp_path / "crawl.checkpoint.json"
+    checkpoint.write_text(json.dumps({"version": 999}))
+    with pytest.raises(CheckpointError):
+        _site(checkpoint).load_checkpoint()